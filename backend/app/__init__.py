@@ -1,7 +1,13 @@
 import os
 from flask import Flask
+from app.cache import cache
 from app.config import config
-from app.models import db, migrate
+from app.events import events
+from app.hashing import hasher
+from app.metrics import metrics
+from app.models import db, last_logins, migrate
+from app.profiling import profiler
+from app.replicas import replicas
 from app.routes import cors, jwt, main
 from app.schemas import ma
 
@@ -16,10 +22,18 @@ def create_app(test_mode=False):
         env = os.environ.get("FLASK_ENV", "dev")
         app.config.from_object(config[env])
 
+    replicas.init_app(app)
     db.init_app(app)
     migrate.init_app(app, db)
     jwt.init_app(app)
     cors.init_app(app)
     app.register_blueprint(main)
     ma.init_app(app)
+    cache.init_app(app)
+    events.init_app(app)
+    hasher.init_app(app)
+    metrics.init_app(app)
+    profiler.init_app(app)
+    last_logins.init_app(
+        app, "LAST_LOGIN_FLUSH_INTERVAL", "LAST_LOGIN_FLUSH_SIZE")
     return app
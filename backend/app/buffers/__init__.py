@@ -0,0 +1,124 @@
+import atexit
+import logging
+import os
+import threading
+
+
+class WriteBehindBuffer:
+    """ Coalesce per-key writes in memory and flush them in bulk.
+
+    `record(key, value)` only keeps the latest value of every key. The
+    buffer is handed to `writer` when it holds `max_size` keys, every
+    `interval` seconds from a background thread, and at interpreter exit.
+    Values of a failed write are retried with the next flush and dropped
+    after `max_attempts` failures, so one bad batch can not block the
+    buffer.
+    """
+
+    def __init__(self, name, writer, interval=5, max_size=500,
+                 max_attempts=3):
+        self.name = name
+        self.writer = writer
+        self.interval = interval
+        self.max_size = max_size
+        self.max_attempts = max_attempts
+        self.app = None
+        self.pending = {}
+        self.attempts = {}
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.pid = None
+        atexit.register(self.close)
+
+    def init_app(self, app, interval_key, size_key):
+        """ Bind the buffer to the application that owns the database """
+        if self.app is not None:
+            self.close()
+        self.app = app
+        self.interval = app.config.get(interval_key, self.interval)
+        self.max_size = app.config.get(size_key, self.max_size)
+        app.extensions[self.name] = self
+
+    def record(self, key, value):
+        """ Remember the latest value of a key """
+        with self.lock:
+            self.pending[key] = value
+            full = len(self.pending) >= self.max_size
+        self.start()
+        if full:
+            # Called from requests, which must not fail on a bad batch
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Error en {self.name}: {e}")
+
+    def start(self):
+        """ Start the flushing thread of this process if needed """
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            self.thread = threading.Thread(
+                target=self.run, name=self.name, daemon=True)
+            self.thread.start()
+
+    def run(self):
+        """ Flush periodically until the process exits """
+        while True:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Error en {self.name}: {e}")
+
+    def flush(self):
+        """ Write every pending value with one call to the writer """
+        with self.flush_lock:
+            with self.lock:
+                items, self.pending = self.pending, {}
+            if not items or self.app is None:
+                return 0
+            try:
+                with self.app.app_context():
+                    self.writer(items)
+            except Exception as e:
+                self.retry_later(items)
+                raise e
+            with self.lock:
+                for key in items:
+                    self.attempts.pop(key, None)
+            return len(items)
+
+    def retry_later(self, items):
+        """ Put back the values of a failed write that have tries left """
+        dropped = 0
+        with self.lock:
+            for key, value in items.items():
+                attempts = self.attempts.get(key, 0) + 1
+                if attempts >= self.max_attempts:
+                    self.attempts.pop(key, None)
+                    dropped += 1
+                else:
+                    self.attempts[key] = attempts
+                    self.pending.setdefault(key, value)
+        if dropped:
+            logging.warning(
+                f"{self.name}: dropped {dropped} values that failed to write")
+
+    def close(self):
+        """ Flush what is left, dropping it if it can not be written """
+        try:
+            self.flush()
+        except Exception as e:
+            logging.error(f"Error en {self.name}: {e}")
+            with self.lock:
+                self.pending.clear()
+                self.attempts.clear()
+
+    def __len__(self):
+        return len(self.pending)
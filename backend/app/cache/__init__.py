@@ -0,0 +1,243 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheStats:
+    """ Hit, miss and eviction counters of a cache backend """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "invalidations": 0
+        }
+
+    def incr(self, name, amount=1):
+        """ Increase one counter """
+        with self.lock:
+            self.counters[name] += amount
+
+    def as_dict(self):
+        """ Return a copy of the counters """
+        with self.lock:
+            return dict(self.counters)
+
+
+class NullBackend:
+    """ Backend that never stores anything, used to disable the cache """
+
+    def __init__(self):
+        self.stats = CacheStats()
+
+    def get(self, user_id, key):
+        """ Always miss """
+        self.stats.incr("misses")
+        return None
+
+    def set(self, user_id, key, value):
+        """ Discard the value """
+        pass
+
+    def invalidate(self, user_id):
+        """ Nothing to drop """
+        pass
+
+    def __len__(self):
+        return 0
+
+
+class LRUBackend:
+    """ In-process LRU cache with a TTL and a maximum number of entries """
+
+    def __init__(self, max_entries=1024, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.keys_by_user = {}
+        self.lock = threading.Lock()
+        self.stats = CacheStats()
+
+    def get(self, user_id, key):
+        """ Return the cached value or None """
+        with self.lock:
+            entry = self.entries.get((user_id, key))
+            if entry is not None and entry[1] < time.monotonic():
+                self.remove((user_id, key))
+                entry = None
+            if entry is None:
+                self.stats.incr("misses")
+                return None
+            self.entries.move_to_end((user_id, key))
+        self.stats.incr("hits")
+        return entry[0]
+
+    def set(self, user_id, key, value):
+        """ Store a value, evicting the least recently used entries """
+        with self.lock:
+            self.entries[(user_id, key)] = (value, time.monotonic() + self.ttl)
+            self.entries.move_to_end((user_id, key))
+            self.keys_by_user.setdefault(user_id, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                oldest = next(iter(self.entries))
+                self.remove(oldest)
+                self.stats.incr("evictions")
+
+    def invalidate(self, user_id):
+        """ Drop every entry of the user """
+        with self.lock:
+            for key in self.keys_by_user.pop(user_id, ()):
+                self.entries.pop((user_id, key), None)
+        self.stats.incr("invalidations")
+
+    def remove(self, entry_key):
+        """ Remove one entry, the lock must be held """
+        self.entries.pop(entry_key, None)
+        user_id, key = entry_key
+        keys = self.keys_by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.keys_by_user[user_id]
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class SQLiteBackend:
+    """ Cache shared by every worker of a host through a SQLite file.
+
+    Stands in for a network cache such as Redis: entries survive across
+    processes and invalidations are seen by all of them.
+    """
+
+    def __init__(self, path, max_entries=10000, ttl=60):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.local = threading.local()
+        self.stats = CacheStats()
+        self.connection().executescript(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " user_id INTEGER NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value BLOB NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL,"
+            " PRIMARY KEY (user_id, key));"
+            "CREATE INDEX IF NOT EXISTS ix_cache_accessed_at"
+            " ON cache (accessed_at);"
+        )
+
+    def connection(self):
+        """ Return the connection of the current thread """
+        conn = getattr(self.local, "conn", None)
+        if conn is None or getattr(self.local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
+
+    def get(self, user_id, key):
+        """ Return the cached value or None """
+        now = time.time()
+        conn = self.connection()
+        row = conn.execute(
+            "SELECT value FROM cache"
+            " WHERE user_id = ? AND key = ? AND expires_at > ?",
+            (user_id, key, now)
+        ).fetchone()
+        if row is None:
+            self.stats.incr("misses")
+            return None
+        conn.execute(
+            "UPDATE cache SET accessed_at = ? WHERE user_id = ? AND key = ?",
+            (now, user_id, key)
+        )
+        self.stats.incr("hits")
+        return row[0]
+
+    def set(self, user_id, key, value):
+        """ Store a value, evicting expired and least recently used rows """
+        now = time.time()
+        conn = self.connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache"
+            " (user_id, key, value, expires_at, accessed_at)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (user_id, key, value, now + self.ttl, now)
+        )
+        evicted = conn.execute(
+            "DELETE FROM cache WHERE expires_at <= ? OR rowid IN ("
+            " SELECT rowid FROM cache ORDER BY accessed_at DESC"
+            " LIMIT -1 OFFSET ?)",
+            (now, self.max_entries)
+        ).rowcount
+        if evicted > 0:
+            self.stats.incr("evictions", evicted)
+
+    def invalidate(self, user_id):
+        """ Drop every entry of the user """
+        self.connection().execute(
+            "DELETE FROM cache WHERE user_id = ?", (user_id,))
+        self.stats.incr("invalidations")
+
+    def __len__(self):
+        return self.connection().execute(
+            "SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+class Cache:
+    """ Task list response cache with a backend chosen by configuration """
+
+    def __init__(self, app=None):
+        self.backend = NullBackend()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """ Create the backend set in TASKLIST_CACHE_BACKEND """
+        name = app.config.get("TASKLIST_CACHE_BACKEND", "null")
+        ttl = app.config.get("TASKLIST_CACHE_TTL", 60)
+        max_entries = app.config.get("TASKLIST_CACHE_MAX_ENTRIES", 1024)
+        if name == "lru":
+            self.backend = LRUBackend(max_entries=max_entries, ttl=ttl)
+        elif name == "sqlite":
+            self.backend = SQLiteBackend(
+                app.config["TASKLIST_CACHE_PATH"],
+                max_entries=max_entries,
+                ttl=ttl
+            )
+        elif name == "null":
+            self.backend = NullBackend()
+        else:
+            raise ValueError(f"Unknown cache backend: {name}")
+        app.extensions["tasklist_cache"] = self
+
+    def get(self, user_id, key):
+        """ Return the cached value or None """
+        return self.backend.get(user_id, key)
+
+    def set(self, user_id, key, value):
+        """ Store a value for the user """
+        self.backend.set(user_id, key, value)
+
+    def invalidate(self, user_id):
+        """ Drop every entry of the user """
+        if user_id is not None:
+            self.backend.invalidate(user_id)
+
+    def stats(self):
+        """ Return the counters and the current number of entries """
+        stats = self.backend.stats.as_dict()
+        stats["entries"] = len(self.backend)
+        return stats
+
+
+cache = Cache()
@@ -1,5 +1,7 @@
 import os
+import tempfile
 from datetime import timedelta
+from app.metrics import TimedQueuePool
 
 
 basedir = os.path.abspath(os.path.dirname(__file__))
@@ -16,12 +18,67 @@ class BaseConfig:
         days=int(os.environ.get("JWT_ACCESS_TOKEN_EXPIRES_DAYS", 6))
     )
     RECORDS_PER_PAGE = int(os.environ.get("RECORDS_PER_PAGE", 15))
+    MAX_RECORDS_PER_PAGE = int(os.environ.get("MAX_RECORDS_PER_PAGE", 100))
+    EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", 1000))
+    METRICS_ENABLED = os.environ.get(
+        "METRICS_ENABLED", "true").lower() == "true"
+    LAST_LOGIN_FLUSH_INTERVAL = float(
+        os.environ.get("LAST_LOGIN_FLUSH_INTERVAL", 5))
+    LAST_LOGIN_FLUSH_SIZE = int(os.environ.get("LAST_LOGIN_FLUSH_SIZE", 500))
+    MAX_BATCH_OPERATIONS = int(os.environ.get("MAX_BATCH_OPERATIONS", 500))
+    TASKLIST_LEGACY_MODE = os.environ.get(
+        "TASKLIST_LEGACY_MODE", "true").lower() == "true"
     SECRET_KEY = os.environ.get("SECRET_KEY", "123456")
-
-
-class ProductionConfig(BaseConfig):
-    """ Production configuration class """
-    pass
+    PASSWORD_HASH_ALGORITHM = os.environ.get(
+        "PASSWORD_HASH_ALGORITHM", "pbkdf2:sha256")
+    PASSWORD_HASH_ITERATIONS = int(
+        os.environ.get("PASSWORD_HASH_ITERATIONS", 600000))
+    PASSWORD_HASH_MAX_CONCURRENT = int(
+        os.environ.get("PASSWORD_HASH_MAX_CONCURRENT", os.cpu_count() or 1))
+    PASSWORD_HASH_MAX_QUEUED = int(
+        os.environ.get("PASSWORD_HASH_MAX_QUEUED", 16))
+    PASSWORD_HASH_QUEUE_TIMEOUT = float(
+        os.environ.get("PASSWORD_HASH_QUEUE_TIMEOUT", 1))
+    PASSWORD_HASH_RETRY_AFTER = int(
+        os.environ.get("PASSWORD_HASH_RETRY_AFTER", 1))
+    PASSWORD_HASH_EXECUTOR = os.environ.get("PASSWORD_HASH_EXECUTOR", "thread")
+    TASKLIST_CACHE_BACKEND = os.environ.get("TASKLIST_CACHE_BACKEND", "lru")
+    TASKLIST_CACHE_TTL = int(os.environ.get("TASKLIST_CACHE_TTL", 60))
+    TASKLIST_CACHE_MAX_ENTRIES = int(
+        os.environ.get("TASKLIST_CACHE_MAX_ENTRIES", 1024))
+    TASKLIST_CACHE_PATH = os.environ.get(
+        "TASKLIST_CACHE_PATH", os.path.join(basedir, "..", "cache.db"))
+    REPLICA_DATABASE_URIS = [
+        uri for uri in os.environ.get("REPLICA_DATABASE_URIS", "").split(",")
+        if uri
+    ]
+    REPLICA_STICKY_SECONDS = float(
+        os.environ.get("REPLICA_STICKY_SECONDS", 5))
+    TASK_EVENTS_BACKEND = os.environ.get("TASK_EVENTS_BACKEND", "local")
+    TASK_EVENTS_CHANNEL = os.environ.get("TASK_EVENTS_CHANNEL", "task_events")
+    TASK_EVENTS_QUEUE_SIZE = int(
+        os.environ.get("TASK_EVENTS_QUEUE_SIZE", 100))
+    TASK_EVENTS_HEARTBEAT = float(
+        os.environ.get("TASK_EVENTS_HEARTBEAT", 15))
+    TASK_EVENTS_STREAM = os.environ.get(
+        "TASK_EVENTS_STREAM", "true").lower() == "true"
+    PROFILING_ENABLED = os.environ.get(
+        "PROFILING_ENABLED", "false").lower() == "true"
+    PROFILING_SAMPLE_RATE = float(
+        os.environ.get("PROFILING_SAMPLE_RATE", 0))
+    PROFILING_SECRET = os.environ.get("PROFILING_SECRET")
+    PROFILING_HEADER = os.environ.get("PROFILING_HEADER", "X-Profile-Token")
+    PROFILING_TOKEN_MAX_AGE = int(
+        os.environ.get("PROFILING_TOKEN_MAX_AGE", 3600))
+    PROFILING_MODE = os.environ.get("PROFILING_MODE", "cprofile")
+    PROFILING_SAMPLE_INTERVAL = float(
+        os.environ.get("PROFILING_SAMPLE_INTERVAL", 0.001))
+    PROFILING_DIR = os.environ.get(
+        "PROFILING_DIR", os.path.join(tempfile.gettempdir(), "todo-profiles"))
+    PROFILING_MAX_PROFILES = int(
+        os.environ.get("PROFILING_MAX_PROFILES", 50))
+    PROFILING_TOP_STATEMENTS = int(
+        os.environ.get("PROFILING_TOP_STATEMENTS", 10))
 
 
 class DevConfig(BaseConfig):
@@ -36,13 +93,45 @@ class DevConfig(BaseConfig):
     ))
 
 
+class ProductionConfig(DevConfig):
+    """ Production configuration class.
+
+    Uses the same database settings as development, with a pool sized
+    from the environment. Connections are checked before use, recycled
+    before the server or a proxy drops them, and every statement has a
+    timeout.
+    """
+    DEBUG = False
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "poolclass": TimedQueuePool,
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", 5)),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 5)),
+        "pool_timeout": int(os.environ.get("DB_POOL_TIMEOUT", 10)),
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": os.environ.get(
+            "DB_POOL_PRE_PING", "true").lower() == "true",
+        "connect_args": {
+            "options": "-c statement_timeout={}".format(
+                int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", 30000)))
+        },
+    }
+
+
 class TestConfig(BaseConfig):
     """ Testing configuration class """
     DEBUG = True
     TESTING = True
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(
-        basedir, "..", 'test.db')
+    # A file on tmpfs when available, one per test process
+    TEST_DATABASE_DIR = os.environ.get(
+        "TEST_DATABASE_DIR",
+        "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir())
+    SQLALCHEMY_DATABASE_URI = os.environ.get(
+        "TEST_DATABASE_URI",
+        "sqlite:///" + os.path.join(
+            TEST_DATABASE_DIR, "test-{}.db".format(os.getpid())))
     PRESERVE_CONTEXT_ON_EXCEPTION = False
+    LAST_LOGIN_FLUSH_INTERVAL = 3600
+    PASSWORD_HASH_ITERATIONS = 1000
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
 
@@ -0,0 +1,218 @@
+import json
+import logging
+import os
+import select
+import threading
+import time
+from collections import deque
+from sqlalchemy import text
+
+
+class Subscription:
+    """ Bounded queue of the events waiting to be sent to one client.
+
+    A subscriber that lets `max_size` events pile up is evicted: its
+    queue is dropped and the client is expected to resync.
+    """
+
+    def __init__(self, user_id, max_size=100):
+        self.user_id = user_id
+        self.max_size = max_size
+        self.events = deque()
+        self.evicted = False
+        self.condition = threading.Condition()
+
+    def put(self, event):
+        """ Queue an event, return False if the subscriber was evicted """
+        with self.condition:
+            if self.evicted:
+                return False
+            if len(self.events) >= self.max_size:
+                self.evicted = True
+                self.events.clear()
+            else:
+                self.events.append(event)
+            self.condition.notify()
+            return not self.evicted
+
+    def get(self, timeout):
+        """ Wait for the next event, None on timeout or eviction """
+        with self.condition:
+            if not self.events and not self.evicted:
+                self.condition.wait(timeout)
+            if self.evicted or not self.events:
+                return None
+            return self.events.popleft()
+
+
+class LocalBackend:
+    """ Deliver events to the subscribers of this process only """
+
+    def __init__(self, dispatch):
+        self.dispatch = dispatch
+
+    def publish(self, user_id, event):
+        """ Hand the event to the local subscribers """
+        self.dispatch(user_id, event)
+
+    def start(self):
+        """ Nothing to listen to """
+        pass
+
+
+class PostgresBackend:
+    """ Deliver events to the subscribers of every worker with NOTIFY.
+
+    Each process keeps one connection, outside of the pool, that LISTENs
+    on `channel` and dispatches what it receives to its own subscribers.
+    """
+
+    def __init__(self, app, channel, dispatch):
+        self.app = app
+        self.channel = channel
+        self.dispatch = dispatch
+        self.lock = threading.Lock()
+        self.pid = None
+
+    def engine(self):
+        """ Return the engine of the application database """
+        with self.app.app_context():
+            return self.app.extensions["sqlalchemy"].engine
+
+    def publish(self, user_id, event):
+        """ Send the event to every listening worker """
+        payload = json.dumps({"user_id": user_id, "event": event})
+        with self.engine().connect() as connection:
+            connection.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": self.channel, "payload": payload}
+            )
+            connection.commit()
+
+    def receive(self, payload):
+        """ Dispatch one notification payload """
+        message = json.loads(payload)
+        self.dispatch(message["user_id"], message["event"])
+
+    def start(self):
+        """ Start the listening thread of this process if needed """
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            threading.Thread(
+                target=self.run, name="task_events", daemon=True).start()
+
+    def run(self):
+        """ Listen until the process exits, reconnecting on errors """
+        while True:
+            try:
+                self.listen()
+            except Exception as e:
+                logging.error(f"Error en task_events: {e}")
+                time.sleep(1)
+
+    def listen(self):
+        """ Wait for notifications on a dedicated connection """
+        connection = self.engine().raw_connection()
+        connection.detach()
+        try:
+            dbapi_connection = connection.dbapi_connection
+            dbapi_connection.autocommit = True
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f'LISTEN "{self.channel}"')
+            while True:
+                ready, _, _ = select.select([dbapi_connection], [], [], 5)
+                if not ready:
+                    continue
+                dbapi_connection.poll()
+                while dbapi_connection.notifies:
+                    notify = dbapi_connection.notifies.pop(0)
+                    self.receive(notify.payload)
+        finally:
+            connection.close()
+
+
+class EventBus:
+    """ Publish task changes to the clients listening for them """
+
+    def __init__(self, app=None):
+        self.subscribers = {}
+        self.lock = threading.Lock()
+        self.queue_size = 100
+        self.evictions = 0
+        self.backend = LocalBackend(self.dispatch)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """ Create the backend set in TASK_EVENTS_BACKEND """
+        name = app.config.get("TASK_EVENTS_BACKEND", "local")
+        self.queue_size = app.config.get("TASK_EVENTS_QUEUE_SIZE", 100)
+        if name == "local":
+            self.backend = LocalBackend(self.dispatch)
+        elif name == "postgres":
+            self.backend = PostgresBackend(
+                app,
+                app.config.get("TASK_EVENTS_CHANNEL", "task_events"),
+                self.dispatch
+            )
+        else:
+            raise ValueError(f"Unknown event backend: {name}")
+        app.extensions["task_events"] = self
+
+    def subscribe(self, user_id):
+        """ Return a new subscription to the events of the user """
+        self.backend.start()
+        subscription = Subscription(user_id, self.queue_size)
+        with self.lock:
+            self.subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """ Stop delivering events to a subscription """
+        with self.lock:
+            subscriptions = self.subscribers.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self.subscribers[subscription.user_id]
+
+    def publish(self, user_id, action, seq, task):
+        """ Publish a created, updated or deleted task.
+
+        Called after the change is committed; a failure is logged and
+        does not affect the write.
+        """
+        event = {"type": action, "seq": seq, "task": task}
+        try:
+            self.backend.publish(user_id, event)
+        except Exception as e:
+            logging.error(f"Error en task_events: {e}")
+
+    def dispatch(self, user_id, event):
+        """ Queue an event for the local subscribers of the user """
+        with self.lock:
+            subscriptions = list(self.subscribers.get(user_id, ()))
+        for subscription in subscriptions:
+            if not subscription.put(event):
+                self.unsubscribe(subscription)
+                with self.lock:
+                    self.evictions += 1
+                logging.warning(
+                    f"task_events: evicted a slow subscriber of {user_id}")
+
+    def __len__(self):
+        with self.lock:
+            return sum(len(s) for s in self.subscribers.values())
+
+
+def format_event(event):
+    """ Render an event in the text/event-stream format """
+    return "id: {}\nevent: {}\ndata: {}\n\n".format(
+        event["seq"], event["type"], json.dumps(event))
+
+
+events = EventBus()
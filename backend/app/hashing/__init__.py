@@ -0,0 +1,115 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HashingBusy(Exception):
+    """ Raised when every hashing slot stays taken for too long """
+
+    def __init__(self, retry_after):
+        super().__init__("Password hashing pool is saturated")
+        self.retry_after = retry_after
+
+
+def policy_method(algorithm, iterations):
+    """ Return the Werkzeug method string of a hashing policy """
+    if algorithm.startswith("pbkdf2") and iterations:
+        return f"{algorithm}:{iterations}"
+    return algorithm
+
+
+class Hasher:
+    """ Runs password hashing in a bounded pool with backpressure.
+
+    At most PASSWORD_HASH_MAX_CONCURRENT hashes run at once and at most
+    PASSWORD_HASH_MAX_QUEUED more wait for a slot. A caller that can not
+    get a slot within PASSWORD_HASH_QUEUE_TIMEOUT seconds gets HashingBusy,
+    which the routes turn into a 503 with Retry-After.
+    """
+
+    def __init__(self, app=None):
+        self.method = policy_method("pbkdf2:sha256", 600000)
+        self.prefixes = {}
+        self.max_concurrent = os.cpu_count() or 1
+        self.queue_timeout = None
+        self.retry_after = 1
+        self.executor_class = ThreadPoolExecutor
+        self.slots = threading.BoundedSemaphore(self.max_concurrent)
+        self.executor = None
+        self.pid = None
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """ Read the hashing policy of the application """
+        self.method = policy_method(
+            app.config.get("PASSWORD_HASH_ALGORITHM", "pbkdf2:sha256"),
+            app.config.get("PASSWORD_HASH_ITERATIONS", 600000)
+        )
+        self.max_concurrent = app.config.get(
+            "PASSWORD_HASH_MAX_CONCURRENT") or os.cpu_count() or 1
+        max_queued = app.config.get("PASSWORD_HASH_MAX_QUEUED", 0)
+        self.queue_timeout = app.config.get("PASSWORD_HASH_QUEUE_TIMEOUT", 1)
+        self.retry_after = app.config.get("PASSWORD_HASH_RETRY_AFTER", 1)
+        if app.config.get("PASSWORD_HASH_EXECUTOR", "thread") == "process":
+            self.executor_class = ProcessPoolExecutor
+        else:
+            self.executor_class = ThreadPoolExecutor
+        self.slots = threading.BoundedSemaphore(
+            self.max_concurrent + max_queued)
+        self.shutdown()
+        app.extensions["hasher"] = self
+
+    def get_executor(self):
+        """ Return the pool of this process, creating it after a fork """
+        with self.lock:
+            if self.executor is None or self.pid != os.getpid():
+                self.executor = self.executor_class(
+                    max_workers=self.max_concurrent)
+                self.pid = os.getpid()
+            return self.executor
+
+    def shutdown(self):
+        """ Stop the worker pool """
+        with self.lock:
+            if self.executor is not None and self.pid == os.getpid():
+                self.executor.shutdown(wait=False)
+            self.executor = None
+
+    def run(self, function, *args):
+        """ Run a hashing function in the pool, or raise HashingBusy """
+        if not self.slots.acquire(timeout=self.queue_timeout):
+            raise HashingBusy(self.retry_after)
+        try:
+            return self.get_executor().submit(function, *args).result()
+        finally:
+            self.slots.release()
+
+    def hash(self, password):
+        """ Hash a password with the configured policy """
+        return self.run(generate_password_hash, password, self.method)
+
+    def check(self, pwhash, password):
+        """ Check a password against a stored hash """
+        return self.run(check_password_hash, pwhash, password)
+
+    def policy_prefix(self):
+        """ Return the parameters Werkzeug writes before hashes of the policy.
+
+        A method names only some of them, "scrypt" hashes start with
+        "scrypt:32768:8:1", so they are read from one hash, made once.
+        """
+        method = self.method
+        if method not in self.prefixes:
+            self.prefixes[method] = self.run(
+                generate_password_hash, "", method).split("$", 1)[0]
+        return self.prefixes[method]
+
+    def needs_rehash(self, pwhash):
+        """ Tell if a stored hash was made with another policy """
+        return pwhash.split("$", 1)[0] != self.policy_prefix()
+
+
+hasher = Hasher()
@@ -0,0 +1,205 @@
+import csv
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+from app.cache import cache
+from app.hashing import hasher
+from app.positions import key_between
+from app.models import (
+    db,
+    insert_ignoring_duplicates,
+    Task,
+    TaskStats,
+    User,
+    utcnow,
+)
+
+
+USER_FIELDS = ("username", "email", "password")
+TASK_FIELDS = (
+    "task", "description", "is_completed", "user_id", "position", "seq",
+    "updated_at")
+TRUE_VALUES = ("1", "true", "t", "yes", "y")
+
+
+def read_records(stream, file_format):
+    """ Yield one dict per CSV row or NDJSON line """
+    if file_format == "csv":
+        yield from csv.DictReader(stream)
+    elif file_format == "ndjson":
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        raise ValueError(f"Unknown import format: {file_format}")
+
+
+def guess_format(path):
+    """ Guess the file format from its extension """
+    if path.endswith(".csv"):
+        return "csv"
+    return "ndjson"
+
+
+def chunked(iterable, size):
+    """ Yield lists of at most `size` items """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def parse_bool(value):
+    """ Read a boolean written as text or JSON """
+    if isinstance(value, bool):
+        return value
+    return str(value or "").strip().lower() in TRUE_VALUES
+
+
+class ImportReport:
+    """ Counters and throughput of an import run """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.read = 0
+        self.inserted = 0
+        self.skipped = 0
+        self.invalid = 0
+
+    @property
+    def elapsed(self):
+        """ Seconds since the import started """
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        """ Rows read per second """
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (
+            f"read={self.read} inserted={self.inserted} "
+            f"skipped={self.skipped} invalid={self.invalid} "
+            f"elapsed={self.elapsed:.2f}s rows/sec={self.rows_per_second:.0f}"
+        )
+
+
+def import_users(records, chunk_size=5000, workers=None, progress=None):
+    """ Insert users in chunks, hashing their passwords in a process pool.
+
+    Emails that already exist, in the database or earlier in the file,
+    are skipped by the unique constraint instead of per-row lookups.
+    """
+    report = ImportReport()
+    statement = insert_ignoring_duplicates(User).returning(User.id)
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk in chunked(records, chunk_size):
+            report.read += len(chunk)
+            rows = [
+                {field: record.get(field) for field in USER_FIELDS}
+                for record in chunk
+                if all(record.get(field) for field in USER_FIELDS)
+            ]
+            report.invalid += len(chunk) - len(rows)
+            hashes = pool.map(
+                partial(generate_password_hash, method=hasher.method),
+                [row["password"] for row in rows],
+                chunksize=max(1, len(rows) // (4 * workers)),
+            )
+            for row, password in zip(rows, hashes):
+                row["password"] = password
+                row["is_disabled"] = False
+            if rows:
+                try:
+                    inserted = len(db.session.execute(statement, rows).all())
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    raise e
+                report.inserted += inserted
+                report.skipped += len(rows) - inserted
+            if progress is not None:
+                progress(report)
+    return report
+
+
+def copy_tasks(rows):
+    """ Load task rows with COPY through the raw psycopg2 connection """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([
+            "" if row[field] is None else row[field] for field in TASK_FIELDS
+        ])
+    buffer.seek(0)
+    connection = db.session.connection().connection
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            "COPY task ({}) FROM STDIN WITH (FORMAT csv)".format(
+                ", ".join(TASK_FIELDS)),
+            buffer
+        )
+
+
+def import_tasks(records, chunk_size=10000, progress=None):
+    """ Insert tasks in chunks with COPY on Postgres, executemany elsewhere """
+    report = ImportReport()
+    use_copy = db.engine.dialect.name == "postgresql"
+    for chunk in chunked(records, chunk_size):
+        report.read += len(chunk)
+        rows = []
+        for record in chunk:
+            try:
+                if not record["task"]:
+                    raise ValueError(record)
+                rows.append({
+                    "task": record["task"],
+                    "description": record.get("description") or None,
+                    "is_completed": parse_bool(record.get("is_completed")),
+                    "user_id": int(record["user_id"]),
+                })
+            except (KeyError, TypeError, ValueError):
+                report.invalid += 1
+        if rows:
+            try:
+                connection = db.session.connection()
+                user_ids = {row["user_id"] for row in rows}
+                # Imported tasks are changes of their users, so the
+                # changes feed returns them, at the end of the list
+                versions = User.bump_versions(connection, user_ids)
+                last = Task.last_positions(connection, user_ids)
+                now = utcnow()
+                for row in rows:
+                    row["position"] = last[row["user_id"]] = key_between(
+                        last.get(row["user_id"]), None)
+                    row["seq"] = versions.get(row["user_id"])
+                    row["updated_at"] = now
+                if use_copy:
+                    copy_tasks(rows)
+                else:
+                    db.session.execute(insert(Task), rows)
+                deltas = {}
+                for row in rows:
+                    total, completed = deltas.get(row["user_id"], (0, 0))
+                    deltas[row["user_id"]] = (
+                        total + 1, completed + bool(row["is_completed"]))
+                TaskStats.apply(connection, deltas)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                raise e
+            for user_id in user_ids:
+                cache.invalidate(user_id)
+            report.inserted += len(rows)
+        if progress is not None:
+            progress(report)
+    return report
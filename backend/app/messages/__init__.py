@@ -37,9 +37,51 @@ ERR_TASK_NOT_FOUND = {
 SUC_TASK_UPDATED = {
     "message": "Tarea modificada con éxito."
 }
+SUC_TASK_MOVED = {
+    "message": "Tarea movida"
+}
+SUC_TASK_RESTORED = {
+    "message": "Tarea restaurada"
+}
 SUC_TASK_DELETED = {
     "message": "Tarea eliminada"
 }
 ERR_USER_NOT_FOUND = {
     "error": "Usuario no encontrado"
 }
+ERR_INVALID_PAGE = {
+    "error": "Los parámetros de paginación no son válidos."
+}
+ERR_INVALID_SINCE = {
+    "error": "El parámetro since debe ser un entero no negativo."
+}
+ERR_INVALID_QUERY = {
+    "error": "El parámetro q no puede estar vacío."
+}
+ERR_INVALID_MOVE = {
+    "error": "Indica una tarea before o after válida."
+}
+ERR_INVALID_BATCH = {
+    "error": "La lista de operaciones no es válida."
+}
+ERR_INVALID_OPERATION = {
+    "error": "Operación no soportada."
+}
+ERR_TASK_FORBIDDEN = {
+    "error": "No tienes permiso sobre esta tarea."
+}
+ERR_INVALID_FORMAT = {
+    "error": "Formato de exportación no soportado."
+}
+ERR_SERVER_BUSY = {
+    "error": "El servidor está ocupado, intenta nuevamente."
+}
+ERR_STREAM_UNAVAILABLE = {
+    "error": "Este servidor no atiende el flujo de eventos."
+}
+SUC_USER_DELETED = {
+    "message": "Usuario eliminado"
+}
+ERR_USER_FORBIDDEN = {
+    "error": "No tienes permiso sobre este usuario."
+}
@@ -0,0 +1,265 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import current_app, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+SQL_COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100)
+
+# [statements, seconds] of the SQL run by the current request
+current_sql = ContextVar("current_sql", default=None)
+
+
+class Histogram:
+    """ Cumulative bucket histogram in the Prometheus style """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """ Record one value """
+        for n, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[n] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels):
+        """ Return the exposition lines of the histogram """
+        lines = []
+        cumulative = 0
+        bounds = [str(bound) for bound in self.buckets] + ["+Inf"]
+        for bound, count in zip(bounds, self.counts):
+            cumulative += count
+            lines.append(
+                f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+class Metrics:
+    """ Request latency, response size, status and SQL instrumentation """
+
+    HISTOGRAMS = {
+        "http_request_duration_seconds": (
+            LATENCY_BUCKETS, "Request latency by endpoint"),
+        "http_response_size_bytes": (
+            SIZE_BUCKETS, "Response body size by endpoint"),
+        "db_statements_per_request": (
+            SQL_COUNT_BUCKETS, "SQL statements run by one request"),
+        "db_request_duration_seconds": (
+            LATENCY_BUCKETS, "Time spent in SQL by one request"),
+        "section_duration_seconds": (
+            LATENCY_BUCKETS, "Time spent in a named code section"),
+        "db_pool_checkout_seconds": (
+            LATENCY_BUCKETS, "Time spent waiting for a pooled connection"),
+    }
+
+    def __init__(self, app=None):
+        self.lock = threading.Lock()
+        self.blueprint = "main"
+        self.reset()
+        if app is not None:
+            self.init_app(app)
+
+    def reset(self):
+        """ Forget every recorded value """
+        with self.lock:
+            self.histograms = {name: {} for name in self.HISTOGRAMS}
+            self.requests = {}
+
+    def init_app(self, app):
+        """ Hook the request and SQL events and add the /metrics route """
+        self.reset()
+        app.extensions["metrics"] = self
+        if not app.config.get("METRICS_ENABLED", True):
+            return
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        app.add_url_rule(
+            app.config.get("METRICS_PATH", "/metrics"),
+            "metrics",
+            self.metrics_view
+        )
+        if not event.contains(
+                Engine, "before_cursor_execute", before_cursor_execute):
+            event.listen(
+                Engine, "before_cursor_execute", before_cursor_execute)
+            event.listen(
+                Engine, "after_cursor_execute", after_cursor_execute)
+
+    def observe(self, name, labels, value):
+        """ Record a value in one labelled histogram """
+        buckets = self.HISTOGRAMS[name][0]
+        with self.lock:
+            series = self.histograms[name]
+            if labels not in series:
+                series[labels] = Histogram(buckets)
+            series[labels].observe(value)
+
+    @contextmanager
+    def timed(self, section):
+        """ Time a block of code, e.g. `with metrics.timed("hash"):` """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(
+                "section_duration_seconds",
+                f'section="{section}"',
+                time.perf_counter() - started
+            )
+
+    def before_request(self):
+        """ Start the clock and the SQL counters of a request """
+        if request.blueprint != self.blueprint:
+            return
+        request.environ["metrics.started"] = time.perf_counter()
+        request.environ["metrics.token"] = current_sql.set([0, 0.0])
+
+    def after_request(self, response):
+        """ Record the request once the response is built """
+        started = request.environ.pop("metrics.started", None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        token = request.environ.pop("metrics.token")
+        statements, sql_seconds = current_sql.get()
+        current_sql.reset(token)
+
+        endpoint = f'endpoint="{request.endpoint}"'
+        self.observe("http_request_duration_seconds", endpoint, elapsed)
+        if not response.is_streamed:
+            self.observe(
+                "http_response_size_bytes", endpoint,
+                response.calculate_content_length() or 0
+            )
+        self.observe("db_statements_per_request", endpoint, statements)
+        self.observe("db_request_duration_seconds", endpoint, sql_seconds)
+        key = (request.endpoint, request.method, response.status_code)
+        with self.lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+        return response
+
+    def render(self):
+        """ Return every metric in the Prometheus text format """
+        lines = [
+            "# HELP http_requests_total Requests by endpoint and status",
+            "# TYPE http_requests_total counter",
+        ]
+        with self.lock:
+            for (endpoint, method, status), count in sorted(
+                    self.requests.items()):
+                lines.append(
+                    f'http_requests_total{{endpoint="{endpoint}",'
+                    f'method="{method}",status="{status}"}} {count}'
+                )
+            for name, series in self.histograms.items():
+                lines.append(f"# HELP {name} {self.HISTOGRAMS[name][1]}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, histogram in sorted(series.items()):
+                    lines.extend(histogram.render(name, labels))
+        return "\n".join(lines) + "\n"
+
+    def metrics_view(self):
+        """ Serve the metrics to a Prometheus scraper """
+        body = self.render()
+        cache = current_app.extensions.get("tasklist_cache")
+        if cache is not None:
+            lines = []
+            for name, value in sorted(cache.stats().items()):
+                lines.append(f"# TYPE tasklist_cache_{name} gauge")
+                lines.append(f"tasklist_cache_{name} {value}")
+            body += "\n".join(lines) + "\n"
+        body += render_pool_gauges(
+            current_app.extensions["sqlalchemy"].engines)
+        events = current_app.extensions.get("task_events")
+        if events is not None:
+            body += (
+                "# TYPE task_events_subscribers gauge\n"
+                f"task_events_subscribers {len(events)}\n"
+                "# TYPE task_events_evictions counter\n"
+                f"task_events_evictions {events.evictions}\n"
+            )
+        return body, 200, {
+            "Content-Type": "text/plain; version=0.0.4; charset=utf-8"
+        }
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    """ Remember when the statement started, on its own execution context
+
+    The context dies with the statement, so a statement that raises
+    leaves nothing behind on the connection.
+    """
+    if current_sql.get() is not None and context is not None:
+        context.metrics_started = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context,
+                         executemany):
+    """ Add the statement to the counters of the current request """
+    counters = current_sql.get()
+    started = getattr(context, "metrics_started", None)
+    if counters is None or started is None:
+        return
+    counters[0] += 1
+    counters[1] += time.perf_counter() - started
+
+
+def render_pool_gauges(engines):
+    """ Return the occupancy of every queue pool, labelled by bind """
+    samples = {"db_pool_size": [], "db_pool_checked_out": [],
+               "db_pool_overflow": []}
+    for bind, engine in engines.items():
+        pool = engine.pool
+        if not isinstance(pool, QueuePool):
+            continue
+        labels = f'bind="{bind or "default"}"'
+        samples["db_pool_size"].append(f"{{{labels}}} {pool.size()}")
+        samples["db_pool_checked_out"].append(
+            f"{{{labels}}} {pool.checkedout()}")
+        samples["db_pool_overflow"].append(f"{{{labels}}} {pool.overflow()}")
+    lines = []
+    for name, values in samples.items():
+        if values:
+            lines.append(f"# TYPE {name} gauge")
+            lines.extend(name + value for value in values)
+    return "".join(line + "\n" for line in lines)
+
+
+class TimedQueuePool(QueuePool):
+    """ Queue pool that records how long every checkout waited.
+
+    A growing wait means requests are starved of connections; raise
+    the pool size or max_overflow, or find who holds them.
+    """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.observe(
+                "db_pool_checkout_seconds",
+                f'bind="{self.logging_name or "default"}"',
+                time.perf_counter() - started
+            )
+
+
+metrics = Metrics()
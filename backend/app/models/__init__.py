@@ -1,12 +1,78 @@
+import sqlite3
+from datetime import datetime, timezone
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import (
+    DDL,
+    bindparam,
+    case,
+    column,
+    delete,
+    event,
+    func,
+    inspect,
+    insert,
+    literal,
+    literal_column,
+    or_,
+    select,
+    table,
+    tuple_,
+    union_all,
+    update,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
 from flask_migrate import Migrate
-from werkzeug.security import generate_password_hash, check_password_hash
+from app.buffers import WriteBehindBuffer
+from app.cache import cache
+from app.events import events
+from app.hashing import hasher
+from app.positions import key_between, keys_after
+from app.replicas import RoutingSession
 
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 migrate = Migrate()
 
 
+def utcnow():
+    """ Current time as an aware UTC datetime """
+    return datetime.now(timezone.utc)
+
+
+def dispose_engines(app):
+    """ Forget the pooled connections inherited from a parent process.
+
+    Run in every worker forked from a preloaded application; with
+    `close=False` the sockets are left to the parent instead of being
+    closed under it.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def dialect_insert(model, dialect=None):
+    """ INSERT of the current dialect, which supports ON CONFLICT """
+    name = (dialect or db.engine.dialect).name
+    if name == "postgresql":
+        return postgresql.insert(model)
+    elif name == "sqlite":
+        return sqlite.insert(model)
+    raise NotImplementedError(name)
+
+
+# Order keys compare byte by byte, whatever the database collation
+PositionType = db.String(255).with_variant(
+    db.String(255, collation="C"), "postgresql")
+
+
+def insert_ignoring_duplicates(model):
+    """ INSERT that skips rows violating a unique constraint """
+    return dialect_insert(model).on_conflict_do_nothing()
+
+
 class Base(db.Model):
     """ Model that contains base database models. """
     __abstract__ = True
@@ -15,12 +81,15 @@ class Base(db.Model):
 
     def save_to_db(self):
         """ Saving into db """
+        action = "created" if self.id is None else "updated"
         try:
             db.session.add(self)
             db.session.commit()
         except Exception as e:
             db.session.rollback()
             raise e
+        self.invalidate_cache()
+        self.publish_change(action)
 
     def update(self, **kwargs):
         """  Updating into db """
@@ -31,11 +100,23 @@ class Base(db.Model):
         except Exception as e:
             db.session.rollback()
             raise e
+        self.invalidate_cache()
+        self.publish_change("updated")
 
     def delete_from_db(self):
         """ Deleting from database """
         db.session.delete(self)
         db.session.commit()
+        self.invalidate_cache()
+        self.publish_change("deleted")
+
+    def invalidate_cache(self):
+        """ Drop cached responses built from this row """
+        pass
+
+    def publish_change(self, action):
+        """ Tell listening clients about a committed change """
+        pass
 
     @classmethod
     def find_by_id(cls, id):
@@ -49,7 +130,10 @@ class User(Base):
     email = db.Column(db.String(50), unique=True, nullable=False)
     password = db.Column(db.String(255), nullable=False)
     is_disabled = db.Column(db.Boolean, default=False)
-    task = db.relationship("Task", cascade="delete")
+    version = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0")
+    last_login_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    task = db.relationship("Task", cascade="delete", passive_deletes=True)
 
     def serialize(self):
         """ Return the user data """
@@ -62,32 +146,152 @@ class User(Base):
 
     def set_password(self, password):
         """ Setting password for user """
-        self.password = generate_password_hash(password)
+        self.password = hasher.hash(password)
 
     def check_password(self, password):
         """ Checking password for user """
-        return check_password_hash(self.password, password)
+        return hasher.check(self.password, password)
+
+    def password_needs_rehash(self):
+        """ Tell if the stored hash predates the current hashing policy """
+        return hasher.needs_rehash(self.password)
 
     @classmethod
     def find_by_email(cls, email):
         """ Find user by email address """
         return cls.query.filter_by(email=email).first()
 
+    @staticmethod
+    def find_version(user_id):
+        """ Return a token that changes whenever the user or a task changes.
+
+        The token is made of the user modification counter and the highest
+        task id, read with one query and without loading any ORM object.
+        Returns None if the user does not exist.
+        """
+        max_task_id = select(func.max(Task.id)).where(
+            Task.user_id == user_id).scalar_subquery()
+        row = db.session.execute(
+            select(User.version, max_task_id).where(User.id == user_id)
+        ).first()
+        if row is None:
+            return None
+        return "{}-{}-{}".format(user_id, row[0], row[1] or 0)
+
+    @staticmethod
+    def bump_versions(connection, user_ids):
+        """ Increase the modification counter of the given users.
+
+        Returns a dict with the new counter of every user. The counter is
+        also the change sequence given to the task rows written next, and
+        the row lock taken by the UPDATE keeps it in commit order.
+        """
+        if not user_ids:
+            return {}
+        table = User.__table__
+        result = connection.execute(
+            update(table)
+            .where(table.c.id.in_(user_ids))
+            .values(version=table.c.version + 1)
+            .returning(table.c.id, table.c.version)
+        )
+        return dict(result.all())
+
+    @staticmethod
+    def bulk_set_last_login(last_logins):
+        """ Store many last login dates with a single UPDATE.
+
+        Users deleted since they logged in match no row and are skipped.
+        """
+        table = User.__table__
+        try:
+            db.session.execute(
+                update(table)
+                .where(table.c.id == bindparam("b_id"))
+                .values(last_login_at=bindparam("b_at")),
+                [{"b_id": user_id, "b_at": logged_at}
+                 for user_id, logged_at in last_logins.items()]
+            )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise e
+
+    @staticmethod
+    def purge(user_id):
+        """ Hard delete a user with one DELETE, the database drops the tasks.
+
+        Returns True if the user existed.
+        """
+        try:
+            deleted = db.session.execute(
+                delete(User).where(User.id == user_id),
+                execution_options={"synchronize_session": False}
+            ).rowcount
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise e
+        cache.invalidate(user_id)
+        return deleted > 0
+
     @staticmethod
     def exists(email):
         """ Check if user exists """
-        user = User.find_by_email(email)
-        if user:
-            return True
-        return False
+        query = select(select(User.id).where(User.email == email).exists())
+        return db.session.scalar(query)
+
+    @staticmethod
+    def insert_if_absent(**fields):
+        """ Insert a user in one round trip unless the email is taken.
+
+        Returns the new id, or None when the email already exists.
+        """
+        statement = insert_ignoring_duplicates(User).values(
+            **fields).returning(User.id)
+        try:
+            user_id = db.session.scalar(statement)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise e
+        return user_id
+
+
+class AnchorOrderError(ValueError):
+    """ Raised when the `after` anchor of a move does not sort before
+    the `before` anchor """
 
 
 class Task(Base):
     __tablename__ = 'task'
+    __table_args__ = (
+        db.Index("ix_task_user_id_id", "user_id", "id"),
+        db.Index("ix_task_user_id_seq", "user_id", "seq"),
+        db.Index("ix_task_user_id_position", "user_id", "position", "id"),
+        db.Index(
+            "ix_task_user_id_open", "user_id",
+            postgresql_where=db.text("is_completed = false"),
+            sqlite_where=db.text("is_completed = 0"),
+        ),
+        # Archived tasks keep their id, SQLite must not hand it out again
+        {"sqlite_autoincrement": True},
+    )
     task = db.Column(db.String(100), nullable=False)
     description = db.Column(db.String(500), nullable=True)
-    is_completed = db.Column(db.Boolean, default=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    # The previous values are needed to move the task counters
+    is_completed = db.mapped_column(
+        db.Boolean, default=False, active_history=True)
+    user_id = db.mapped_column(
+        db.Integer, db.ForeignKey('user.id', ondelete="CASCADE"),
+        active_history=True)
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    seq = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # Fractional order key, see app.positions
+    position = db.Column(PositionType, nullable=False)
+
+    SERIALIZED_FIELDS = (
+        "id", "task", "description", "user_id", "is_completed")
 
     def serialize(self):
         """Retorna el valor de task"""
@@ -99,6 +303,22 @@ class Task(Base):
             "is_completed": self.is_completed
         }
     
+    def invalidate_cache(self):
+        """ Drop the cached task lists of the owner """
+        cache.invalidate(self.user_id)
+
+    def publish_change(self, action):
+        """ Push the change to the clients of the owner """
+        task = self.serialize()
+        if action == "deleted":
+            task = {"id": task["id"]}
+        events.publish(self.user_id, action, self.seq, task)
+
+    @staticmethod
+    def serialized_columns():
+        """ Return the columns of SERIALIZED_FIELDS """
+        return [getattr(Task, name) for name in Task.SERIALIZED_FIELDS]
+
     def set_as_completed(self, completed=True):
         """ Set task as completed """
         self.is_completed = completed
@@ -107,4 +327,871 @@ class Task(Base):
     @staticmethod
     def find_all_by_user_id(user_id):
         """ Find user by email address """
-        return Task.query.filter_by(user_id=user_id).all() 
+        return Task.query.filter_by(user_id=user_id).all()
+
+    @staticmethod
+    def stream_by_user_id(user_id, chunk_size=1000):
+        """ Yield the serialized columns of the user tasks in chunks.
+
+        Rows are read through a server-side cursor and never hydrated into
+        Task objects, so memory does not grow with the number of tasks.
+        """
+        query = (
+            select(*Task.serialized_columns())
+            .where(Task.user_id == user_id)
+            .order_by(Task.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        result = db.session.execute(query)
+        try:
+            for partition in result.partitions():
+                yield partition
+        finally:
+            result.close()
+
+    @staticmethod
+    def find_rows_by_user_id(user_id, columns, include_archived=False):
+        """ Find the given columns of every user task, without ORM objects.
+
+        Archived tasks are only read when `include_archived` is set.
+        """
+        query = select(*columns).where(Task.user_id == user_id)
+        if include_archived:
+            archived = select(*ArchivedTask.columns_like(columns)).where(
+                ArchivedTask.user_id == user_id)
+            return db.session.execute(
+                ArchivedTask.merge(query, archived, len(columns))).all()
+        return db.session.execute(
+            query.order_by(Task.position, Task.id)).all()
+
+    @staticmethod
+    def find_page_by_user_id(user_id, limit, after=None, columns=None,
+                             include_archived=False):
+        """ Find one page of user tasks ordered by (user_id, position, id).
+
+        `after` is the (position, id) of the last task of the previous
+        page. Returns Task objects, or plain rows when `columns` is given,
+        and a flag telling if more rows are available. Archived tasks are
+        only read when `include_archived` is set, which requires `columns`.
+        """
+        query = select(*columns) if columns else select(Task)
+        query = query.where(Task.user_id == user_id)
+        if after is not None:
+            query = query.where(tuple_(Task.position, Task.id) > after)
+        query = query.order_by(Task.position, Task.id).limit(limit + 1)
+        if include_archived:
+            # Each table gives its first page, then the pages are merged
+            archived = select(*ArchivedTask.columns_like(columns)).where(
+                ArchivedTask.user_id == user_id)
+            if after is not None:
+                archived = archived.where(
+                    tuple_(ArchivedTask.position, ArchivedTask.id) > after)
+            archived = archived.order_by(
+                ArchivedTask.position, ArchivedTask.id).limit(limit + 1)
+            query = ArchivedTask.merge(
+                query, archived, len(columns)).limit(limit + 1)
+        if columns:
+            rows = db.session.execute(query).all()
+        else:
+            rows = db.session.scalars(query).all()
+        return rows[:limit], len(rows) > limit
+
+    @staticmethod
+    def find_changes_by_user_id(user_id, since, columns):
+        """ Find the user tasks written, and the ids deleted, after `since`.
+
+        Both queries are range scans of an index on (user_id, seq).
+        Returns the task rows and the tombstone rows, as (task_id, seq),
+        ordered by sequence.
+        """
+        rows = db.session.execute(
+            select(*columns)
+            .where(Task.user_id == user_id, Task.seq > since)
+            .order_by(Task.seq, Task.id)
+        ).all()
+        deleted = db.session.execute(
+            select(TaskTombstone.task_id, TaskTombstone.seq)
+            .where(TaskTombstone.user_id == user_id,
+                   TaskTombstone.seq > since)
+            .order_by(TaskTombstone.seq)
+        ).all()
+        return rows, deleted
+
+    @staticmethod
+    def search_by_user_id(user_id, text, columns, limit, offset=0):
+        """ Find one page of the user tasks matching a full-text query.
+
+        Every word of `text` must appear in the title or the description.
+        Rows are ranked best first; returns them and a flag telling if
+        more rows are available.
+        """
+        words = text.split()
+        statement = select(*columns).where(Task.user_id == user_id)
+        dialect = db.engine.dialect.name
+        if dialect == "postgresql":
+            vector = literal_column("task.search_vector")
+            query = func.plainto_tsquery("simple", " ".join(words))
+            statement = statement.where(vector.op("@@")(query))
+            rank = func.ts_rank(vector, query).desc()
+        elif dialect == "sqlite":
+            fts = table("task_fts", column("rowid"))
+            fts_name = literal_column("task_fts")
+            # Quote every word so FTS5 operators are searched literally
+            phrase = " ".join(
+                '"{}"'.format(word.replace('"', '""')) for word in words)
+            statement = statement.join_from(
+                Task, fts, fts.c.rowid == Task.id
+            ).where(fts_name.op("MATCH")(phrase))
+            rank = func.bm25(fts_name)
+        else:
+            raise NotImplementedError(dialect)
+        statement = (
+            statement.order_by(rank, Task.id).offset(offset).limit(limit + 1)
+        )
+        rows = db.session.execute(statement).all()
+        return rows[:limit], len(rows) > limit
+
+    @staticmethod
+    def last_positions(connection, user_ids):
+        """ Return the order key of the last task of every given user """
+        return dict(connection.execute(
+            select(Task.user_id, func.max(Task.position))
+            .where(Task.user_id.in_(list(user_ids)))
+            .group_by(Task.user_id)
+        ).all())
+
+    @staticmethod
+    def position_between(user_id, id, after_id, before_id):
+        """ Compute an order key placing a task between two anchor tasks.
+
+        With one anchor, the other bound is the task next to it. Returns
+        None if a task does not belong to the user, raises
+        AnchorOrderError when the anchors are in the wrong order and
+        ValueError when no key fits between the bounds, e.g. on tied
+        positions.
+        """
+        ids = [value for value in (id, after_id, before_id) if value]
+        positions = dict(db.session.execute(
+            select(Task.id, Task.position)
+            .where(Task.id.in_(ids), Task.user_id == user_id)
+        ).all())
+        if len(positions) < len(set(ids)):
+            return None
+        if after_id and before_id and (positions[after_id], after_id) >= \
+                (positions[before_id], before_id):
+            raise AnchorOrderError(after_id, before_id)
+        others = (Task.user_id == user_id, Task.id != id)
+        low = high = None
+        if after_id:
+            low = positions[after_id]
+            high = db.session.scalar(
+                select(Task.position)
+                .where(*others, tuple_(Task.position, Task.id) >
+                       tuple_(low, after_id))
+                .order_by(Task.position, Task.id).limit(1))
+        if before_id:
+            high = positions[before_id]
+            if not after_id:
+                low = db.session.scalar(
+                    select(Task.position)
+                    .where(*others, tuple_(Task.position, Task.id) <
+                           tuple_(high, before_id))
+                    .order_by(Task.position.desc(), Task.id.desc())
+                    .limit(1))
+        position = key_between(low, high)
+        if len(position) > Task.position.type.length:
+            raise ValueError(position)
+        return position
+
+    @staticmethod
+    def move_owned(id, user_id, after_id=None, before_id=None):
+        """ Move a task of the user after and/or before other tasks.
+
+        Only the moved row is written. When the neighbour keys leave no
+        room the user's keys are rebalanced first, in the same
+        transaction. Returns the id of the moved task, None when a task
+        does not exist or belongs to another user, and raises
+        AnchorOrderError, without rebalancing, when `after_id` does not
+        sort before `before_id`.
+        """
+        try:
+            connection = db.session.connection()
+            seq = User.bump_versions(connection, [user_id]).get(user_id)
+            now = utcnow()
+            try:
+                position = Task.position_between(
+                    user_id, id, after_id, before_id)
+            except AnchorOrderError:
+                raise
+            except ValueError:
+                Task.rebalance_positions(user_id, seq, now)
+                position = Task.position_between(
+                    user_id, id, after_id, before_id)
+            row = None
+            if position is not None:
+                row = db.session.execute(
+                    update(Task)
+                    .where(Task.id == id, Task.user_id == user_id)
+                    .values(position=position, seq=seq, updated_at=now)
+                    .returning(*Task.serialized_columns())
+                    .execution_options(synchronize_session=False)
+                ).first()
+            if row is None:
+                db.session.rollback()
+                return None
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise e
+        cache.invalidate(user_id)
+        task = dict(zip(Task.SERIALIZED_FIELDS, row), position=position)
+        events.publish(user_id, "updated", seq, task)
+        return row[0]
+
+    @staticmethod
+    def rebalance_positions(user_id, seq, now):
+        """ Give the user's tasks the shortest keys, keeping their order """
+        ids = db.session.scalars(
+            select(Task.id).where(Task.user_id == user_id)
+            .order_by(Task.position, Task.id)
+        ).all()
+        if ids:
+            db.session.execute(update(Task), [
+                {"id": task_id, "position": position, "seq": seq,
+                 "updated_at": now}
+                for task_id, position in zip(ids, keys_after(None, len(ids)))
+            ])
+
+    @staticmethod
+    def rebalance(user_id):
+        """ Shorten the order keys of a user in one transaction """
+        try:
+            connection = db.session.connection()
+            seq = User.bump_versions(connection, [user_id]).get(user_id)
+            Task.rebalance_positions(user_id, seq, utcnow())
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise e
+        cache.invalidate(user_id)
+
+    @staticmethod
+    def find_users_with_long_positions(max_length):
+        """ Return the ids of the users with an order key too long """
+        return db.session.scalars(
+            select(Task.user_id).distinct()
+            .where(func.length(Task.position) > max_length)
+            .order_by(Task.user_id)
+        ).all()
+
+    @staticmethod
+    def update_owned(id, user_id, **fields):
+        """ Update a task of the user with one UPDATE ... RETURNING.
+
+        Returns the id of the updated task, or None when the task does
+        not exist or belongs to another user.
+        """
+        if not fields:
+            query = select(Task.id).where(
+                Task.id == id, Task.user_id == user_id)
+            return db.session.scalar(query)
+        statement = (
+            update(Task)
+            .where(Task.id == id, Task.user_id == user_id)
+            .values(**fields)
+            .returning(*Task.serialized_columns())
+            .execution_options(synchronize_session=False)
+        )
+        counters = None
+        if "is_completed" in fields:
+            counters = TaskStats.completion_deltas(
+                user_id, [id] if fields["is_completed"] else [], [id])
+        return Task.execute_owned(
+            statement, user_id, deleted=False, counters=counters)
+
+    @staticmethod
+    def delete_owned(id, user_id):
+        """ Delete a task of the user with one DELETE ... RETURNING.
+
+        Returns the id of the deleted task, or None when the task does
+        not exist or belongs to another user.
+        """
+        statement = (
+            delete(Task)
+            .where(Task.id == id, Task.user_id == user_id)
+            .returning(Task.id, Task.is_completed)
+            .execution_options(synchronize_session=False)
+        )
+        return Task.execute_owned(statement, user_id, deleted=True)
+
+    @staticmethod
+    def execute_owned(statement, user_id, deleted, counters=None):
+        """ Run a one-row mutation and notify cache, versions and clients.
+
+        The change sequence is taken before the statement runs, so an
+        UPDATE can stamp it on the row; it is rolled back if no row of
+        the user matched. `counters` is a query of the task counter
+        deltas of an UPDATE, applied before the row changes.
+        """
+        try:
+            connection = db.session.connection()
+            seq = User.bump_versions(connection, [user_id]).get(user_id)
+            if deleted:
+                row = db.session.execute(statement).first()
+                if row is not None:
+                    TaskTombstone.record(connection, user_id, [row[0]], seq)
+                    TaskStats.apply(
+                        connection, {user_id: (-1, -bool(row[1]))})
+            else:
+                if counters is not None:
+                    TaskStats.apply_query(connection, counters)
+                row = db.session.execute(
+                    statement.values(seq=seq, updated_at=utcnow())).first()
+            if row is None:
+                db.session.rollback()
+                return None
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise e
+        cache.invalidate(user_id)
+        if deleted:
+            events.publish(user_id, "deleted", seq, {"id": row[0]})
+        else:
+            task = dict(zip(Task.SERIALIZED_FIELDS, row))
+            events.publish(user_id, "updated", seq, task)
+        return row[0]
+
+    @staticmethod
+    def find_owned_ids(user_id, ids):
+        """ Return the subset of ids that belong to the user """
+        if not ids:
+            return set()
+        query = select(Task.id).where(
+            Task.id.in_(ids), Task.user_id == user_id)
+        return set(db.session.scalars(query))
+
+    @staticmethod
+    def bulk_apply(user_id, creates, updates, delete_ids):
+        """ Apply many task mutations of one user in a single transaction.
+
+        `creates` is a list of column dicts, `updates` a list of column
+        dicts that include the primary key and `delete_ids` a list of ids.
+        Returns the ids of the created tasks, in the order of `creates`.
+        """
+        try:
+            connection = db.session.connection()
+            seq = User.bump_versions(connection, [user_id]).get(user_id)
+            stamp = {"seq": seq, "updated_at": utcnow()}
+            total = len(creates)
+            completed = sum(bool(row.get("is_completed")) for row in creates)
+            deleted_ids = []
+            created_ids = []
+            if creates:
+                positions = keys_after(
+                    Task.last_positions(connection, [user_id]).get(user_id),
+                    len(creates))
+                statement = insert(Task).returning(
+                    Task.id, sort_by_parameter_order=True)
+                created_ids = list(db.session.scalars(statement, [
+                    dict(row, position=position, **stamp)
+                    for row, position in zip(creates, positions)
+                ]))
+            if updates:
+                flagged = [row for row in updates if "is_completed" in row]
+                if flagged:
+                    TaskStats.apply_query(
+                        connection, TaskStats.completion_deltas(
+                            user_id,
+                            [row["id"] for row in flagged
+                             if row["is_completed"]],
+                            [row["id"] for row in flagged]))
+                db.session.execute(
+                    update(Task), [dict(row, **stamp) for row in updates])
+            if delete_ids:
+                # Count the rows really deleted, not the ids asked for
+                deleted = db.session.execute(
+                    delete(Task).where(Task.id.in_(delete_ids))
+                    .returning(Task.id, Task.is_completed),
+                    execution_options={"synchronize_session": False}
+                ).all()
+                deleted_ids = [row[0] for row in deleted]
+                total -= len(deleted)
+                completed -= sum(bool(row[1]) for row in deleted)
+                TaskTombstone.record(connection, user_id, deleted_ids, seq)
+            TaskStats.apply(connection, {user_id: (total, completed)})
+            written = {}
+            if created_ids or updates:
+                written_ids = created_ids + [row["id"] for row in updates]
+                written = {
+                    row[0]: dict(zip(Task.SERIALIZED_FIELDS, row))
+                    for row in db.session.execute(
+                        select(*Task.serialized_columns())
+                        .where(Task.id.in_(written_ids))
+                    )
+                }
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise e
+        cache.invalidate(user_id)
+        for task_id in created_ids:
+            events.publish(user_id, "created", seq, written[task_id])
+        for row in updates:
+            events.publish(user_id, "updated", seq, written[row["id"]])
+        for task_id in deleted_ids:
+            events.publish(user_id, "deleted", seq, {"id": task_id})
+        return created_ids
+
+
+# Full-text search over task titles and descriptions, which the model
+# does not map: a generated tsvector column with a GIN index on Postgres,
+# an FTS5 table kept in sync by triggers on SQLite.
+TASK_SEARCH_DDL = {
+    "postgresql": [
+        "ALTER TABLE task ADD COLUMN search_vector tsvector"
+        " GENERATED ALWAYS AS (to_tsvector('simple',"
+        " coalesce(task, '') || ' ' || coalesce(description, ''))) STORED",
+        "CREATE INDEX ix_task_search_vector ON task"
+        " USING gin (search_vector)",
+    ],
+    "sqlite": [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS task_fts USING fts5("
+        "task, description, content='task', content_rowid='id')",
+        "CREATE TRIGGER task_fts_insert AFTER INSERT ON task BEGIN"
+        " INSERT INTO task_fts (rowid, task, description)"
+        " VALUES (new.id, new.task, new.description); END",
+        "CREATE TRIGGER task_fts_delete AFTER DELETE ON task BEGIN"
+        " INSERT INTO task_fts (task_fts, rowid, task, description)"
+        " VALUES ('delete', old.id, old.task, old.description); END",
+        "CREATE TRIGGER task_fts_update"
+        " AFTER UPDATE OF task, description ON task BEGIN"
+        " INSERT INTO task_fts (task_fts, rowid, task, description)"
+        " VALUES ('delete', old.id, old.task, old.description);"
+        " INSERT INTO task_fts (rowid, task, description)"
+        " VALUES (new.id, new.task, new.description); END",
+    ],
+}
+
+for dialect, statements in TASK_SEARCH_DDL.items():
+    for statement in statements:
+        event.listen(
+            Task.__table__, "after_create",
+            DDL(statement).execute_if(dialect=dialect))
+event.listen(
+    Task.__table__, "after_drop",
+    DDL("DROP TABLE IF EXISTS task_fts").execute_if(dialect="sqlite"))
+
+
+class TaskTombstone(Base):
+    """ Record of a deleted task, kept for clients syncing changes """
+    __tablename__ = 'task_tombstone'
+    __table_args__ = (
+        db.Index("ix_task_tombstone_user_id_seq", "user_id", "seq"),
+    )
+    task_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(
+        db.Integer, db.ForeignKey('user.id', ondelete="CASCADE"),
+        nullable=False)
+    seq = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime(timezone=True), nullable=False)
+
+    @staticmethod
+    def record(connection, user_id, task_ids, seq):
+        """ Insert the tombstones of tasks deleted with one sequence """
+        if not task_ids:
+            return
+        deleted_at = utcnow()
+        connection.execute(insert(TaskTombstone.__table__), [
+            {"task_id": task_id, "user_id": user_id, "seq": seq,
+             "deleted_at": deleted_at}
+            for task_id in task_ids
+        ])
+
+
+class ArchivedTask(Base):
+    """ Completed task moved out of the task table.
+
+    Keeps the id and every column of the task, so the task table and its
+    indexes only hold the rows read by the task list. Archived tasks
+    still count in the task counters.
+    """
+    __tablename__ = 'task_archive'
+    __table_args__ = (
+        db.Index("ix_task_archive_user_id_id", "user_id", "id"),
+        db.Index(
+            "ix_task_archive_user_id_position", "user_id", "position", "id"),
+    )
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    task = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.String(500), nullable=True)
+    is_completed = db.Column(db.Boolean, nullable=False)
+    user_id = db.Column(
+        db.Integer, db.ForeignKey('user.id', ondelete="CASCADE"))
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    seq = db.Column(db.Integer, nullable=False)
+    position = db.Column(PositionType, nullable=False)
+    archived_at = db.Column(db.DateTime(timezone=True), nullable=False)
+
+    @staticmethod
+    def columns_like(columns):
+        """ Return the archive columns matching task columns """
+        return [getattr(ArchivedTask, column.key) for column in columns]
+
+    @staticmethod
+    def merge(query, archived, size):
+        """ UNION ALL a task query and an archive query, in list order.
+
+        Both select the same `size` columns; the order key is added to
+        each side and left out of the merged rows.
+        """
+        sides = []
+        for model, side in ((Task, query), (ArchivedTask, archived)):
+            side = side.add_columns(
+                model.position.label("sort_position"),
+                model.id.label("sort_id"))
+            sides.append(select(side.subquery()))
+        both = union_all(*sides).subquery()
+        return (
+            select(*list(both.c)[:size])
+            .order_by(both.c.sort_position, both.c.sort_id)
+        )
+
+    @staticmethod
+    def archive(older_than, chunk_size=1000, progress=None):
+        """ Move the completed tasks last written before a date, by chunks.
+
+        Every chunk is its own short transaction. The owners' versions
+        are bumped first, in the lock order of the other task writes, then
+        the tasks are deleted with RETURNING and inserted in the archive.
+        They leave the task list, so synced clients get a tombstone and a
+        deleted event, as for any delete.
+        Tasks written before change tracking have no date and are moved.
+        Returns the number of archived tasks.
+        """
+        old = (Task.is_completed.is_(True),
+               or_(Task.updated_at < older_than, Task.updated_at.is_(None)))
+        moved = 0
+        while True:
+            try:
+                candidates = db.session.execute(
+                    select(Task.id, Task.user_id).where(*old)
+                    .order_by(Task.id).limit(chunk_size)
+                ).all()
+                if not candidates:
+                    db.session.rollback()
+                    break
+                user_ids = sorted({user_id for _, user_id in candidates})
+                connection = db.session.connection()
+                versions = User.bump_versions(connection, user_ids)
+                rows = db.session.execute(
+                    delete(Task)
+                    .where(Task.id.in_([id for id, _ in candidates]), *old)
+                    .returning(*Task.__table__.c),
+                    execution_options={"synchronize_session": False}
+                ).mappings().all()
+                archived_at = utcnow()
+                archived = {}
+                for row in rows:
+                    archived.setdefault(row["user_id"], []).append(row["id"])
+                if rows:
+                    connection.execute(insert(ArchivedTask.__table__), [
+                        dict(row, archived_at=archived_at) for row in rows
+                    ])
+                for user_id, task_ids in archived.items():
+                    TaskTombstone.record(
+                        connection, user_id, task_ids, versions[user_id])
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                raise e
+            for user_id in user_ids:
+                cache.invalidate(user_id)
+            for user_id, task_ids in archived.items():
+                for task_id in task_ids:
+                    events.publish(
+                        user_id, "deleted", versions[user_id], {"id": task_id})
+            moved += len(rows)
+            if progress is not None:
+                progress(moved)
+            if len(candidates) < chunk_size:
+                break
+        return moved
+
+    @staticmethod
+    def restore(id, user_id):
+        """ Move an archived task of the user back to the task list.
+
+        The task keeps its id and position and is written with a new
+        change sequence; its tombstone is dropped, so the changes feed
+        returns it as a written task. Returns None if the user has no
+        such archived task.
+        """
+        try:
+            connection = db.session.connection()
+            seq = User.bump_versions(connection, [user_id]).get(user_id)
+            row = db.session.execute(
+                delete(ArchivedTask)
+                .where(ArchivedTask.id == id, ArchivedTask.user_id == user_id)
+                .returning(*ArchivedTask.__table__.c),
+                execution_options={"synchronize_session": False}
+            ).mappings().first()
+            if row is None:
+                db.session.rollback()
+                return None
+            task = {key: row[key] for key in Task.__table__.c.keys()}
+            task.update(seq=seq, updated_at=utcnow())
+            connection.execute(insert(Task.__table__), task)
+            connection.execute(
+                delete(TaskTombstone.__table__)
+                .where(TaskTombstone.user_id == user_id,
+                       TaskTombstone.task_id == id))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise e
+        cache.invalidate(user_id)
+        events.publish(user_id, "created", seq, {
+            name: task[name] for name in Task.SERIALIZED_FIELDS})
+        return id
+
+
+class TaskStats(db.Model):
+    """ Task counters of a user, moved by every task write.
+
+    Reading them is a primary key lookup, whatever the number of tasks.
+    Users without a row have no tasks.
+    """
+    __tablename__ = 'task_stats'
+    user_id = db.Column(
+        db.Integer, db.ForeignKey('user.id', ondelete="CASCADE"),
+        primary_key=True)
+    total = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0")
+    completed = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0")
+
+    @staticmethod
+    def apply(connection, deltas):
+        """ Add (total, completed) deltas to the counters of many users """
+        rows = [
+            {"user_id": user_id, "total": total, "completed": completed}
+            for user_id, (total, completed) in deltas.items()
+            if total or completed
+        ]
+        if rows:
+            connection.execute(TaskStats.adding(dialect_insert(
+                TaskStats.__table__, connection.dialect)), rows)
+
+    @staticmethod
+    def apply_query(connection, query):
+        """ Add the (user_id, total, completed) deltas selected by a query.
+
+        Lets a delta depend on rows about to change without reading them
+        first.
+        """
+        connection.execute(TaskStats.adding(
+            dialect_insert(TaskStats.__table__, connection.dialect)
+            .from_select(["user_id", "total", "completed"], query)))
+
+    @staticmethod
+    def adding(statement):
+        """ Make an INSERT of counters add them to the existing ones """
+        table = TaskStats.__table__
+        return statement.on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={
+                "total": table.c.total + statement.excluded.total,
+                "completed":
+                    table.c.completed + statement.excluded.completed,
+            }
+        )
+
+    @staticmethod
+    def completion_deltas(user_id, completed_ids, task_ids):
+        """ Query the counter delta of setting the completion of tasks.
+
+        Tasks of `task_ids` become completed when they are in
+        `completed_ids` and open otherwise.
+        """
+        now_completed = case((Task.id.in_(completed_ids), 1), else_=0)
+        was_completed = case((Task.is_completed, 1), else_=0)
+        return (
+            select(Task.user_id, literal(0),
+                   func.sum(now_completed - was_completed))
+            .where(Task.id.in_(task_ids), Task.user_id == user_id)
+            .group_by(Task.user_id)
+        )
+
+    @staticmethod
+    def find_by_user_id(user_id):
+        """ Return the (total, completed) counters of a user.
+
+        Returns None if the user does not exist.
+        """
+        row = db.session.execute(
+            select(User.id, TaskStats.total, TaskStats.completed)
+            .outerjoin(TaskStats, TaskStats.user_id == User.id)
+            .where(User.id == user_id)
+        ).first()
+        if row is None:
+            return None
+        return row[1] or 0, row[2] or 0
+
+    @staticmethod
+    def rebuild():
+        """ Recount every user's tasks and rewrite the counters that drifted.
+
+        Archived tasks are counted too. Returns (user_id, stored, counted)
+        for every drifted user, the counters being (total, completed)
+        pairs. On Postgres the table is locked first, so writers that
+        already moved a counter are counted and the others apply their
+        delta on the rebuilt value.
+        """
+        try:
+            connection = db.session.connection()
+            if connection.dialect.name == "postgresql":
+                connection.execute(db.text(
+                    "LOCK TABLE task_stats IN SHARE ROW EXCLUSIVE MODE"))
+            tasks = union_all(
+                select(Task.user_id, Task.is_completed),
+                select(ArchivedTask.user_id, ArchivedTask.is_completed)
+            ).subquery()
+            counted = {
+                user_id: (total, completed or 0)
+                for user_id, total, completed in connection.execute(
+                    select(
+                        tasks.c.user_id, func.count(),
+                        func.sum(case((tasks.c.is_completed, 1), else_=0)))
+                    .where(tasks.c.user_id.is_not(None))
+                    .group_by(tasks.c.user_id)
+                )
+            }
+            stored = {
+                user_id: (total, completed)
+                for user_id, total, completed in connection.execute(
+                    select(TaskStats.user_id, TaskStats.total,
+                           TaskStats.completed))
+            }
+            drift = []
+            for user_id in sorted(counted.keys() | stored.keys()):
+                before = stored.get(user_id, (0, 0))
+                after = counted.get(user_id, (0, 0))
+                if before != after:
+                    drift.append((user_id, before, after))
+            if drift:
+                statement = dialect_insert(TaskStats.__table__)
+                connection.execute(statement.on_conflict_do_update(
+                    index_elements=[TaskStats.user_id],
+                    set_={
+                        "total": statement.excluded.total,
+                        "completed": statement.excluded.completed,
+                    }
+                ), [
+                    {"user_id": user_id, "total": total,
+                     "completed": completed}
+                    for user_id, _, (total, completed) in drift
+                ])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise e
+        return drift
+
+
+@event.listens_for(Engine, "connect")
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    """ SQLite only enforces foreign keys, and ON DELETE CASCADE, if asked """
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+@event.listens_for(Session, "before_flush")
+def bump_user_versions(session, flush_context, instances):
+    """ Keep User.version in step with every flushed user or task change.
+
+    Written tasks are stamped with the new counter as change sequence and
+    deleted tasks leave a tombstone with it.
+    """
+    users, written = [], []
+    deleted = [obj for obj in session.deleted if isinstance(obj, Task)]
+    for obj in session.dirty:
+        if isinstance(obj, User) and session.is_modified(obj):
+            users.append(obj)
+        elif isinstance(obj, Task) and session.is_modified(obj):
+            written.append(obj)
+    written.extend(obj for obj in session.new if isinstance(obj, Task))
+    user_ids = {obj.user_id for obj in written + deleted}
+    # Users are bumped in SQL too, a loaded version may be stale
+    user_ids.update(obj.id for obj in users)
+    user_ids.discard(None)
+    connection = session.connection()
+    versions = User.bump_versions(connection, user_ids)
+    for obj in users:
+        if obj.id in versions:
+            obj.version = versions[obj.id]
+    now = utcnow()
+    for obj in written:
+        if obj.user_id in versions:
+            obj.seq = versions[obj.user_id]
+            obj.updated_at = now
+    for obj in deleted:
+        if obj.user_id in versions:
+            obj.seq = versions[obj.user_id]
+            TaskTombstone.record(
+                connection, obj.user_id, [obj.id], versions[obj.user_id])
+
+
+@event.listens_for(Session, "before_flush")
+def place_new_tasks(session, flush_context, instances):
+    """ Append new tasks at the end of their user's list, in add order """
+    tasks = sorted(
+        (obj for obj in session.new
+         if isinstance(obj, Task) and obj.position is None),
+        key=lambda obj: inspect(obj).insert_order)
+    if not tasks:
+        return
+    last = Task.last_positions(
+        session.connection(), {obj.user_id for obj in tasks})
+    for obj in tasks:
+        obj.position = last[obj.user_id] = key_between(
+            last.get(obj.user_id), None)
+
+
+def previous_value(obj, key):
+    """ Value of an attribute before the changes waiting to be flushed """
+    history = inspect(obj).attrs[key].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(obj, key)
+
+
+@event.listens_for(Session, "before_flush")
+def count_user_tasks(session, flush_context, instances):
+    """ Move the task counters of the users by the flushed task changes """
+    deltas = {}
+
+    def add(user_id, completed, sign):
+        if user_id is not None:
+            total, done = deltas.get(user_id, (0, 0))
+            deltas[user_id] = (total + sign, done + sign * bool(completed))
+
+    for obj in session.new:
+        if isinstance(obj, Task):
+            add(obj.user_id, obj.is_completed, 1)
+    for obj in session.deleted:
+        if isinstance(obj, Task):
+            add(previous_value(obj, "user_id"),
+                previous_value(obj, "is_completed"), -1)
+    for obj in session.dirty:
+        if isinstance(obj, Task) and session.is_modified(obj):
+            add(previous_value(obj, "user_id"),
+                previous_value(obj, "is_completed"), -1)
+            add(obj.user_id, obj.is_completed, 1)
+    if deltas:
+        TaskStats.apply(session.connection(), deltas)
+
+
+last_logins = WriteBehindBuffer("last_logins", User.bulk_set_last_login)
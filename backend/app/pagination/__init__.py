@@ -0,0 +1,43 @@
+import base64
+import binascii
+
+
+class PaginationError(ValueError):
+    """ Raised when the pagination arguments can not be used """
+    pass
+
+
+def encode_cursor(*values):
+    """ Build an opaque cursor from the key of the last returned row """
+    raw = ":".join(str(value) for value in values).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, size, types=None):
+    """ Return the key stored in an opaque cursor.
+
+    Values are integers unless `types` gives a converter per value.
+    """
+    types = types or (int,) * size
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        parts = raw.split(":")
+        if len(parts) != size:
+            raise PaginationError(cursor)
+        values = tuple(
+            convert(value) for convert, value in zip(types, parts))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise PaginationError(cursor)
+    return values
+
+
+def get_page_args(args, default_limit, max_limit):
+    """ Read and validate the `limit` and `after` query parameters """
+    try:
+        limit = int(args.get("limit", default_limit))
+    except (TypeError, ValueError):
+        raise PaginationError(args.get("limit"))
+    if limit < 1:
+        raise PaginationError(limit)
+    return min(limit, max_limit), args.get("after")
@@ -0,0 +1,138 @@
+""" Fractional order keys.
+
+A key is a variable length integer followed by an optional fraction,
+written with base 62 digits so that comparing keys as strings compares
+the numbers. The first character gives the length of the integer:
+`a` to `z` are the non negative integers of 1 to 26 digits, `Z` to `A`
+the negative ones. Appending takes the next integer, so keys grow with
+the logarithm of the number of rows; a key between two others only
+lengthens the fraction, until `rebalance` gives short keys back.
+"""
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+BASE = len(DIGITS)
+FIRST_KEY = "a0"
+SMALLEST_INTEGER = "A" + "0" * 26
+
+
+def integer_length(head):
+    """ Number of characters of the integer starting with `head` """
+    if "a" <= head <= "z":
+        return ord(head) - ord("a") + 2
+    if "A" <= head <= "Z":
+        return ord("Z") - ord(head) + 2
+    raise ValueError(f"Invalid order key head: {head}")
+
+
+def split_key(key):
+    """ Return the integer and the fraction of a key """
+    if not key:
+        raise ValueError("Empty order key")
+    size = integer_length(key[0])
+    if size > len(key) or key.endswith("0") and len(key) > size:
+        raise ValueError(f"Invalid order key: {key}")
+    return key[:size], key[size:]
+
+
+def increment_integer(integer):
+    """ Next integer, None past the largest one """
+    head, digits = integer[0], list(integer[1:])
+    for n in range(len(digits) - 1, -1, -1):
+        value = DIGITS.index(digits[n]) + 1
+        if value < BASE:
+            digits[n] = DIGITS[value]
+            return head + "".join(digits)
+        digits[n] = "0"
+    if head == "Z":
+        return "a0"
+    if head == "z":
+        return None
+    head = chr(ord(head) + 1)
+    if head > "a":
+        digits.append("0")
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def decrement_integer(integer):
+    """ Previous integer, None before the smallest one """
+    head, digits = integer[0], list(integer[1:])
+    for n in range(len(digits) - 1, -1, -1):
+        value = DIGITS.index(digits[n]) - 1
+        if value >= 0:
+            digits[n] = DIGITS[value]
+            return head + "".join(digits)
+        digits[n] = DIGITS[-1]
+    if head == "a":
+        return "Z" + DIGITS[-1]
+    if head == "A":
+        return None
+    head = chr(ord(head) - 1)
+    if head < "Z":
+        digits.append(DIGITS[-1])
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def midpoint(low, high):
+    """ Fraction between two fractions, `high` None meaning one """
+    if high is not None:
+        common = 0
+        while (low[common] if common < len(low) else "0") == high[common]:
+            common += 1
+        if common:
+            return high[:common] + midpoint(low[common:], high[common:])
+    low_digit = DIGITS.index(low[0]) if low else 0
+    high_digit = DIGITS.index(high[0]) if high is not None else BASE
+    if high_digit - low_digit > 1:
+        return DIGITS[(low_digit + high_digit + 1) // 2]
+    if high is not None and len(high) > 1:
+        return high[:1]
+    return DIGITS[low_digit] + midpoint(low[1:], None)
+
+
+def key_between(low, high):
+    """ Return a key sorting after `low` and before `high`.
+
+    Either bound can be None for the start or the end of the list.
+    Raises ValueError unless `low` sorts before `high`.
+    """
+    if low is not None and high is not None and low >= high:
+        raise ValueError(f"{low} does not sort before {high}")
+    if low is None and high is None:
+        return FIRST_KEY
+    if low is None:
+        integer, fraction = split_key(high)
+        if integer == SMALLEST_INTEGER:
+            return integer + midpoint("", fraction)
+        if integer < high:
+            return integer
+        previous = decrement_integer(integer)
+        if previous is None:
+            raise ValueError("No order key before the smallest one")
+        return previous
+    integer, fraction = split_key(low)
+    if high is None:
+        following = increment_integer(integer)
+        if following is None:
+            return integer + midpoint(fraction, None)
+        return following
+    high_integer, high_fraction = split_key(high)
+    if integer == high_integer:
+        return integer + midpoint(fraction, high_fraction)
+    following = increment_integer(integer)
+    if following is None:
+        raise ValueError("No order key after the largest one")
+    if following < high:
+        return following
+    return integer + midpoint(fraction, None)
+
+
+def keys_after(low, count):
+    """ Return `count` increasing keys sorting after `low` """
+    keys = []
+    for _ in range(count):
+        low = key_between(low, None)
+        keys.append(low)
+    return keys
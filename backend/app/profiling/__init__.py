@@ -0,0 +1,284 @@
+import cProfile
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from itsdangerous import BadSignature, TimestampSigner
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# Statements, as [statement, seconds], run while a capture is active
+current_statements = ContextVar("current_statements", default=None)
+
+
+class FunctionProfiler:
+    """ Deterministic profile of every Python call, saved as .prof """
+    extension = ".prof"
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def save(self, path):
+        self.profile.dump_stats(path)
+
+
+class StackSampler:
+    """ Sample the stack of the calling thread at a fixed interval.
+
+    Costs one stack walk per interval instead of a hook on every call.
+    Samples are saved as collapsed stacks, `outer;inner count` lines,
+    the input of flame graph tools.
+    """
+    extension = ".collapsed"
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.thread_id = None
+
+    def start(self):
+        self.thread_id = threading.get_ident()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        """ Record the stack of the sampled thread until stopped """
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append("{} ({}:{})".format(
+                    code.co_name, os.path.basename(code.co_filename),
+                    code.co_firstlineno))
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as stream:
+            for stack, count in self.stacks.most_common():
+                stream.write(f"{stack} {count}\n")
+
+
+class Capture:
+    """ One profiling run: the profile of the code and the SQL it ran """
+
+    def __init__(self, mode="cprofile", interval=0.001):
+        if mode == "cprofile":
+            self.profile = FunctionProfiler()
+        elif mode == "sample":
+            self.profile = StackSampler(interval)
+        else:
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        self.mode = mode
+        self.statements = []
+        self.elapsed = None
+
+    def __enter__(self):
+        listen_statements()
+        self.token = current_statements.set(self.statements)
+        self.started = time.perf_counter()
+        self.profile.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profile.stop()
+        self.elapsed = time.perf_counter() - self.started
+        current_statements.reset(self.token)
+
+    def slowest_statements(self, top):
+        """ Group the statements by text, slowest total time first """
+        totals = {}
+        for statement, seconds in self.statements:
+            count, total, slowest = totals.get(statement, (0, 0.0, 0.0))
+            totals[statement] = (
+                count + 1, total + seconds, max(slowest, seconds))
+        ranked = sorted(
+            totals.items(), key=lambda item: item[1][1], reverse=True)
+        return [
+            {"statement": statement, "count": count,
+             "total_s": round(total, 6), "max_s": round(slowest, 6)}
+            for statement, (count, total, slowest) in ranked[:top]
+        ]
+
+
+class Profiler:
+    """ Opt-in profiling of single requests.
+
+    A request is profiled when PROFILING_ENABLED is set, when it wins
+    the PROFILING_SAMPLE_RATE draw or when it carries a token signed
+    with PROFILING_SECRET in the PROFILING_HEADER header. The profile
+    and a JSON summary with the slowest SQL statements are written to
+    PROFILING_DIR, which keeps the last PROFILING_MAX_PROFILES runs, and
+    the response names them in an X-Profile header. Only one request is
+    profiled at a time per process.
+    """
+
+    def __init__(self, app=None):
+        self.lock = threading.Lock()
+        self.blueprint = "main"
+        self.signer = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """ Hook the request and SQL events when profiling may happen """
+        app.extensions["profiler"] = self
+        config = app.config
+        self.always = config.get("PROFILING_ENABLED", False)
+        self.sample_rate = config.get("PROFILING_SAMPLE_RATE", 0)
+        secret = config.get("PROFILING_SECRET")
+        self.signer = TimestampSigner(secret, salt="profiling") \
+            if secret else None
+        self.header = config.get("PROFILING_HEADER", "X-Profile-Token")
+        self.token_max_age = config.get("PROFILING_TOKEN_MAX_AGE", 3600)
+        self.mode = config.get("PROFILING_MODE", "cprofile")
+        self.interval = config.get("PROFILING_SAMPLE_INTERVAL", 0.001)
+        self.directory = config.get("PROFILING_DIR")
+        self.max_profiles = config.get("PROFILING_MAX_PROFILES", 50)
+        self.top = config.get("PROFILING_TOP_STATEMENTS", 10)
+        if not (self.always or self.sample_rate > 0 or self.signer):
+            return
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        app.teardown_request(self.teardown_request)
+
+    def make_token(self):
+        """ Return a header value that asks for a profile """
+        return self.signer.sign("profile").decode()
+
+    def wants_profile(self):
+        """ Tell if the current request must be profiled """
+        token = request.headers.get(self.header)
+        if token and self.signer is not None:
+            try:
+                self.signer.unsign(token, max_age=self.token_max_age)
+                return True
+            except BadSignature:
+                pass
+        if self.always:
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def before_request(self):
+        """ Start profiling the request if it was asked for """
+        if request.blueprint != self.blueprint or not self.wants_profile():
+            return
+        if not self.lock.acquire(blocking=False):
+            return
+        capture = Capture(self.mode, self.interval)
+        request.environ["profiling.capture"] = capture
+        capture.__enter__()
+
+    def after_request(self, response):
+        """ Save the profile and name it in the response """
+        capture = request.environ.pop("profiling.capture", None)
+        if capture is None:
+            return response
+        try:
+            capture.__exit__(None, None, None)
+            name = self.save(capture, {
+                "method": request.method,
+                # The query string may hold a token
+                "path": request.path,
+                "endpoint": request.endpoint,
+                "status": response.status_code,
+            })
+            response.headers["X-Profile"] = name
+        finally:
+            self.lock.release()
+        return response
+
+    def teardown_request(self, exception):
+        """ Stop a profile left running by an unhandled error """
+        capture = request.environ.pop("profiling.capture", None)
+        if capture is not None:
+            capture.__exit__(None, None, None)
+            self.lock.release()
+
+    def save(self, capture, details):
+        """ Write the profile and its summary, then rotate the directory """
+        os.makedirs(self.directory, exist_ok=True)
+        # Sorting the names sorts the runs by time
+        name = "{:%Y%m%d-%H%M%S-%f}-{}-{}".format(
+            datetime.now(), os.getpid(), details.get("endpoint") or "replay")
+        stem = os.path.join(self.directory, name)
+        capture.profile.save(stem + capture.profile.extension)
+        summary = dict(
+            details,
+            mode=capture.mode,
+            duration_s=round(capture.elapsed, 6),
+            sql_statements=len(capture.statements),
+            sql_s=round(sum(seconds for _, seconds in capture.statements), 6),
+            slowest_sql=capture.slowest_statements(self.top),
+        )
+        with open(stem + ".json", "w", encoding="utf-8") as stream:
+            json.dump(summary, stream, indent=2)
+        self.rotate()
+        return name
+
+    def rotate(self):
+        """ Delete the oldest runs beyond PROFILING_MAX_PROFILES
+
+        A bound of 0 or less keeps no run at all.
+        """
+        runs = {}
+        for entry in os.scandir(self.directory):
+            stem = os.path.splitext(entry.name)[0]
+            runs.setdefault(stem, []).append(entry.path)
+        stale = max(len(runs) - self.max_profiles, 0)
+        for name in sorted(runs)[:stale]:
+            for path in runs[name]:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+def listen_statements():
+    """ Time the statements of every engine, once per process """
+    if not event.contains(
+            Engine, "before_cursor_execute", before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", after_cursor_execute)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    """ Remember when the statement started """
+    if current_statements.get() is not None:
+        conn.info.setdefault("profiling.started", []).append(
+            time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context,
+                         executemany):
+    """ Add the statement to the capture of the current context """
+    statements = current_statements.get()
+    started = conn.info.get("profiling.started")
+    if statements is None or not started:
+        return
+    statements.append((statement, time.perf_counter() - started.pop()))
+
+
+profiler = Profiler()
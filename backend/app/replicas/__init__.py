@@ -0,0 +1,151 @@
+import math
+import random
+import threading
+import time
+from functools import wraps
+from flask import current_app, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from flask_jwt_extended.exceptions import JWTExtendedException
+from flask_sqlalchemy.session import Session
+from itsdangerous import BadData, URLSafeSerializer
+from jwt.exceptions import PyJWTError
+
+
+# Where a client carries the end of its stickiness between workers
+STICKY_COOKIE = "read_primary"
+STICKY_HEADER = "X-Read-Primary"
+
+
+class RoutingSession(Session):
+    """ Session that can send the SELECTs of a request to a replica.
+
+    Reads go to the bind named in `info["replica"]` when it is set.
+    Flushes and every other statement go to the primary, and turn the
+    replica off for the rest of the request.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replica = self.info.get("replica")
+        if replica is not None and bind is None:
+            if not self._flushing and getattr(clause, "is_select", False):
+                return self._db.engines[replica]
+            # Once the request writes, it reads its own writes
+            self.info.pop("replica")
+        if bind is None and self.bind is not None:
+            # Bound to a connection, e.g. by the test harness
+            return self.bind
+        return super().get_bind(
+            mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ReplicaRouter:
+    """ Choose the database read by read-only requests.
+
+    Replicas are added as SQLALCHEMY_BINDS named replica_<n>. A client
+    that wrote something keeps reading from the primary for
+    REPLICA_STICKY_SECONDS so it sees its own writes despite the lag.
+    The write response gives the client a signed token, as a cookie and
+    a header, that any worker accepts until the window ends; clients
+    that drop both are still sticky on the worker that served the write.
+    """
+
+    def __init__(self, app=None):
+        self.binds = []
+        self.window = 5
+        self.sticky = {}
+        self.lock = threading.Lock()
+        self.serializer = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """ Add a bind per REPLICA_DATABASE_URIS entry, before db.init_app """
+        options = app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {})
+        binds = dict(app.config.get("SQLALCHEMY_BINDS", {}))
+        self.binds = []
+        for n, uri in enumerate(app.config.get("REPLICA_DATABASE_URIS", [])):
+            key = f"replica_{n}"
+            binds[key] = dict(options, url=uri, pool_logging_name=key)
+            self.binds.append(key)
+        app.config["SQLALCHEMY_BINDS"] = binds
+        self.window = app.config.get("REPLICA_STICKY_SECONDS", 5)
+        self.sticky = {}
+        self.serializer = URLSafeSerializer(
+            app.config["SECRET_KEY"], salt="replicas")
+        app.extensions["replicas"] = self
+
+    def stick(self, identity, response=None):
+        """ Send the reads of a client to the primary for a while.
+
+        The token handed out in `response` carries the wall clock end of
+        the window, which every worker can check.
+        """
+        now = time.monotonic()
+        with self.lock:
+            self.sticky[identity] = now + self.window
+            if len(self.sticky) > 1024:
+                self.sticky = {
+                    key: until for key, until in self.sticky.items()
+                    if until > now
+                }
+        if response is not None:
+            token = self.serializer.dumps(
+                [identity, time.time() + self.window])
+            response.set_cookie(
+                STICKY_COOKIE, token, max_age=math.ceil(self.window),
+                httponly=True, samesite="Lax")
+            response.headers[STICKY_HEADER] = token
+
+    def is_sticky(self, identity, token=None):
+        """ Tell if a client wrote recently """
+        with self.lock:
+            until = self.sticky.get(identity)
+        if until is not None and until > time.monotonic():
+            return True
+        if not token:
+            return False
+        try:
+            owner, until = self.serializer.loads(token)
+        except (BadData, TypeError, ValueError):
+            return False
+        return owner == identity and until > time.time()
+
+    def choose(self, identity, token=None):
+        """ Return the bind to read from, None for the primary """
+        if not self.binds or (identity and self.is_sticky(identity, token)):
+            return None
+        return random.choice(self.binds)
+
+
+def request_identity():
+    """ Return the identity of a valid token sent with the request """
+    try:
+        verify_jwt_in_request(optional=True)
+        return get_jwt_identity()
+    except (JWTExtendedException, PyJWTError):
+        return None
+
+
+def sticky_token():
+    """ Return the stickiness token sent with the request, if any """
+    return request.headers.get(STICKY_HEADER) or \
+        request.cookies.get(STICKY_COOKIE)
+
+
+def reads_from_replica(view):
+    """ Send the SELECTs of a read-only view to a replica """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        replica = replicas.choose(request_identity(), sticky_token())
+        if replica is None:
+            return view(*args, **kwargs)
+        session = current_app.extensions["sqlalchemy"].session
+        session.info["replica"] = replica
+        try:
+            return view(*args, **kwargs)
+        finally:
+            session.info.pop("replica", None)
+    return wrapper
+
+
+replicas = ReplicaRouter()
@@ -1,45 +1,155 @@
+import csv
+import hashlib
+import io
+import json
 import logging
-from flask import Blueprint, current_app, jsonify, render_template, request
+from datetime import datetime, timezone
+from flask import (
+    Blueprint,
+    current_app,
+    jsonify,
+    render_template,
+    request,
+    stream_with_context,
+)
 from flask_cors import CORS
 from flask_jwt_extended import (
     create_access_token,
+    get_jwt,
+    get_jwt_identity,
     jwt_required,
     JWTManager
 )
+from marshmallow import ValidationError
+from werkzeug.http import quote_etag
 from werkzeug.security import check_password_hash, generate_password_hash
+from app.cache import cache
+from app.events import events, format_event
 from app.messages import (
     ERR_500,
     ERR_DISABLED_ACC,
     ERR_EXISTING_USER,
+    ERR_INVALID_BATCH,
+    ERR_INVALID_FORMAT,
+    ERR_INVALID_MOVE,
+    ERR_INVALID_OPERATION,
+    ERR_INVALID_PAGE,
+    ERR_INVALID_QUERY,
+    ERR_INVALID_SINCE,
     ERR_PROCESSING_REQ,
+    ERR_SERVER_BUSY,
+    ERR_STREAM_UNAVAILABLE,
+    ERR_USER_FORBIDDEN,
     ERR_USER_NOT_FOUND,
     ERR_USER_NOT_FOUND,
     ERR_TASK_EMPTY,
+    ERR_TASK_FORBIDDEN,
     ERR_TASK_NOT_FOUND,
     ERR_WRONG_USER_PASS,
     SUC_NEW_USER,
     SUC_TASK_OK,
     SUC_TASK_UPDATED,
+    SUC_TASK_MOVED,
+    SUC_TASK_RESTORED,
     SUC_TASK_DELETED,
+    SUC_USER_DELETED,
     SUC_USER_UPDATED,
 )
-from app.models import db, User, Task
-from app.schemas import TaskSchema, UserSchema, LoginSchema
+from app.hashing import HashingBusy, hasher
+from app.metrics import metrics
+from app.models import (
+    ArchivedTask,
+    db,
+    last_logins,
+    Task,
+    TaskStats,
+    User,
+)
+from app.pagination import (
+    PaginationError,
+    decode_cursor,
+    encode_cursor,
+    get_page_args,
+)
+from app.replicas import (
+    STICKY_HEADER,
+    reads_from_replica,
+    replicas,
+    request_identity,
+)
+from app.schemas import (
+    LoginSchema,
+    RowSerializer,
+    TaskChangeSchema,
+    TaskSchema,
+    UserSchema,
+)
 
 
 main = Blueprint("main", __name__)
 jwt = JWTManager()
-cors = CORS(resources={r"/*": {"origins": "*"}})
+cors = CORS(resources={r"/*": {
+    "origins": "*", "expose_headers": [STICKY_HEADER]}})
 
 # Defining the schemas
 task_schema = TaskSchema()
 tasks_schema = TaskSchema(many=True)
+task_update_schema = TaskSchema(partial=True)
+task_updates_schema = TaskSchema(many=True, partial=True)
+task_rows = RowSerializer(TaskSchema())
+task_change_rows = RowSerializer(TaskChangeSchema())
 user_schema = UserSchema()
 login_schema = LoginSchema()
 
 
 
+def make_etag(*parts):
+    """ Build an entity tag from the resource version and representation """
+    raw = "|".join(
+        part.decode() if isinstance(part, bytes) else str(part)
+        for part in parts
+    )
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def etag_headers(etag):
+    """ Headers that let clients revalidate a response with If-None-Match """
+    return {"ETag": quote_etag(etag), "Cache-Control": "no-cache"}
+
+
+def current_user_id():
+    """ Return the id of the authenticated user.
+
+    Tokens carry it in the `user_id` claim; older tokens only hold the
+    email, which costs a lookup.
+    """
+    claims = get_jwt()
+    if "user_id" in claims:
+        return claims["user_id"]
+    user = User.find_by_email(get_jwt_identity())
+    return user.id if user else None
+
+
+def server_busy(error):
+    """ Ask the client to retry once a hashing slot is free """
+    return jsonify(ERR_SERVER_BUSY), 503, {
+        "Retry-After": str(error.retry_after)
+    }
+
+
+@main.after_request
+def stick_to_primary(response):
+    """ Keep the reads of a client on the primary after it writes """
+    if request.method not in ("GET", "HEAD", "OPTIONS") and \
+            response.status_code < 400:
+        identity = request_identity()
+        if identity is not None:
+            replicas.stick(identity, response)
+    return response
+
+
 @main.route("/")
+@reads_from_replica
 def home():
     """ Home function """
     return render_template("index.html")
@@ -56,15 +166,14 @@ def create_user():
             print(e)
             raise e
         else:
-            email = args["email"]
-            password = args["password"]
-            user_exists = User.exists(email)
-            if user_exists:
+            with metrics.timed("password_hash"):
+                args["password"] = hasher.hash(args["password"])
+            user_id = User.insert_if_absent(**args)
+            if user_id is None:
                 return jsonify(ERR_EXISTING_USER), 400
-            user = User(**args)
-            user.set_password(password)
-            user.save_to_db()
             return jsonify(SUC_NEW_USER), 201
+    except HashingBusy as e:
+        return server_busy(e)
     except Exception as e:
         error_message = str(e)
         logging.error(f"Error en create_user: {error_message}")
@@ -85,14 +194,29 @@ def login_user():
             email = args["email"]
             password = args["password"]
             user = User.find_by_email(email)
-            
-            if user is None or \
-               user.check_password(password) == False:
+            if user is None:
                 return jsonify(ERR_WRONG_USER_PASS), 400
+            with metrics.timed("password_check"):
+                valid_password = user.check_password(password)
+            if not valid_password:
+                return jsonify(ERR_WRONG_USER_PASS), 400
+            changed = False
+            if user.password_needs_rehash():
+                try:
+                    with metrics.timed("password_hash"):
+                        user.set_password(password)
+                    changed = True
+                except HashingBusy:
+                    logging.warning(f"Rehash postergado para {email}")
+            if user.is_disabled:
+                user.is_disabled = False
+                changed = True
+            if changed:
+                user.save_to_db()
 
-            access_token = create_access_token(email)
-            user.is_disabled = False
-            user.save_to_db()
+            access_token = create_access_token(
+                email, additional_claims={"user_id": user.id})
+            last_logins.record(user.id, datetime.now(timezone.utc))
 
             return jsonify(
                     {
@@ -103,6 +227,8 @@ def login_user():
                         "user_id": user.id,
                     }
             ), 200
+    except HashingBusy as e:
+        return server_busy(e)
     except Exception as e:
         error_message = str(e)
         print(e)
@@ -111,13 +237,20 @@ def login_user():
 
 
 @main.route("/user/<int:user_id>")
+@reads_from_replica
 def get_user(user_id):
     """Retorna la información del usuario según su ID"""
     try:
+        version = User.find_version(user_id)
+        if version is None:
+            return jsonify(ERR_USER_NOT_FOUND), 404
+        etag = make_etag("user", version)
+        if request.if_none_match.contains(etag):
+            return "", 304, etag_headers(etag)
+
         user = User.find_by_id(user_id)
         if user:
-            print(user)
-            return jsonify(user_schema.dump(user))
+            return jsonify(user_schema.dump(user)), 200, etag_headers(etag)
 
         return jsonify(ERR_USER_NOT_FOUND), 404
 
@@ -127,6 +260,31 @@ def get_user(user_id):
         return jsonify(ERR_500), 500
 
 
+@main.route("/user/<int:user_id>/summary")
+@jwt_required()
+@reads_from_replica
+def get_user_summary(user_id):
+    """Retorna los contadores de tareas totales, completadas y abiertas"""
+    try:
+        if current_user_id() != user_id:
+            return jsonify(ERR_USER_FORBIDDEN), 403
+        counters = TaskStats.find_by_user_id(user_id)
+        if counters is None:
+            return jsonify(ERR_USER_NOT_FOUND), 404
+        total, completed = counters
+        return jsonify({
+            "user_id": user_id,
+            "total": total,
+            "completed": completed,
+            "open": total - completed
+        }), 200
+
+    except Exception as e:
+        error_message = str(e)
+        logging.error(f"Error en get_user_summary: {error_message}")
+        return jsonify(ERR_500), 500
+
+
 @main.route("/userlist/<int:id>", methods=["PUT", "DELETE"])
 @jwt_required()
 def update_user(id):
@@ -148,40 +306,274 @@ def update_user(id):
         return jsonify(ERR_PROCESSING_REQ), 500
 
 
+@main.route("/userlist/<int:id>/purge", methods=["DELETE"])
+@jwt_required()
+def purge_user(id):
+    """Elimina definitivamente al usuario y todas sus tareas"""
+    try:
+        if current_user_id() != id:
+            return jsonify(ERR_USER_FORBIDDEN), 403
+        if not User.purge(id):
+            return jsonify(ERR_USER_NOT_FOUND), 404
+        return jsonify(SUC_USER_DELETED), 204
+    except Exception as e:
+        error_message = str(e)
+        logging.error(f"Error en purge_user: {error_message}")
+        return jsonify(ERR_PROCESSING_REQ), 500
+
+
 @main.route("/tasks", methods=["POST"])
 @jwt_required()
 def create_task():
     """Recibe parámetros para crear la tarea."""
     try:
-        args_json = request.get_json()
-        print("primer var",args_json)
-
-        try:
-            args = task_schema.load(args_json)
-        except Exception as e:
-            print ("exep: ",e)
-            raise e
-        else:
-            if not args["task"]:
-                return jsonify(ERR_TASK_EMPTY), 400
-            Task(**args).save_to_db()
-            return jsonify(SUC_TASK_OK), 201
+        args = task_schema.load(request.get_json())
+        if not args["task"]:
+            return jsonify(ERR_TASK_EMPTY), 400
+        Task(**args).save_to_db()
+        return jsonify(SUC_TASK_OK), 201
     except Exception as e:
         error_message = str(e)
         logging.error(f"Error en create_task: {error_message}")
         return jsonify(ERR_500), 500
 
 
+BATCH_OPERATIONS = ("create", "update", "complete", "delete")
+
+
+def batch_error(index, op, status, error):
+    """ Build the result of a batch operation that was not applied """
+    return {"index": index, "op": op, "status": status, "error": error}
+
+
+def validate_batch(operations, schema):
+    """ Load the `task` payloads of the operations with one schema call.
+
+    Returns the loaded payloads and the errors, both keyed by position.
+    """
+    payloads = [operation.get("task") or {} for operation in operations]
+    try:
+        return schema.load(payloads), {}
+    except ValidationError as e:
+        errors = e.messages
+    valid = iter(schema.load([
+        payload for n, payload in enumerate(payloads) if n not in errors
+    ]))
+    loaded = [
+        None if n in errors else next(valid) for n in range(len(payloads))
+    ]
+    return loaded, errors
+
+
+@main.route("/tasks/batch", methods=["POST"])
+@jwt_required()
+def batch_tasks():
+    """Recibe una lista de operaciones sobre tareas y las aplica juntas.
+
+    Cada operación es `{"op": "create", "task": {...}}`,
+    `{"op": "update", "id": 1, "task": {...}}`, `{"op": "complete",
+    "id": 1}` o `{"op": "delete", "id": 1}`. Las operaciones válidas se
+    aplican en una sola transacción: primero las altas, luego las
+    modificaciones y al final las bajas.
+    """
+    try:
+        user_id = current_user_id()
+        if user_id is None:
+            return jsonify(ERR_USER_NOT_FOUND), 404
+
+        args_json = request.get_json(silent=True) or {}
+        operations = args_json.get("operations")
+        if not isinstance(operations, list) or not operations or \
+           len(operations) > current_app.config["MAX_BATCH_OPERATIONS"] or \
+           not all(isinstance(operation, dict) for operation in operations):
+            return jsonify(ERR_INVALID_BATCH), 400
+
+        results = [None] * len(operations)
+        by_op = {op: [] for op in BATCH_OPERATIONS}
+        for index, operation in enumerate(operations):
+            op = operation.get("op")
+            if op not in BATCH_OPERATIONS:
+                results[index] = batch_error(
+                    index, op, 400, ERR_INVALID_OPERATION["error"])
+            elif op != "create" and type(operation.get("id")) is not int:
+                results[index] = batch_error(
+                    index, op, 400, ERR_TASK_NOT_FOUND["error"])
+            else:
+                by_op[op].append(index)
+
+        creates = []
+        create_indexes = by_op["create"]
+        loaded, errors = validate_batch(
+            [operations[n] for n in create_indexes], tasks_schema)
+        for n, index in enumerate(create_indexes):
+            if n in errors:
+                results[index] = {
+                    "index": index, "op": "create",
+                    "status": 400, "errors": errors[n]
+                }
+            elif not loaded[n]["task"]:
+                results[index] = batch_error(
+                    index, "create", 400, ERR_TASK_EMPTY["error"])
+            elif loaded[n]["user_id"] != user_id:
+                results[index] = batch_error(
+                    index, "create", 403, ERR_TASK_FORBIDDEN["error"])
+            else:
+                loaded[n].pop("id", None)
+                creates.append((index, loaded[n]))
+
+        target_ids = [
+            operations[index]["id"]
+            for op in ("update", "complete", "delete")
+            for index in by_op[op]
+        ]
+        owned_ids = Task.find_owned_ids(user_id, target_ids)
+
+        changes = {}
+        update_indexes = by_op["update"]
+        loaded, errors = validate_batch(
+            [operations[n] for n in update_indexes], task_updates_schema)
+        for n, index in enumerate(update_indexes):
+            task_id = operations[index]["id"]
+            if task_id not in owned_ids:
+                results[index] = batch_error(
+                    index, "update", 404, ERR_TASK_NOT_FOUND["error"])
+            elif n in errors:
+                results[index] = {
+                    "index": index, "op": "update",
+                    "status": 400, "errors": errors[n]
+                }
+            elif "task" in loaded[n] and not loaded[n]["task"]:
+                results[index] = batch_error(
+                    index, "update", 400, ERR_TASK_EMPTY["error"])
+            else:
+                loaded[n].pop("id", None)
+                loaded[n].pop("user_id", None)
+                changes.setdefault(task_id, {}).update(loaded[n])
+                results[index] = {
+                    "index": index, "op": "update",
+                    "status": 200, "id": task_id
+                }
+        for index in by_op["complete"]:
+            task_id = operations[index]["id"]
+            if task_id not in owned_ids:
+                results[index] = batch_error(
+                    index, "complete", 404, ERR_TASK_NOT_FOUND["error"])
+                continue
+            changes.setdefault(task_id, {})["is_completed"] = True
+            results[index] = {
+                "index": index, "op": "complete",
+                "status": 200, "id": task_id
+            }
+
+        delete_ids = []
+        for index in by_op["delete"]:
+            task_id = operations[index]["id"]
+            # A repeated delete finds the task gone
+            if task_id not in owned_ids or task_id in delete_ids:
+                results[index] = batch_error(
+                    index, "delete", 404, ERR_TASK_NOT_FOUND["error"])
+                continue
+            delete_ids.append(task_id)
+            changes.pop(task_id, None)
+            results[index] = {
+                "index": index, "op": "delete",
+                "status": 204, "id": task_id
+            }
+
+        updates = [
+            dict(fields, id=task_id)
+            for task_id, fields in changes.items() if fields
+        ]
+        created_ids = Task.bulk_apply(
+            user_id, [fields for _, fields in creates], updates, delete_ids)
+        for (index, _), task_id in zip(creates, created_ids):
+            results[index] = {
+                "index": index, "op": "create",
+                "status": 201, "id": task_id
+            }
+
+        return jsonify({"results": results}), 200
+
+    except Exception as e:
+        error_message = str(e)
+        logging.error(f"Error en batch_tasks: {error_message}")
+        return jsonify(ERR_500), 500
+
+
+def wants_legacy_tasklist(args):
+    """ Tell if the task list must be returned as a plain, unpaginated list.
+
+    Clients opt in with `?legacy=true`. While TASKLIST_LEGACY_MODE is on,
+    requests without `limit` or `after` are also served the legacy way.
+    """
+    if "legacy" in args:
+        return args.get("legacy", "").lower() in ("1", "true")
+    if "limit" in args or "after" in args:
+        return False
+    return current_app.config["TASKLIST_LEGACY_MODE"]
+
+
 @main.route("/tasklist/<int:user_id>", methods=["GET"])
 @jwt_required()
+@reads_from_replica
 def get_tasks(user_id):
     """Retorna lista de tareas del usuario encontrado por el ID"""
     try:
-        tasks = Task.find_all_by_user_id(user_id)
-        if tasks:
-            return jsonify(tasks_schema.dump(tasks)), 200
+        headers = {}
+        etag = None
+        version = User.find_version(user_id)
+        if version is not None:
+            etag = make_etag("tasklist", version, request.query_string)
+            if request.if_none_match.contains(etag):
+                return "", 304, etag_headers(etag)
+            headers = etag_headers(etag)
+            body = cache.get(user_id, etag)
+            if body is not None:
+                return current_app.response_class(
+                    body, 200, headers, mimetype="application/json")
 
-        return jsonify(ERR_USER_NOT_FOUND), 404
+        include_archived = request.args.get(
+            "include_archived", "").lower() in ("1", "true")
+        if wants_legacy_tasklist(request.args):
+            rows = Task.find_rows_by_user_id(
+                user_id, task_rows.columns, include_archived)
+            if not rows:
+                return jsonify(ERR_USER_NOT_FOUND), 404
+            response = jsonify(task_rows.dump(rows))
+        else:
+            try:
+                limit, after = get_page_args(
+                    request.args,
+                    current_app.config["RECORDS_PER_PAGE"],
+                    current_app.config["MAX_RECORDS_PER_PAGE"]
+                )
+                after_key = None
+                if after:
+                    cursor_user_id, position, after_id = decode_cursor(
+                        after, 3, (int, str, int))
+                    if cursor_user_id != user_id:
+                        raise PaginationError(after)
+                    after_key = (position, after_id)
+            except PaginationError:
+                return jsonify(ERR_INVALID_PAGE), 400
+
+            # The order key of the last row goes in the cursor
+            rows, has_more = Task.find_page_by_user_id(
+                user_id, limit, after_key,
+                task_rows.columns + (Task.position,), include_archived)
+            next_cursor = None
+            if has_more:
+                last = rows[-1]
+                next_cursor = encode_cursor(
+                    user_id, last[-1], last[task_rows.index("id")])
+            response = jsonify({
+                "tasks": task_rows.dump(rows),
+                "next_cursor": next_cursor
+            })
+
+        if etag is not None:
+            cache.set(user_id, etag, response.get_data())
+        return response, 200, headers
 
     except Exception as e:
         error_message = str(e)
@@ -189,26 +581,248 @@ def get_tasks(user_id):
         return jsonify(ERR_500), 500
 
 
+@main.route("/tasklist/<int:user_id>/changes", methods=["GET"])
+@jwt_required()
+def get_task_changes(user_id):
+    """Retorna las tareas escritas y eliminadas después de una secuencia"""
+    try:
+        if current_user_id() != user_id:
+            return jsonify(ERR_USER_FORBIDDEN), 403
+        since = request.args.get("since", "0")
+        if not since.isdigit():
+            return jsonify(ERR_INVALID_SINCE), 400
+        since = int(since)
+        rows, deleted = Task.find_changes_by_user_id(
+            user_id, since, task_change_rows.columns)
+        last_seq = since
+        if rows:
+            last_seq = max(last_seq, rows[-1][task_change_rows.index("seq")])
+        if deleted:
+            last_seq = max(last_seq, deleted[-1][1])
+        return jsonify({
+            "tasks": task_change_rows.dump(rows),
+            "deleted": [task_id for task_id, _ in deleted],
+            "seq": last_seq
+        }), 200
+
+    except Exception as e:
+        error_message = str(e)
+        logging.error(f"Error en get_task_changes: {error_message}")
+        return jsonify(ERR_500), 500
+
+
+@main.route("/tasks/search", methods=["GET"])
+@jwt_required()
+@reads_from_replica
+def search_tasks():
+    """Busca texto en las tareas del usuario, ordenadas por relevancia"""
+    try:
+        user_id = current_user_id()
+        if user_id is None:
+            return jsonify(ERR_USER_NOT_FOUND), 404
+        text = request.args.get("q", "").strip()
+        if not text:
+            return jsonify(ERR_INVALID_QUERY), 400
+        try:
+            limit, after = get_page_args(
+                request.args,
+                current_app.config["RECORDS_PER_PAGE"],
+                current_app.config["MAX_RECORDS_PER_PAGE"]
+            )
+            offset = 0
+            if after:
+                cursor_user_id, offset = decode_cursor(after, 2)
+                if cursor_user_id != user_id:
+                    raise PaginationError(after)
+        except PaginationError:
+            return jsonify(ERR_INVALID_PAGE), 400
+
+        rows, has_more = Task.search_by_user_id(
+            user_id, text, task_rows.columns, limit, offset)
+        next_cursor = None
+        if has_more:
+            next_cursor = encode_cursor(user_id, offset + limit)
+        return jsonify({
+            "tasks": task_rows.dump(rows),
+            "next_cursor": next_cursor
+        }), 200
+
+    except Exception as e:
+        error_message = str(e)
+        logging.error(f"Error en search_tasks: {error_message}")
+        return jsonify(ERR_500), 500
+
+
+def event_stream(user_id, heartbeat):
+    """ Yield the task events of the user until the client goes away """
+    subscription = events.subscribe(user_id)
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            event = subscription.get(heartbeat)
+            if subscription.evicted:
+                yield "event: reset\ndata: {}\n\n"
+                return
+            if event is None:
+                yield ": ping\n\n"
+            else:
+                yield format_event(event)
+    finally:
+        events.unsubscribe(subscription)
+
+
+@main.route("/tasks/stream", methods=["GET"])
+@jwt_required(locations=["headers", "query_string"])
+def stream_tasks():
+    """Envía los cambios de las tareas del usuario como Server-Sent Events"""
+    try:
+        # Each stream holds a worker, see gunicorn.conf.py
+        if not current_app.config["TASK_EVENTS_STREAM"]:
+            return jsonify(ERR_STREAM_UNAVAILABLE), 503
+        user_id = current_user_id()
+        if user_id is None:
+            return jsonify(ERR_USER_NOT_FOUND), 404
+        return current_app.response_class(
+            event_stream(user_id, current_app.config["TASK_EVENTS_HEARTBEAT"]),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    except Exception as e:
+        error_message = str(e)
+        logging.error(f"Error en stream_tasks: {error_message}")
+        return jsonify(ERR_500), 500
+
+
+def export_ndjson(chunks):
+    """ Render chunks of task rows as newline delimited JSON """
+    fields = Task.SERIALIZED_FIELDS
+    for rows in chunks:
+        yield "".join(
+            json.dumps(dict(zip(fields, row)), ensure_ascii=False) + "\n"
+            for row in rows
+        )
+
+
+def export_csv(chunks):
+    """ Render chunks of task rows as CSV with a header line """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(Task.SERIALIZED_FIELDS)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+EXPORT_FORMATS = {
+    "ndjson": (export_ndjson, "application/x-ndjson"),
+    "csv": (export_csv, "text/csv"),
+}
+
+
+@main.route("/tasklist/<int:user_id>/export", methods=["GET"])
+@jwt_required()
+def export_tasks(user_id):
+    """Exporta las tareas del usuario en formato NDJSON o CSV"""
+    try:
+        if current_user_id() != user_id:
+            return jsonify(ERR_USER_FORBIDDEN), 403
+        export_format = request.args.get("format", "ndjson")
+        if export_format not in EXPORT_FORMATS:
+            return jsonify(ERR_INVALID_FORMAT), 400
+        render, mimetype = EXPORT_FORMATS[export_format]
+        chunks = Task.stream_by_user_id(
+            user_id, current_app.config["EXPORT_CHUNK_SIZE"])
+        filename = f"tasks-{user_id}.{export_format}"
+        return current_app.response_class(
+            stream_with_context(render(chunks)),
+            mimetype=mimetype,
+            headers={
+                "Content-Disposition": f"attachment; filename={filename}"
+            }
+        )
+    except Exception as e:
+        error_message = str(e)
+        logging.error(f"Error en export_tasks: {error_message}")
+        return jsonify(ERR_500), 500
+
+
+@main.route("/cache/stats", methods=["GET"])
+@jwt_required()
+def get_cache_stats():
+    """Retorna los contadores del caché de listas de tareas"""
+    return jsonify(cache.stats()), 200
+
+
+@main.route("/task/<int:id>/move", methods=["PUT"])
+@jwt_required()
+def move_task(id):
+    """Mueve la tarea antes o después de otras tareas del usuario"""
+    try:
+        user_id = current_user_id()
+        args_json = request.get_json(silent=True) or {}
+        after_id = args_json.get("after")
+        before_id = args_json.get("before")
+        anchors = [value for value in (after_id, before_id)
+                   if value is not None]
+        if not anchors or any(
+                type(value) is not int or value == id for value in anchors):
+            return jsonify(ERR_INVALID_MOVE), 400
+        try:
+            moved = Task.move_owned(id, user_id, after_id, before_id)
+        except ValueError:
+            return jsonify(ERR_INVALID_MOVE), 400
+        if moved is None:
+            return jsonify(ERR_TASK_NOT_FOUND), 404
+        return jsonify(SUC_TASK_MOVED), 200
+
+    except Exception as e:
+        error_message = str(e)
+        logging.error(f"Error en move_task: {error_message}")
+        return jsonify(ERR_500), 500
+
+
+@main.route("/task/<int:id>/restore", methods=["POST"])
+@jwt_required()
+def restore_task(id):
+    """Devuelve una tarea archivada a la lista de tareas del usuario"""
+    try:
+        if ArchivedTask.restore(id, current_user_id()) is None:
+            return jsonify(ERR_TASK_NOT_FOUND), 404
+        return jsonify(SUC_TASK_RESTORED), 200
+
+    except Exception as e:
+        error_message = str(e)
+        logging.error(f"Error en restore_task: {error_message}")
+        return jsonify(ERR_500), 500
+
+
 @main.route("/task/<int:id>", methods=["DELETE", "PUT"])
 @jwt_required()
 def update_or_delete_task(id):
     """Recibe parámetros de la tarea a modificar o eliminar"""
     try:
-        task = Task.find_by_id(id)
-        if task is None:
-            return jsonify(ERR_TASK_NOT_FOUND), 404
-
+        user_id = current_user_id()
         if request.method == "DELETE":
-            task.delete_from_db()
+            if Task.delete_owned(id, user_id) is None:
+                return jsonify(ERR_TASK_NOT_FOUND), 404
             return jsonify(SUC_TASK_DELETED), 204
 
         args_json = request.get_json()
         try:
-            task.update(**args_json)
-            return jsonify(SUC_TASK_UPDATED), 200
-        except Exception as e:
+            fields = task_update_schema.load(args_json)
+        except ValidationError as e:
             print (e)
-            raise e
+            return jsonify(ERR_PROCESSING_REQ), 400
+        fields.pop("id", None)
+        fields.pop("user_id", None)
+        if "task" in fields and not fields["task"]:
+            return jsonify(ERR_TASK_EMPTY), 400
+        if Task.update_owned(id, user_id, **fields) is None:
+            return jsonify(ERR_TASK_NOT_FOUND), 404
+        return jsonify(SUC_TASK_UPDATED), 200
 
     except Exception as e:
         error_message = str(e)
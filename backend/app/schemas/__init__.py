@@ -1,6 +1,7 @@
 from flask_marshmallow import Marshmallow
 from marshmallow import fields
 from marshmallow_sqlalchemy import auto_field, SQLAlchemyAutoSchema
+from sqlalchemy.orm import ColumnProperty
 from app.models import Task, User
 
 
@@ -10,6 +11,7 @@ ma = Marshmallow()
 class UserSchema(SQLAlchemyAutoSchema):
     class Meta:
         model = User
+        exclude = ("version", "last_login_at")
 
     password = auto_field(load_only=True)
 
@@ -38,5 +40,47 @@ class TaskSchema(SQLAlchemyAutoSchema):
     class Meta:
         model = Task
         include_relationships = True
+        exclude = ("seq", "updated_at", "position")
 
     user_id = auto_field(required=True)
+
+
+class TaskChangeSchema(TaskSchema):
+    """ Serializer for tasks returned by the changes feed """
+    class Meta(TaskSchema.Meta):
+        exclude = ("updated_at",)
+        dump_only = ("seq", "position")
+
+
+class RowSerializer:
+    """ Dump plain result rows exactly like a model schema would.
+
+    The columns to select are taken from the schema dump fields and the
+    row-to-dict function is compiled once, so serializing a list costs a
+    dict literal per row instead of a walk over marshmallow fields.
+    """
+
+    def __init__(self, schema):
+        model = schema.opts.model
+        fields = [
+            (field.data_key or name, field.attribute or name)
+            for name, field in schema.dump_fields.items()
+        ]
+        self.keys = tuple(key for key, _ in fields)
+        self.columns = tuple(
+            getattr(model, attribute) for _, attribute in fields)
+        for column in self.columns:
+            if not isinstance(column.property, ColumnProperty):
+                raise TypeError(f"{column} is not a plain column")
+        items = ", ".join(
+            f"{key!r}: row[{n}]" for n, key in enumerate(self.keys))
+        namespace = {}
+        exec(
+            f"def dump(rows):\n    return [{{{items}}} for row in rows]",
+            namespace
+        )
+        self.dump = namespace["dump"]
+
+    def index(self, key):
+        """ Return the position of a dumped key in the selected rows """
+        return self.keys.index(key)
@@ -0,0 +1,216 @@
+""" Load generator and latency benchmark of the task API.
+
+Seeds users and tasks through the API, then sends a weighted mix of
+requests from a thread pool and reports throughput and latency
+percentiles per endpoint as JSON. The request sequence only depends on
+the seed, so runs of different commits can be compared.
+
+    python manage.py loadtest --users 20 --tasks 50 --requests 2000
+    python manage.py loadtest --url http://localhost:8585
+"""
+import json
+import platform
+import random
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+ENDPOINTS = ("login", "create", "list", "update")
+DEFAULT_MIX = {"login": 1, "create": 2, "list": 5, "update": 2}
+PASSWORD = "loadtest-password"
+
+
+class TestClientTransport:
+    """ Send requests to an application through Flask's test client """
+
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def request(self, method, path, payload=None, token=None):
+        """ Return the status and the JSON body of a response """
+        client = getattr(self.local, "client", None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        response = client.open(
+            path, method=method, json=payload, headers=headers)
+        return response.status_code, response.get_json(silent=True)
+
+
+class HTTPTransport:
+    """ Send requests to a running server """
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+
+    def request(self, method, path, payload=None, token=None):
+        """ Return the status and the JSON body of a response """
+        headers = {"Content-Type": "application/json"}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        data = json.dumps(payload).encode() if payload is not None else None
+        request = urllib.request.Request(
+            self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(request) as response:
+                status, body = response.status, response.read()
+        except urllib.error.HTTPError as e:
+            status, body = e.code, e.read()
+        try:
+            return status, json.loads(body)
+        except ValueError:
+            return status, None
+
+
+def parse_mix(text):
+    """ Parse `login=1,list=5` into weights by endpoint """
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint in mix: {name}")
+        mix[name] = int(weight)
+    return mix
+
+
+def seed_accounts(transport, users, tasks, batch_size=500):
+    """ Register and log in users, then give each of them tasks.
+
+    Returns one dict per user with its credentials, id, token and the
+    ids of its tasks.
+    """
+    run = uuid.uuid4().hex[:8]
+    accounts = []
+    for n in range(users):
+        email = f"loadtest-{run}-{n}@example.com"
+        transport.request("POST", "/register", {
+            "username": f"loadtest {n}", "email": email, "password": PASSWORD
+        })
+        status, body = transport.request(
+            "POST", "/login", {"email": email, "password": PASSWORD})
+        if status != 200:
+            raise RuntimeError(f"Could not log in {email}: {status}")
+        account = {"email": email, "user_id": body["user_id"],
+                   "token": body["token"], "task_ids": []}
+        for start in range(0, tasks, batch_size):
+            operations = [
+                {"op": "create", "task": {
+                    "task": f"task {i}", "description": f"description {i}",
+                    "user_id": account["user_id"]}}
+                for i in range(start, min(start + batch_size, tasks))
+            ]
+            status, body = transport.request(
+                "POST", "/tasks/batch", {"operations": operations},
+                account["token"])
+            if status != 200:
+                raise RuntimeError(f"Could not seed tasks: {status}")
+            account["task_ids"].extend(
+                result["id"] for result in body["results"])
+        accounts.append(account)
+    return accounts
+
+
+def plan_requests(accounts, total, mix, seed):
+    """ Build the reproducible list of requests to send """
+    rng = random.Random(seed)
+    names = [name for name in ENDPOINTS if mix.get(name)]
+    weights = [mix[name] for name in names]
+    plan = []
+    for n in range(total):
+        name = rng.choices(names, weights)[0]
+        account = rng.choice(accounts)
+        token = account["token"]
+        if name == "login":
+            plan.append((name, "POST", "/login", {
+                "email": account["email"], "password": PASSWORD}, None))
+        elif name == "create":
+            plan.append((name, "POST", "/tasks", {
+                "task": f"load {n}", "user_id": account["user_id"]}, token))
+        elif name == "list":
+            plan.append((
+                name, "GET", f"/tasklist/{account['user_id']}", None, token))
+        elif account["task_ids"]:
+            task_id = rng.choice(account["task_ids"])
+            plan.append((name, "PUT", f"/task/{task_id}", {
+                "is_completed": rng.random() < 0.5}, token))
+    return plan
+
+
+def percentile(sorted_values, fraction):
+    """ Nearest-rank percentile of an already sorted list """
+    if not sorted_values:
+        return None
+    rank = max(1, round(fraction * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(samples, elapsed):
+    """ Turn (status, seconds) samples into counts and percentiles """
+    latencies = sorted(seconds * 1000 for _, seconds in samples)
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for status, _ in samples if status >= 400),
+        "throughput_rps": round(len(samples) / elapsed, 2),
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+    }
+
+
+def current_commit():
+    """ Return the checked out commit, if any """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_loadtest(transport, users=10, tasks=20, requests=1000, threads=4,
+                 mix=None, seed=0, warmup=50):
+    """ Seed, warm up, drive the request mix and return the report """
+    mix = mix or DEFAULT_MIX
+    accounts = seed_accounts(transport, users, tasks)
+    warmup_plan = plan_requests(accounts, warmup, mix, seed + 1)
+    plan = plan_requests(accounts, requests, mix, seed)
+
+    def send(item):
+        name, method, path, payload, token = item
+        started = time.perf_counter()
+        status, _ = transport.request(method, path, payload, token)
+        return name, status, time.perf_counter() - started
+
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(send, warmup_plan))
+        started = time.perf_counter()
+        results = list(pool.map(send, plan))
+        elapsed = time.perf_counter() - started
+
+    samples = {}
+    for name, status, seconds in results:
+        samples.setdefault(name, []).append((status, seconds))
+    return {
+        "commit": current_commit(),
+        "python": platform.python_version(),
+        "settings": {
+            "users": users, "tasks": tasks, "requests": requests,
+            "threads": threads, "mix": mix, "seed": seed, "warmup": warmup
+        },
+        "elapsed_s": round(elapsed, 3),
+        "total": summarize(
+            [sample for values in samples.values() for sample in values],
+            elapsed),
+        "endpoints": {
+            name: summarize(values, elapsed)
+            for name, values in sorted(samples.items())
+        },
+    }
@@ -0,0 +1,92 @@
+""" Replay one request many times under the profiler.
+
+Seeds a user with tasks in the test database, sends the same request N
+times through Flask's test client inside a single profiling capture and
+prints where the time went together with the slowest SQL statements.
+`{user_id}` in the path is replaced with the id of the seeded user.
+
+    python manage.py profile-endpoint /tasklist/{user_id} --requests 200
+    python manage.py profile-endpoint /tasks --method POST \\
+        --json '{"task": "x", "user_id": {user_id}}' --mode sample
+"""
+import io
+import json
+import pstats
+from flask_jwt_extended import create_access_token
+from sqlalchemy import insert
+from app.models import db, Task, User
+from app.positions import keys_after
+from app.profiling import Capture
+
+
+def seed_user(tasks, chunk=10000):
+    """ Create a user with tasks and return its id and a token """
+    user = User(username="profile", email="profile@example.com",
+                password="profile-password")
+    user.set_password(user.password)
+    db.session.add(user)
+    db.session.commit()
+    positions = keys_after(None, tasks)
+    for start in range(0, tasks, chunk):
+        db.session.execute(insert(Task), [
+            {"task": f"task {n}", "description": f"description {n}",
+             "is_completed": n % 3 == 0, "user_id": user.id,
+             "position": positions[n]}
+            for n in range(start, min(start + chunk, tasks))
+        ])
+    db.session.commit()
+    token = create_access_token(
+        user.email, additional_claims={"user_id": user.id})
+    return user.id, token
+
+
+def run_profile(app, path, method="GET", payload=None, requests=100,
+                tasks=100, mode="cprofile", warmup=5):
+    """ Seed, warm up and return the capture of the replayed requests """
+    with app.app_context():
+        user_id, token = seed_user(tasks)
+    path = path.replace("{user_id}", str(user_id))
+    if payload is not None:
+        payload = json.loads(payload.replace("{user_id}", str(user_id)))
+    headers = {"Authorization": f"Bearer {token}"}
+    client = app.test_client()
+    statuses = {}
+    for _ in range(warmup):
+        client.open(path, method=method, json=payload, headers=headers)
+    with Capture(mode, app.config["PROFILING_SAMPLE_INTERVAL"]) as capture:
+        for _ in range(requests):
+            response = client.open(
+                path, method=method, json=payload, headers=headers)
+            statuses[response.status_code] = statuses.get(
+                response.status_code, 0) + 1
+    capture.statuses = statuses
+    return capture
+
+
+def format_report(capture, requests, top):
+    """ Return the profile and the slowest statements as text """
+    lines = [
+        "{} requests in {:.3f} s, {:.3f} ms per request, statuses {}".format(
+            requests, capture.elapsed, capture.elapsed / requests * 1000,
+            capture.statuses),
+        "{} SQL statements, {:.3f} s".format(
+            len(capture.statements),
+            sum(seconds for _, seconds in capture.statements)),
+        "",
+    ]
+    if capture.mode == "cprofile":
+        stream = io.StringIO()
+        stats = pstats.Stats(capture.profile.profile, stream=stream)
+        stats.sort_stats("cumulative").print_stats(top)
+        lines.append(stream.getvalue().strip())
+    else:
+        total = sum(capture.profile.stacks.values()) or 1
+        for stack, count in capture.profile.stacks.most_common(top):
+            leaf = stack.rsplit(";", 1)[-1]
+            lines.append(f"{count / total:6.1%} {count:6d}  {leaf}")
+    lines += ["", "Slowest SQL:"]
+    for item in capture.slowest_statements(top):
+        lines.append("{:8.3f} ms total {:6d} calls {:8.3f} ms max  {}".format(
+            item["total_s"] * 1000, item["count"], item["max_s"] * 1000,
+            " ".join(item["statement"].split())))
+    return "\n".join(lines)
@@ -0,0 +1,127 @@
+""" Benchmark the task access paths with and without their indexes.
+
+Seeds a large task table, prints the query plans and timings of the
+queries behind `Task.find_all_by_user_id`, the paginated task list and
+the open-tasks filter, then creates the indexes declared on `Task` and
+repeats the measurements.
+
+    python -m benchmarks.task_indexes --tasks 1000000 --users 1000
+    python -m benchmarks.task_indexes --url postgresql://admin:pw@host/db
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from sqlalchemy import create_engine, insert, text
+from app.models import Task, User
+from app.positions import keys_after
+
+
+QUERIES = {
+    "find_all_by_user_id":
+        "SELECT * FROM task WHERE user_id = :uid",
+    "page_by_user_id":
+        "SELECT * FROM task WHERE user_id = :uid "
+        "AND (position, id) > (:position, :after) "
+        "ORDER BY position, id LIMIT 15",
+    "open_by_user_id":
+        "SELECT * FROM task WHERE user_id = :uid AND is_completed = {false}",
+}
+
+
+def seed(engine, users, tasks, chunk=50000):
+    """ Create the schema without task indexes and fill it """
+    User.__table__.create(engine)
+    Task.__table__.create(engine)
+    with engine.begin() as conn:
+        for index in Task.__table__.indexes:
+            index.drop(conn)
+        conn.execute(insert(User), [
+            {"username": f"user{n}", "email": f"user{n}@example.com",
+             "password": "x", "is_disabled": False}
+            for n in range(1, users + 1)
+        ])
+        rand = random.Random(42)
+        position = None
+        for start in range(0, tasks, chunk):
+            # Increasing for the whole table, so for every user too
+            positions = keys_after(position, min(chunk, tasks - start))
+            position = positions[-1]
+            conn.execute(insert(Task), [
+                {"task": f"task {n}", "description": None,
+                 "is_completed": rand.random() < 0.8,
+                 "user_id": rand.randint(1, users),
+                 "position": positions[n - start]}
+                for n in range(start, min(start + chunk, tasks))
+            ])
+
+
+def explain(conn, sql, params):
+    """ Return the query plan as text """
+    if conn.dialect.name == "sqlite":
+        rows = conn.execute(text("EXPLAIN QUERY PLAN " + sql), params)
+        return "; ".join(row[-1] for row in rows)
+    rows = conn.execute(text("EXPLAIN " + sql), params)
+    return "; ".join(row[0] for row in rows)
+
+
+def measure(engine, users, repeat):
+    """ Print plan and mean latency of every query """
+    rand = random.Random(7)
+    false = "0" if engine.dialect.name == "sqlite" else "false"
+    with engine.connect() as conn:
+        for name, sql in QUERIES.items():
+            sql = sql.format(false=false)
+            params = {"uid": rand.randint(1, users), "after": 0,
+                      "position": ""}
+            plan = explain(conn, sql, params)
+            start = time.perf_counter()
+            for _ in range(repeat):
+                params["uid"] = rand.randint(1, users)
+                conn.execute(text(sql), params).fetchall()
+            elapsed = (time.perf_counter() - start) / repeat * 1000
+            print(f"  {name:<22} {elapsed:8.3f} ms  {plan}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="empty database, sqlite temp file "
+                                      "when omitted")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--tasks", type=int, default=500000)
+    parser.add_argument("--repeat", type=int, default=50)
+    options = parser.parse_args()
+
+    path = None
+    url = options.url
+    if url is None:
+        fd, path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        os.remove(path)
+        url = "sqlite:///" + path
+    engine = create_engine(url)
+    try:
+        print(f"Seeding {options.tasks} tasks for {options.users} users")
+        seed(engine, options.users, options.tasks)
+        print("Without indexes:")
+        measure(engine, options.users, options.repeat)
+        with engine.begin() as conn:
+            for index in Task.__table__.indexes:
+                index.create(conn)
+            if conn.dialect.name == "postgresql":
+                conn.execute(text("ANALYZE task"))
+            else:
+                conn.execute(text("ANALYZE"))
+        print("With indexes:")
+        measure(engine, options.users, options.repeat)
+    finally:
+        Task.__table__.drop(engine, checkfirst=True)
+        User.__table__.drop(engine, checkfirst=True)
+        engine.dispose()
+        if path is not None:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
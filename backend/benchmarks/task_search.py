@@ -0,0 +1,130 @@
+""" Benchmark the task search against a LIKE scan.
+
+Seeds a large task table with generated titles and descriptions, then
+times the queries behind `Task.search_by_user_id` next to the
+`LIKE '%word%'` filter they replace, for common and rare words.
+
+    python -m benchmarks.task_search --tasks 1000000 --users 1000
+    python -m benchmarks.task_search --url postgresql://admin:pw@host/db
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from sqlalchemy import create_engine, insert, text
+from app.models import Task, User
+from app.positions import keys_after
+
+
+WORDS = [f"word{n}" for n in range(5000)]
+
+LIKE_QUERY = (
+    "SELECT id, task, description FROM task WHERE user_id = :uid "
+    "AND (task LIKE :pattern OR description LIKE :pattern) "
+    "ORDER BY id LIMIT 15"
+)
+SEARCH_QUERIES = {
+    "sqlite":
+        "SELECT task.id, task.task, task.description FROM task "
+        "JOIN task_fts ON task_fts.rowid = task.id "
+        "WHERE task.user_id = :uid AND task_fts MATCH :word "
+        "ORDER BY bm25(task_fts), task.id LIMIT 15",
+    "postgresql":
+        "SELECT id, task, description FROM task "
+        "WHERE user_id = :uid "
+        "AND search_vector @@ plainto_tsquery('simple', :word) "
+        "ORDER BY ts_rank(search_vector, plainto_tsquery('simple', :word)) "
+        "DESC, id LIMIT 15",
+}
+
+
+def sentence(rand, size):
+    """ Pick words with a skewed distribution, like real text """
+    return " ".join(
+        WORDS[min(int(rand.paretovariate(1.2)) - 1, len(WORDS) - 1)]
+        for _ in range(size)
+    )
+
+
+def seed(engine, users, tasks, chunk=50000):
+    """ Create the schema, with its search index, and fill it """
+    User.__table__.create(engine)
+    Task.__table__.create(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"username": f"user{n}", "email": f"user{n}@example.com",
+             "password": "x", "is_disabled": False}
+            for n in range(1, users + 1)
+        ])
+        rand = random.Random(42)
+        position = None
+        for start in range(0, tasks, chunk):
+            positions = keys_after(position, min(chunk, tasks - start))
+            position = positions[-1]
+            conn.execute(insert(Task), [
+                {"task": sentence(rand, 4),
+                 "description": sentence(rand, 12),
+                 "is_completed": False, "user_id": rand.randint(1, users),
+                 "position": position}
+                for position in positions
+            ])
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("ANALYZE task"))
+        else:
+            conn.execute(text("ANALYZE"))
+
+
+def measure(engine, users, word, repeat):
+    """ Print the mean latency of both queries for one word """
+    rand = random.Random(7)
+    search = SEARCH_QUERIES[engine.dialect.name]
+    with engine.connect() as conn:
+        for name, sql, params in (
+                ("like", LIKE_QUERY, {"pattern": f"%{word}%"}),
+                ("search", search, {"word": word})):
+            found = 0
+            start = time.perf_counter()
+            for _ in range(repeat):
+                params["uid"] = rand.randint(1, users)
+                found += len(conn.execute(text(sql), params).fetchall())
+            elapsed = (time.perf_counter() - start) / repeat * 1000
+            print(f"  {word:<10} {name:<7} {elapsed:8.3f} ms "
+                  f"{found / repeat:6.1f} rows")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="empty database, sqlite temp file "
+                                      "when omitted")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--tasks", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=50)
+    options = parser.parse_args()
+
+    path = None
+    url = options.url
+    if url is None:
+        fd, path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        os.remove(path)
+        url = "sqlite:///" + path
+    engine = create_engine(url)
+    try:
+        print(f"Seeding {options.tasks} tasks for {options.users} users")
+        started = time.perf_counter()
+        seed(engine, options.users, options.tasks)
+        print(f"  seeded in {time.perf_counter() - started:.1f} s")
+        # A frequent, a middling and a rare word
+        for word in (WORDS[0], WORDS[20], WORDS[2000]):
+            measure(engine, options.users, word, options.repeat)
+    finally:
+        Task.__table__.drop(engine, checkfirst=True)
+        User.__table__.drop(engine, checkfirst=True)
+        engine.dispose()
+        if path is not None:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
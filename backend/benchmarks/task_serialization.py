@@ -0,0 +1,78 @@
+""" Compare the two ways of serializing a task list.
+
+The marshmallow path loads Task objects and dumps them with
+TaskSchema(many=True); the projection path selects the schema columns and
+dumps the rows with the compiled RowSerializer used by `get_tasks`.
+
+    python -m benchmarks.task_serialization --tasks 10000 --repeat 20
+"""
+import argparse
+import time
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+from app.models import Task, User
+from app.positions import keys_after
+from app.schemas import RowSerializer, TaskSchema
+
+
+def seed(engine, tasks):
+    """ Create one user owning `tasks` tasks """
+    User.__table__.create(engine)
+    Task.__table__.create(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{
+            "username": "bench", "email": "bench@example.com",
+            "password": "x", "is_disabled": False
+        }])
+        conn.execute(insert(Task), [
+            {"task": f"task {n}", "description": f"description {n}",
+             "is_completed": n % 2 == 0, "user_id": 1,
+             "position": position}
+            for n, position in enumerate(keys_after(None, tasks))
+        ])
+
+
+def marshmallow_path(session, schema):
+    """ ORM objects dumped by marshmallow """
+    tasks = session.scalars(select(Task).where(Task.user_id == 1)).all()
+    return schema.dump(tasks)
+
+
+def projection_path(session, serializer):
+    """ Column projection dumped by the compiled serializer """
+    query = select(*serializer.columns).where(Task.user_id == 1)
+    return serializer.dump(session.execute(query).all())
+
+
+def run(name, path, session, helper, tasks, repeat):
+    """ Print the objects per second of one path """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        session.expunge_all()
+        path(session, helper)
+    elapsed = time.perf_counter() - start
+    print(f"  {name:<12} {tasks * repeat / elapsed:12.0f} objects/sec")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    options = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    seed(engine, options.tasks)
+    schema = TaskSchema(many=True)
+    serializer = RowSerializer(TaskSchema())
+    with Session(engine) as session:
+        assert marshmallow_path(session, schema) == \
+            projection_path(session, serializer)
+        print(f"Serializing {options.tasks} tasks x {options.repeat}")
+        run("marshmallow", marshmallow_path, session, schema,
+            options.tasks, options.repeat)
+        run("projection", projection_path, session, serializer,
+            options.tasks, options.repeat)
+
+
+if __name__ == "__main__":
+    main()
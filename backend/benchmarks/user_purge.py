@@ -0,0 +1,93 @@
+""" Benchmark deleting a user with a large task history.
+
+Compares the old ORM cascade, which loads every task and deletes them
+row by row, with `User.purge`-style single DELETE that lets the
+database's ON DELETE CASCADE remove the tasks.
+
+    python -m benchmarks.user_purge --tasks 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from sqlalchemy import create_engine, delete, event, insert
+from sqlalchemy.orm import Session
+from app.models import db, Task, User
+from app.positions import keys_after
+
+
+def seed(engine, tasks):
+    """ Create one user owning `tasks` tasks """
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{
+            "username": "bench", "email": "bench@example.com",
+            "password": "x", "is_disabled": False, "version": 0
+        }])
+        user_id = conn.execute(
+            User.__table__.select().with_only_columns(User.id)).scalar()
+        conn.execute(insert(Task), [
+            {"task": f"task {n}", "description": f"description {n}",
+             "is_completed": False, "user_id": user_id,
+             "position": position}
+            for n, position in enumerate(keys_after(None, tasks))
+        ])
+    return user_id
+
+
+def orm_cascade(session, user_id):
+    """ Load the user and its tasks, then delete them through the ORM """
+    user = session.get(User, user_id)
+    user.task
+    session.delete(user)
+    session.commit()
+
+
+def single_statement(session, user_id):
+    """ One DELETE, tasks go through ON DELETE CASCADE """
+    session.execute(delete(User).where(User.id == user_id))
+    session.commit()
+
+
+def measure(engine, name, path, tasks):
+    """ Seed a user, delete it and print time, memory and statements """
+    user_id = seed(engine, tasks)
+    statements = []
+
+    def count(*args):
+        statements.append(1)
+
+    event.listen(engine, "before_cursor_execute", count)
+    tracemalloc.start()
+    start = time.perf_counter()
+    with Session(engine) as session:
+        path(session, user_id)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    event.remove(engine, "before_cursor_execute", count)
+    print(f"  {name:<18} {elapsed:8.3f} s  peak {peak / 2 ** 20:8.1f} MiB  "
+          f"{len(statements)} statements")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=100000)
+    options = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    engine = create_engine("sqlite:///" + path)
+    try:
+        # The delete hooks write tombstones and task counters too
+        db.metadata.create_all(engine)
+        print(f"Deleting a user with {options.tasks} tasks")
+        measure(engine, "orm cascade", orm_cascade, options.tasks)
+        measure(engine, "single statement", single_statement, options.tasks)
+    finally:
+        engine.dispose()
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
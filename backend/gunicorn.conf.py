@@ -0,0 +1,55 @@
+""" Gunicorn settings of the production server.
+
+Run with `gunicorn wsgi:app` from the backend folder; every value can be
+overridden from the environment.
+
+A thread of the default gthread workers is held by every open
+`/tasks/stream` connection, so that server refuses streams. Serve them
+from a second server with an async worker class, where an idle stream
+only costs a greenlet, and route `/tasks/stream` to it from the proxy:
+
+    GUNICORN_WORKER_CLASS=gevent GUNICORN_BIND=0.0.0.0:8586 gunicorn wsgi:app
+
+Stream clients may send their token in the query string, so the access
+log leaves query strings out.
+"""
+import multiprocessing
+import os
+
+
+ASYNC_WORKERS = ("gevent", "eventlet")
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8585")
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+streaming = worker_class in ASYNC_WORKERS
+workers = int(os.environ.get(
+    "GUNICORN_WORKERS",
+    multiprocessing.cpu_count() if streaming
+    else multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 1000))
+# Async workers patch the standard library when they start, which must
+# happen before the application is imported
+preload_app = os.environ.get(
+    "GUNICORN_PRELOAD", "false" if streaming else "true").lower() == "true"
+raw_env = ["TASK_EVENTS_STREAM={}".format(
+    os.environ.get("TASK_EVENTS_STREAM", str(streaming).lower()))]
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 1000))
+accesslog = "-"
+# The default format with the path instead of the request line, which
+# holds the query string
+access_log_format = (
+    '%(h)s %(l)s %(u)s %(t)s "%(m)s %(U)s %(H)s" %(s)s %(b)s "%(f)s" "%(a)s"')
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    """ Give every worker its own database connections """
+    if server.cfg.preload_app:
+        from app.models import dispose_engines
+        from wsgi import app
+        dispose_engines(app)
@@ -1,8 +1,30 @@
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import unittest
+from datetime import datetime, timedelta, timezone
 import click
 from werkzeug.security import generate_password_hash
 from flask.cli import FlaskGroup
 from app import create_app
-from app.models import db, User
+from app.importer import guess_format, import_tasks, import_users, read_records
+from app.models import (
+    ArchivedTask,
+    db,
+    last_logins,
+    Task,
+    TaskStats,
+    User,
+)
+from benchmarks.loadtest import (
+    HTTPTransport,
+    TestClientTransport,
+    parse_mix,
+    run_loadtest,
+)
+from benchmarks.profile_endpoint import format_report, run_profile
 
 
 cli = FlaskGroup(create_app=create_app)
@@ -33,20 +55,228 @@ def create_user(username, email, password):
         raise e
 
 
+@cli.command("purge-user")
+@click.option("--email", required=True)
+def purge_user(email):
+    """ Hard delete a user and all of their tasks """
+    user = User.find_by_email(email)
+    if user is None:
+        print("ERROR: El usuario no existe en la plataforma")
+        return 1
+    User.purge(user.id)
+    print(f"Usuario {email} eliminado")
+
+
+def print_progress(report):
+    """ Print the running counters of an import """
+    print(report)
+
+
+@cli.command("import-users")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "file_format", type=click.Choice(["csv", "ndjson"]))
+@click.option("--chunk-size", type=int, default=5000)
+@click.option("--workers", type=int, default=None,
+              help="Password hashing processes, defaults to the CPU count")
+def import_users_command(path, file_format, chunk_size, workers):
+    """ Bulk import users from a CSV or NDJSON file """
+    with open(path, newline="", encoding="utf-8") as stream:
+        records = read_records(stream, file_format or guess_format(path))
+        report = import_users(
+            records, chunk_size, workers, progress=print_progress)
+    print(f"Done: {report}")
+
+
+@cli.command("import-tasks")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "file_format", type=click.Choice(["csv", "ndjson"]))
+@click.option("--chunk-size", type=int, default=10000)
+def import_tasks_command(path, file_format, chunk_size):
+    """ Bulk import tasks from a CSV or NDJSON file """
+    with open(path, newline="", encoding="utf-8") as stream:
+        records = read_records(stream, file_format or guess_format(path))
+        report = import_tasks(records, chunk_size, progress=print_progress)
+    print(f"Done: {report}")
+
+
+@cli.command("archive-tasks")
+@click.option("--older-than", type=int, required=True,
+              help="Days since the completed task was last written")
+@click.option("--chunk-size", type=int, default=1000)
+def archive_tasks(older_than, chunk_size):
+    """ Move old completed tasks to the archive table in small chunks """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=older_than)
+    moved = ArchivedTask.archive(
+        cutoff, chunk_size, progress=lambda moved: print(f"moved={moved}"))
+    print(f"Done: {moved} tasks archived")
+
+
+@cli.command("rebalance-positions")
+@click.option("--max-length", type=int, default=16,
+              help="Rebalance users with a longer task order key")
+def rebalance_positions(max_length):
+    """ Give short order keys back to users whose keys grew too long """
+    user_ids = Task.find_users_with_long_positions(max_length)
+    for user_id in user_ids:
+        Task.rebalance(user_id)
+        print(f"user {user_id}: rebalanced")
+    print(f"Done: {len(user_ids)} users rebalanced")
+
+
+@cli.command("reconcile-task-stats")
+def reconcile_task_stats():
+    """ Recount the tasks of every user and fix the drifted counters """
+    drift = TaskStats.rebuild()
+    for user_id, stored, counted in drift:
+        print(f"user {user_id}: total {stored[0]} -> {counted[0]}, "
+              f"completed {stored[1]} -> {counted[1]}")
+    print(f"Done: {len(drift)} users drifted")
+
+
+def iter_test_ids(suite):
+    """ Yield the id of every test of a suite """
+    for test in suite:
+        if isinstance(test, unittest.TestSuite):
+            yield from iter_test_ids(test)
+        else:
+            yield test.id()
+
+
+def run_in_parallel(tests, workers):
+    """ Run the test classes in `workers` processes, one database each.
+
+    Every worker is a fresh interpreter, so TestConfig gives it its own
+    SQLite file. Returns True if every worker passed.
+    """
+    classes = {}
+    for test_id in iter_test_ids(tests):
+        classes.setdefault(test_id.rsplit(".", 1)[0], []).append(test_id)
+    buckets = [[] for _ in range(workers)]
+    for ids in sorted(classes.values(), key=len, reverse=True):
+        min(buckets, key=len).extend(ids)
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-m", "unittest", *ids],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True
+        )
+        for ids in buckets if ids
+    ]
+    passed = True
+    for n, process in enumerate(processes):
+        output, _ = process.communicate()
+        print(f"=== worker {n} ===")
+        print(output)
+        passed = passed and process.returncode == 0
+    return passed
+
+
 @cli.command("test")
 @click.option("--test_name")
-def test(test_name=None):
+@click.option("--workers", type=int, default=1,
+              help="Number of processes running the tests")
+def test(test_name=None, workers=1):
     """ Runs the unit tests."""
-    import unittest
     if test_name is None:
-        tests = unittest.TestLoader().discover('tests', pattern="test_*.py")
+        tests = unittest.TestLoader().discover(
+            'tests', pattern="test_*.py", top_level_dir='.')
     else:
         tests = unittest.TestLoader().loadTestsFromName('tests.' + test_name)
+    if workers > 1:
+        return 0 if run_in_parallel(tests, workers) else 1
     result = unittest.TextTestRunner(verbosity=2).run(tests)
     if result.wasSuccessful():
         return 0
     return 1
 
 
+@cli.command("loadtest")
+@click.option("--users", type=int, default=10)
+@click.option("--tasks", type=int, default=20, help="Tasks seeded per user")
+@click.option("--requests", "total", type=int, default=1000)
+@click.option("--threads", type=int, default=4)
+@click.option("--mix", default="login=1,create=2,list=5,update=2",
+              help="Weights of the login, create, list and update requests")
+@click.option("--seed", type=int, default=0)
+@click.option("--warmup", type=int, default=50)
+@click.option("--url", help="Load a running server instead of a test app")
+@click.option("--output", type=click.File("w"), default="-")
+def loadtest(users, tasks, total, threads, mix, seed, warmup, url, output):
+    """ Benchmark the API with a mix of requests, reported as JSON """
+    try:
+        weights = parse_mix(mix)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--mix")
+    options = dict(
+        users=users, tasks=tasks, requests=total, threads=threads,
+        mix=weights, seed=seed, warmup=warmup
+    )
+    if url:
+        report = run_loadtest(HTTPTransport(url), **options)
+        report["target"] = url
+    else:
+        app = create_app(test_mode=True)
+        with app.app_context():
+            db.create_all()
+        try:
+            # Whatever the views print must not end up in the report
+            with contextlib.redirect_stdout(sys.stderr):
+                report = run_loadtest(TestClientTransport(app), **options)
+        finally:
+            last_logins.flush()
+            with app.app_context():
+                path = db.engine.url.database
+                db.drop_all()
+                db.engine.dispose()
+            if path and os.path.exists(path):
+                os.remove(path)
+        report["target"] = "test client"
+        report["password_hash_iterations"] = app.config[
+            "PASSWORD_HASH_ITERATIONS"]
+    json.dump(report, output, indent=2)
+    output.write("\n")
+
+
+@cli.command("profile-endpoint")
+@click.argument("path")
+@click.option("--method", default="GET")
+@click.option("--json", "payload", help="Request body, may use {user_id}")
+@click.option("--requests", "total", type=int, default=100)
+@click.option("--tasks", type=int, default=100,
+              help="Tasks seeded for the profiled user")
+@click.option("--mode", type=click.Choice(["cprofile", "sample"]),
+              default="cprofile")
+@click.option("--top", type=int, default=25)
+@click.option("--save", "directory", type=click.Path(file_okay=False),
+              help="Also write the profile and its summary here")
+def profile_endpoint(path, method, payload, total, tasks, mode, top,
+                     directory):
+    """ Replay a request against the test app under the profiler """
+    app = create_app(test_mode=True)
+    with app.app_context():
+        db.create_all()
+    try:
+        capture = run_profile(
+            app, path, method.upper(), payload, total, tasks, mode)
+    finally:
+        last_logins.flush()
+        with app.app_context():
+            database = db.engine.url.database
+            db.drop_all()
+            db.engine.dispose()
+        if database and os.path.exists(database):
+            os.remove(database)
+    print(format_report(capture, total, top))
+    if directory:
+        profiler = app.extensions["profiler"]
+        profiler.directory = directory
+        name = profiler.save(capture, {
+            "method": method.upper(), "path": path, "endpoint": None,
+            "requests": total, "statuses": capture.statuses,
+        })
+        print(f"Saved {os.path.join(directory, name)}")
+
+
 if __name__ == "__main__":
     cli()
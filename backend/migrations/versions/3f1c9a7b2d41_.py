@@ -0,0 +1,31 @@
+"""index task access paths
+
+Revision ID: 3f1c9a7b2d41
+Revises: eda296c3a012
+Create Date: 2026-10-18 10:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9a7b2d41'
+down_revision = 'eda296c3a012'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('task', schema=None) as batch_op:
+        batch_op.create_index('ix_task_user_id_id', ['user_id', 'id'], unique=False)
+        batch_op.create_index(
+            'ix_task_user_id_open', ['user_id'], unique=False,
+            postgresql_where=sa.text('is_completed = false'),
+            sqlite_where=sa.text('is_completed = 0'))
+
+
+def downgrade():
+    with op.batch_alter_table('task', schema=None) as batch_op:
+        batch_op.drop_index('ix_task_user_id_open')
+        batch_op.drop_index('ix_task_user_id_id')
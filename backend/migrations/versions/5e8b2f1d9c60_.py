@@ -0,0 +1,46 @@
+"""task change sequence and tombstones
+
+Revision ID: 5e8b2f1d9c60
+Revises: d9e3a1c74b56
+Create Date: 2026-10-18 14:05:12.381540
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e8b2f1d9c60'
+down_revision = 'd9e3a1c74b56'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('task', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True))
+        batch_op.add_column(sa.Column('seq', sa.Integer(), server_default='0', nullable=False))
+        batch_op.create_index('ix_task_user_id_seq', ['user_id', 'seq'], unique=False)
+
+    op.create_table('task_tombstone',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('task_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('seq', sa.Integer(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('task_tombstone', schema=None) as batch_op:
+        batch_op.create_index('ix_task_tombstone_user_id_seq', ['user_id', 'seq'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('task_tombstone', schema=None) as batch_op:
+        batch_op.drop_index('ix_task_tombstone_user_id_seq')
+
+    op.drop_table('task_tombstone')
+    with op.batch_alter_table('task', schema=None) as batch_op:
+        batch_op.drop_index('ix_task_user_id_seq')
+        batch_op.drop_column('seq')
+        batch_op.drop_column('updated_at')
@@ -0,0 +1,59 @@
+"""task full-text search
+
+Revision ID: 7a41c9e2b813
+Revises: 5e8b2f1d9c60
+Create Date: 2026-10-18 16:42:07.915203
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '7a41c9e2b813'
+down_revision = '5e8b2f1d9c60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute(
+            "ALTER TABLE task ADD COLUMN search_vector tsvector "
+            "GENERATED ALWAYS AS (to_tsvector('simple', "
+            "coalesce(task, '') || ' ' || coalesce(description, ''))) STORED")
+        op.execute(
+            'CREATE INDEX ix_task_search_vector ON task USING gin (search_vector)')
+    elif dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS task_fts USING fts5("
+            "task, description, content='task', content_rowid='id')")
+        op.execute(
+            "CREATE TRIGGER task_fts_insert AFTER INSERT ON task BEGIN "
+            "INSERT INTO task_fts (rowid, task, description) "
+            "VALUES (new.id, new.task, new.description); END")
+        op.execute(
+            "CREATE TRIGGER task_fts_delete AFTER DELETE ON task BEGIN "
+            "INSERT INTO task_fts (task_fts, rowid, task, description) "
+            "VALUES ('delete', old.id, old.task, old.description); END")
+        op.execute(
+            "CREATE TRIGGER task_fts_update "
+            "AFTER UPDATE OF task, description ON task BEGIN "
+            "INSERT INTO task_fts (task_fts, rowid, task, description) "
+            "VALUES ('delete', old.id, old.task, old.description); "
+            "INSERT INTO task_fts (rowid, task, description) "
+            "VALUES (new.id, new.task, new.description); END")
+        # Index the rows written before the triggers existed
+        op.execute("INSERT INTO task_fts (task_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_task_search_vector')
+        op.execute('ALTER TABLE task DROP COLUMN IF EXISTS search_vector')
+    elif dialect == 'sqlite':
+        op.execute('DROP TRIGGER IF EXISTS task_fts_update')
+        op.execute('DROP TRIGGER IF EXISTS task_fts_delete')
+        op.execute('DROP TRIGGER IF EXISTS task_fts_insert')
+        op.execute('DROP TABLE IF EXISTS task_fts')
@@ -0,0 +1,26 @@
+"""user modification counter
+
+Revision ID: 8a4e0d6c5f17
+Revises: 3f1c9a7b2d41
+Create Date: 2026-10-18 11:02:09.524391
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a4e0d6c5f17'
+down_revision = '3f1c9a7b2d41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('version')
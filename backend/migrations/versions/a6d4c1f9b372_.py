@@ -0,0 +1,27 @@
+"""give unsequenced tasks a change sequence
+
+Revision ID: a6d4c1f9b372
+Revises: f2a9d5c8e041
+Create Date: 2026-10-19 10:12:37.418205
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d4c1f9b372'
+down_revision = 'f2a9d5c8e041'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The changes feed returns tasks with seq > since and clients start
+    # from 0, so no row may keep the sequence 0 given by the backfill
+    op.execute('UPDATE task SET seq = 1 WHERE seq < 1')
+    op.execute('UPDATE task_archive SET seq = 1 WHERE seq < 1')
+    op.execute('UPDATE "user" SET version = 1 WHERE version < 1')
+
+
+def downgrade():
+    pass
@@ -0,0 +1,35 @@
+"""per-user task counters
+
+Revision ID: b3d6f0a7c215
+Revises: 7a41c9e2b813
+Create Date: 2026-10-18 18:20:44.107362
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3d6f0a7c215'
+down_revision = '7a41c9e2b813'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('task_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('completed', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.execute(
+        'INSERT INTO task_stats (user_id, total, completed) '
+        'SELECT user_id, count(*), '
+        'sum(CASE WHEN is_completed THEN 1 ELSE 0 END) '
+        'FROM task WHERE user_id IS NOT NULL GROUP BY user_id')
+
+
+def downgrade():
+    op.drop_table('task_stats')
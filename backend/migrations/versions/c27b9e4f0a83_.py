@@ -0,0 +1,26 @@
+"""user last login date
+
+Revision ID: c27b9e4f0a83
+Revises: 8a4e0d6c5f17
+Create Date: 2026-10-18 12:31:55.104772
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c27b9e4f0a83'
+down_revision = '8a4e0d6c5f17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('last_login_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('last_login_at')
@@ -0,0 +1,65 @@
+"""never reuse task ids on sqlite
+
+Revision ID: c4f7e2a9d158
+Revises: a6d4c1f9b372
+Create Date: 2026-10-19 11:47:02.664913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4f7e2a9d158'
+down_revision = 'a6d4c1f9b372'
+branch_labels = None
+depends_on = None
+
+SEARCH_TRIGGERS = (
+    "CREATE TRIGGER task_fts_insert AFTER INSERT ON task BEGIN "
+    "INSERT INTO task_fts (rowid, task, description) "
+    "VALUES (new.id, new.task, new.description); END",
+    "CREATE TRIGGER task_fts_delete AFTER DELETE ON task BEGIN "
+    "INSERT INTO task_fts (task_fts, rowid, task, description) "
+    "VALUES ('delete', old.id, old.task, old.description); END",
+    "CREATE TRIGGER task_fts_update "
+    "AFTER UPDATE OF task, description ON task BEGIN "
+    "INSERT INTO task_fts (task_fts, rowid, task, description) "
+    "VALUES ('delete', old.id, old.task, old.description); "
+    "INSERT INTO task_fts (rowid, task, description) "
+    "VALUES (new.id, new.task, new.description); END",
+)
+
+
+def rebuild_task(autoincrement, nullable):
+    """ Recreate the task table, which drops its search triggers """
+    with op.batch_alter_table(
+            'task', recreate='always',
+            table_kwargs={'sqlite_autoincrement': autoincrement}) as batch_op:
+        batch_op.alter_column(
+            'position', existing_type=sa.String(length=255),
+            nullable=nullable)
+    for statement in SEARCH_TRIGGERS:
+        op.execute(statement)
+
+
+def upgrade():
+    # Postgres sequences never go back, a SQLite rowid reuses the highest
+    # freed id, which archived and deleted tasks still hold
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    # The rebuild also adds the NOT NULL that f2a9d5c8e041 left out
+    rebuild_task(autoincrement=True, nullable=False)
+    op.execute(
+        "DELETE FROM sqlite_sequence WHERE name = 'task'")
+    op.execute(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT 'task', max(id) "
+        "FROM (SELECT coalesce(max(id), 0) AS id FROM task "
+        "UNION ALL SELECT coalesce(max(id), 0) FROM task_archive "
+        "UNION ALL SELECT coalesce(max(task_id), 0) FROM task_tombstone)")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    rebuild_task(autoincrement=False, nullable=True)
@@ -0,0 +1,32 @@
+"""cascade task deletes from user
+
+Revision ID: d9e3a1c74b56
+Revises: c27b9e4f0a83
+Create Date: 2026-10-18 13:20:47.662019
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9e3a1c74b56'
+down_revision = 'c27b9e4f0a83'
+branch_labels = None
+depends_on = None
+
+# The original foreign key was created without a name; this convention
+# gives it the name Postgres generated so it can be dropped everywhere.
+naming_convention = {"fk": "%(table_name)s_%(column_0_name)s_fkey"}
+
+
+def upgrade():
+    with op.batch_alter_table('task', schema=None, naming_convention=naming_convention) as batch_op:
+        batch_op.drop_constraint('task_user_id_fkey', type_='foreignkey')
+        batch_op.create_foreign_key('task_user_id_fkey', 'user', ['user_id'], ['id'], ondelete='CASCADE')
+
+
+def downgrade():
+    with op.batch_alter_table('task', schema=None, naming_convention=naming_convention) as batch_op:
+        batch_op.drop_constraint('task_user_id_fkey', type_='foreignkey')
+        batch_op.create_foreign_key('task_user_id_fkey', 'user', ['user_id'], ['id'])
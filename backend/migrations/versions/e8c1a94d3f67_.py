@@ -0,0 +1,40 @@
+"""task archive table
+
+Revision ID: e8c1a94d3f67
+Revises: b3d6f0a7c215
+Create Date: 2026-10-18 19:57:31.642818
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8c1a94d3f67'
+down_revision = 'b3d6f0a7c215'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('task_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('task', sa.String(length=100), nullable=False),
+    sa.Column('description', sa.String(length=500), nullable=True),
+    sa.Column('is_completed', sa.Boolean(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('seq', sa.Integer(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('task_archive', schema=None) as batch_op:
+        batch_op.create_index('ix_task_archive_user_id_id', ['user_id', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('task_archive', schema=None) as batch_op:
+        batch_op.drop_index('ix_task_archive_user_id_id')
+
+    op.drop_table('task_archive')
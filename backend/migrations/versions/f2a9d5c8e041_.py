@@ -0,0 +1,82 @@
+"""task order keys
+
+Revision ID: f2a9d5c8e041
+Revises: e8c1a94d3f67
+Create Date: 2026-10-18 21:33:18.250964
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a9d5c8e041'
+down_revision = 'e8c1a94d3f67'
+branch_labels = None
+depends_on = None
+
+DIGITS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+TABLES = ('task', 'task_archive')
+
+
+def position_type():
+    return sa.String(length=255).with_variant(
+        sa.String(length=255, collation='C'), 'postgresql')
+
+
+def nth_key(n):
+    """ Order key of the n-th task of a list, as app.positions builds them """
+    digits = ''
+    while True:
+        n, digit = divmod(n, len(DIGITS))
+        digits = DIGITS[digit] + digits
+        if not n:
+            break
+    return chr(ord('a') + len(digits) - 1) + digits
+
+
+def upgrade():
+    for name in TABLES:
+        with op.batch_alter_table(name, schema=None) as batch_op:
+            batch_op.add_column(
+                sa.Column('position', position_type(), nullable=True))
+
+    # Keep the current id order of every list, archived tasks included
+    connection = op.get_bind()
+    rows = connection.execute(sa.text(
+        "SELECT id, user_id, 'task' FROM task UNION ALL "
+        "SELECT id, user_id, 'task_archive' FROM task_archive "
+        "ORDER BY 2, 1")).all()
+    updates = {name: [] for name in TABLES}
+    last_user_id, n = object(), 0
+    for id, user_id, name in rows:
+        n = n + 1 if user_id == last_user_id else 0
+        last_user_id = user_id
+        updates[name].append({'id': id, 'position': nth_key(n)})
+    for name, values in updates.items():
+        if values:
+            connection.execute(sa.text(
+                f'UPDATE {name} SET position = :position WHERE id = :id'),
+                values)
+
+    # SQLite can only add NOT NULL by rebuilding the table, which would
+    # drop the search triggers of the task table, see c4f7e2a9d158
+    for name in TABLES:
+        with op.batch_alter_table(name, schema=None) as batch_op:
+            if connection.dialect.name != 'sqlite' or name != 'task':
+                batch_op.alter_column(
+                    'position', existing_type=position_type(),
+                    nullable=False)
+            batch_op.create_index(
+                f'ix_{name}_user_id_position', ['user_id', 'position', 'id'],
+                unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('task_archive', schema=None) as batch_op:
+        batch_op.drop_index('ix_task_archive_user_id_position')
+        batch_op.drop_column('position')
+
+    with op.batch_alter_table('task', schema=None) as batch_op:
+        batch_op.drop_index('ix_task_user_id_position')
+        batch_op.drop_column('position')
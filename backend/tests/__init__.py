@@ -1,18 +1,73 @@
+import atexit
+import os
 from flask_testing import TestCase
+from sqlalchemy import event
 from app import create_app
 from app.models import db
 
 
+# Databases whose schema was created by this process
+created_schemas = set()
+
+
+def use_sqlite_savepoints(dbapi_connection, connection_record):
+    """ Let SQLAlchemy, not pysqlite, emit BEGIN so SAVEPOINT works """
+    dbapi_connection.isolation_level = None
+
+
+def begin_sqlite_transaction(connection):
+    """ Emit the BEGIN pysqlite no longer sends """
+    connection.exec_driver_sql("BEGIN")
+
+
+def remove_database(path):
+    """ Delete a test database file and its journal """
+    for name in (path, path + "-journal"):
+        if os.path.exists(name):
+            os.remove(name)
+
+
 class BaseTestCase(TestCase):
-    """ Base Tests """
+    """ Base Tests.
+
+    The schema is created once per process and every test runs in a
+    transaction that is rolled back; commits made by the code under test
+    only release a SAVEPOINT. Tests that need several connections to see
+    each other's commits set `transactional = False` and get their rows
+    deleted instead.
+    """
+    transactional = True
+
     def create_app(self):
         app = create_app(test_mode=True)
         return app
 
     def setUp(self):
-        db.create_all()
-        db.session.commit()
+        engine = db.engine
+        if engine.dialect.name == "sqlite":
+            event.listen(engine, "connect", use_sqlite_savepoints)
+            event.listen(engine, "begin", begin_sqlite_transaction)
+        if str(engine.url) not in created_schemas:
+            db.drop_all()
+            db.create_all()
+            created_schemas.add(str(engine.url))
+            if "TEST_DATABASE_URI" not in os.environ:
+                atexit.register(remove_database, engine.url.database)
+        if not self.transactional:
+            return
+        self.connection = engine.connect()
+        self.transaction = self.connection.begin()
+        db.session.remove()
+        db.session.configure(
+            bind=self.connection, join_transaction_mode="create_savepoint")
 
     def tearDown(self):
         db.session.remove()
-        db.drop_all()
+        if not self.transactional:
+            with db.engine.begin() as connection:
+                for table in reversed(db.metadata.sorted_tables):
+                    connection.execute(table.delete())
+            return
+        db.session.configure(bind=None)
+        self.transaction.rollback()
+        self.connection.close()
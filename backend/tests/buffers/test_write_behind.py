@@ -0,0 +1,70 @@
+import unittest
+from app.buffers import WriteBehindBuffer
+from tests import BaseTestCase
+
+
+class TestWriteBehindBuffer(BaseTestCase):
+    """ Test the coalescing write-behind buffer """
+
+    def setUp(self):
+        """ Setting up the test class """
+        super().setUp()
+        self.writes = []
+        self.buffer = WriteBehindBuffer(
+            "test_buffer", self.writes.append, interval=60, max_size=3)
+        self.buffer.init_app(self.app, "UNSET_INTERVAL", "UNSET_SIZE")
+
+    def test_values_are_coalesced(self):
+        """ Test only the latest value of a key is written """
+        self.buffer.record(1, "a")
+        self.buffer.record(1, "b")
+        self.buffer.record(2, "c")
+        self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(self.writes, [{1: "b", 2: "c"}])
+
+    def test_flush_when_full(self):
+        """ Test reaching max_size flushes in one call """
+        for key in range(3):
+            self.buffer.record(key, key)
+        self.assertEqual(self.writes, [{0: 0, 1: 1, 2: 2}])
+        self.assertEqual(len(self.buffer), 0)
+
+    def test_failed_flush_keeps_values(self):
+        """ Test values survive a failed write """
+        def failing_writer(items):
+            raise RuntimeError("database down")
+
+        self.buffer.writer = failing_writer
+        self.buffer.record(1, "a")
+        with self.assertRaises(RuntimeError):
+            self.buffer.flush()
+        self.assertEqual(len(self.buffer), 1)
+        self.buffer.writer = self.writes.append
+
+    def test_failing_values_are_dropped(self):
+        """ Test values are dropped after max_attempts failed writes """
+        def failing_writer(items):
+            raise RuntimeError("bad batch")
+
+        self.buffer.writer = failing_writer
+        self.buffer.record(1, "a")
+        for _ in range(self.buffer.max_attempts):
+            with self.assertRaises(RuntimeError):
+                self.buffer.flush()
+        self.assertEqual(len(self.buffer), 0)
+        self.buffer.writer = self.writes.append
+
+    def test_full_buffer_does_not_raise(self):
+        """ Test a failed inline flush does not fail the caller """
+        def failing_writer(items):
+            raise RuntimeError("bad batch")
+
+        self.buffer.writer = failing_writer
+        for key in range(3):
+            self.buffer.record(key, key)
+        self.assertEqual(len(self.buffer), 3)
+        self.buffer.writer = self.writes.append
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import tempfile
+import time
+import unittest
+from app.cache import LRUBackend, SQLiteBackend
+
+
+class BackendContract:
+    """ Behaviour shared by every cache backend """
+
+    def test_get_miss_then_hit(self):
+        """ Test a stored value is returned and counted as a hit """
+        self.assertIsNone(self.backend.get(1, "a"))
+        self.backend.set(1, "a", b"value")
+        self.assertEqual(self.backend.get(1, "a"), b"value")
+        stats = self.backend.stats.as_dict()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_invalidate_only_drops_user_entries(self):
+        """ Test invalidation is scoped to one user """
+        self.backend.set(1, "a", b"one")
+        self.backend.set(1, "b", b"two")
+        self.backend.set(2, "a", b"three")
+        self.backend.invalidate(1)
+        self.assertIsNone(self.backend.get(1, "a"))
+        self.assertIsNone(self.backend.get(1, "b"))
+        self.assertEqual(self.backend.get(2, "a"), b"three")
+
+    def test_size_bound_eviction(self):
+        """ Test the least recently used entry is evicted """
+        self.backend.set(1, "a", b"a")
+        self.backend.set(1, "b", b"b")
+        self.backend.set(1, "c", b"c")
+        self.backend.get(1, "a")
+        self.backend.set(1, "d", b"d")
+        self.assertIsNone(self.backend.get(1, "b"))
+        self.assertEqual(self.backend.get(1, "a"), b"a")
+        self.assertGreaterEqual(self.backend.stats.as_dict()["evictions"], 1)
+        self.assertEqual(len(self.backend), 3)
+
+    def test_ttl_expiration(self):
+        """ Test entries expire after the TTL """
+        self.backend.ttl = 0.05
+        self.backend.set(1, "a", b"a")
+        time.sleep(0.1)
+        self.assertIsNone(self.backend.get(1, "a"))
+
+
+class TestLRUBackend(BackendContract, unittest.TestCase):
+    """ Test the in-process LRU backend """
+
+    def setUp(self):
+        """ Setting up the test case """
+        self.backend = LRUBackend(max_entries=3, ttl=60)
+
+
+class TestSQLiteBackend(BackendContract, unittest.TestCase):
+    """ Test the SQLite file backend """
+
+    def setUp(self):
+        """ Setting up the test case """
+        fd, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        self.backend = SQLiteBackend(self.path, max_entries=3, ttl=60)
+
+    def tearDown(self):
+        """ Removing the cache file """
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def test_entries_shared_between_instances(self):
+        """ Test two backends on the same file see the same entries """
+        other = SQLiteBackend(self.path, max_entries=3, ttl=60)
+        self.backend.set(1, "a", b"shared")
+        self.assertEqual(other.get(1, "a"), b"shared")
+        other.invalidate(1)
+        self.assertIsNone(self.backend.get(1, "a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import json
+import unittest
+from app.events import EventBus, PostgresBackend, Subscription, format_event
+
+
+class NotifyStandIn(PostgresBackend):
+    """ NOTIFY backend whose notifications go through a local list """
+
+    def __init__(self, dispatch):
+        super().__init__(None, "task_events", dispatch)
+        self.sent = []
+
+    def publish(self, user_id, event):
+        """ Keep the payload that would be sent to the database """
+        self.sent.append(json.dumps({"user_id": user_id, "event": event}))
+
+    def start(self):
+        """ Nothing to listen to """
+        pass
+
+    def deliver(self):
+        """ Hand every pending notification to the listener side """
+        sent, self.sent = self.sent, []
+        for payload in sent:
+            self.receive(payload)
+
+
+class TestSubscription(unittest.TestCase):
+    """ Test the bounded subscriber queue """
+
+    def test_get_times_out(self):
+        """ Test an idle subscription returns None after the timeout """
+        self.assertIsNone(Subscription(1).get(0.01))
+
+    def test_overflow_evicts(self):
+        """ Test a full queue evicts the subscriber and drops its events """
+        subscription = Subscription(1, max_size=2)
+        self.assertTrue(subscription.put("a"))
+        self.assertTrue(subscription.put("b"))
+        self.assertFalse(subscription.put("c"))
+        self.assertTrue(subscription.evicted)
+        self.assertIsNone(subscription.get(0))
+
+
+class TestEventBus(unittest.TestCase):
+    """ Test publishing and dispatching events """
+
+    def setUp(self):
+        """ Setting up the test class """
+        self.bus = EventBus()
+
+    def test_events_reach_only_the_user(self):
+        """ Test subscribers only get the events of their user """
+        mine = self.bus.subscribe(1)
+        other = self.bus.subscribe(2)
+        self.bus.publish(1, "created", 3, {"id": 7})
+        self.assertEqual(
+            mine.get(0), {"type": "created", "seq": 3, "task": {"id": 7}})
+        self.assertIsNone(other.get(0))
+
+    def test_slow_subscriber_is_unsubscribed(self):
+        """ Test an evicted subscriber stops costing anything """
+        self.bus.queue_size = 1
+        slow = self.bus.subscribe(1)
+        self.bus.publish(1, "updated", 1, {"id": 1})
+        self.bus.publish(1, "updated", 2, {"id": 1})
+        self.assertTrue(slow.evicted)
+        self.assertEqual(len(self.bus), 0)
+        self.assertEqual(self.bus.evictions, 1)
+
+    def test_unsubscribe(self):
+        """ Test unsubscribing removes the user entry """
+        subscription = self.bus.subscribe(1)
+        self.bus.unsubscribe(subscription)
+        self.assertEqual(self.bus.subscribers, {})
+
+    def test_notify_round_trip(self):
+        """ Test events survive the NOTIFY payload encoding """
+        self.bus.backend = NotifyStandIn(self.bus.dispatch)
+        subscription = self.bus.subscribe(1)
+        self.bus.publish(1, "deleted", 5, {"id": 9})
+        self.assertIsNone(subscription.get(0))
+        self.bus.backend.deliver()
+        self.assertEqual(subscription.get(0)["task"], {"id": 9})
+
+    def test_format_event(self):
+        """ Test the text/event-stream rendering """
+        event = {"type": "deleted", "seq": 5, "task": {"id": 9}}
+        self.assertEqual(
+            format_event(event),
+            "id: 5\nevent: deleted\ndata: " + json.dumps(event) + "\n\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
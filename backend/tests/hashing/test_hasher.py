@@ -0,0 +1,81 @@
+import unittest
+from app.hashing import HashingBusy, hasher
+from app.models import User
+from tests import BaseTestCase
+from tests.utils.user import save_user_to_db
+
+
+class TestHasher(BaseTestCase):
+    """ Test the bounded password hashing pool """
+
+    def setUp(self):
+        """ Setting up the test class """
+        super().setUp()
+        self.data = {
+            "username": "test",
+            "email": "example@example.com",
+            "password": "12345"
+        }
+
+    def take_every_slot(self):
+        """ Acquire all hashing slots and return how many were taken """
+        taken = 0
+        while hasher.slots.acquire(blocking=False):
+            taken += 1
+        return taken
+
+    def release(self, taken):
+        """ Give back the slots taken by take_every_slot """
+        for _ in range(taken):
+            hasher.slots.release()
+
+    def test_hash_uses_policy(self):
+        """ Test new hashes follow the configured algorithm and cost """
+        user = save_user_to_db(self.data)
+        self.assertTrue(user.password.startswith("pbkdf2:sha256:1000$"))
+        self.assertFalse(user.password_needs_rehash())
+
+    def test_scrypt_hash_is_current(self):
+        """ Test hashes of a policy with implicit parameters are current """
+        hasher.method = "scrypt"
+        user = save_user_to_db(self.data)
+        self.assertTrue(user.password.startswith("scrypt:32768:8:1$"))
+        self.assertFalse(user.password_needs_rehash())
+        hasher.method = "scrypt:16384:8:1"
+        self.assertTrue(user.password_needs_rehash())
+
+    def test_saturated_pool_raises(self):
+        """ Test a full pool raises HashingBusy after the queue timeout """
+        hasher.queue_timeout = 0.01
+        taken = self.take_every_slot()
+        try:
+            with self.assertRaises(HashingBusy):
+                hasher.hash("12345")
+        finally:
+            self.release(taken)
+
+    def test_register_returns_503_when_saturated(self):
+        """ Test /register answers 503 with Retry-After under pressure """
+        hasher.queue_timeout = 0.01
+        taken = self.take_every_slot()
+        try:
+            response = self.client.post("/register", json=self.data)
+        finally:
+            self.release(taken)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["Retry-After"], "1")
+
+    def test_login_rehashes_old_policy(self):
+        """ Test a successful login upgrades a hash of an older policy """
+        user = save_user_to_db(self.data)
+        hasher.method = "pbkdf2:sha256:2000"
+        response = self.client.post("/login", json={
+            "email": self.data["email"], "password": self.data["password"]})
+        self.assertEqual(response.status_code, 200)
+        user = User.find_by_email(self.data["email"])
+        self.assertTrue(user.password.startswith("pbkdf2:sha256:2000$"))
+        self.assertTrue(user.check_password(self.data["password"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
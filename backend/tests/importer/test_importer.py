@@ -0,0 +1,62 @@
+import io
+import json
+import unittest
+from app.importer import import_tasks, import_users, read_records
+from app.models import Task, User
+from tests import BaseTestCase
+from tests.utils.user import save_user_to_db
+
+
+class TestImporter(BaseTestCase):
+    """ Test the bulk user and task importer """
+
+    def setUp(self):
+        """ Setting up the test class """
+        super().setUp()
+        self.user = save_user_to_db({
+            "username": "test",
+            "email": "example@example.com",
+            "password": "12345"
+        })
+
+    def test_import_users_skips_duplicates(self):
+        """ Test duplicated emails are skipped by the unique constraint """
+        stream = io.StringIO(
+            "username,email,password\n"
+            "one,one@example.com,pw1\n"
+            "dup,example@example.com,pw2\n"
+            "two,two@example.com,pw3\n"
+            "again,one@example.com,pw4\n"
+            "broken,,pw5\n"
+        )
+        report = import_users(
+            read_records(stream, "csv"), chunk_size=2, workers=2)
+        self.assertEqual(report.read, 5)
+        self.assertEqual(report.inserted, 2)
+        self.assertEqual(report.skipped, 2)
+        self.assertEqual(report.invalid, 1)
+        user = User.find_by_email("one@example.com")
+        self.assertEqual(user.username, "one")
+        self.assertTrue(user.check_password("pw1"))
+
+    def test_import_tasks(self):
+        """ Test tasks are imported from NDJSON """
+        lines = [
+            {"task": "a", "user_id": self.user.id, "is_completed": True},
+            {"task": "b", "description": "d", "user_id": self.user.id},
+            {"task": "", "user_id": self.user.id},
+            {"task": "no owner"},
+        ]
+        stream = io.StringIO("\n".join(json.dumps(line) for line in lines))
+        report = import_tasks(read_records(stream, "ndjson"), chunk_size=3)
+        self.assertEqual(report.inserted, 2)
+        self.assertEqual(report.invalid, 2)
+        tasks = Task.find_all_by_user_id(self.user.id)
+        self.assertEqual(
+            [(task.task, task.is_completed) for task in tasks],
+            [("a", True), ("b", False)]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
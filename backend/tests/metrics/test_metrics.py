@@ -0,0 +1,108 @@
+import unittest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from app.metrics import TimedQueuePool, current_sql
+from app.models import db
+from tests import BaseTestCase
+from tests.utils.task import auth_headers, save_tasks_to_db
+from tests.utils.user import save_user_to_db
+
+
+class TestMetrics(BaseTestCase):
+    """ Test the request instrumentation and the /metrics endpoint """
+
+    def setUp(self):
+        """ Setting up the test class """
+        super().setUp()
+        self.user = save_user_to_db({
+            "username": "test",
+            "email": "example@example.com",
+            "password": "12345"
+        })
+        self.headers = auth_headers(self.user)
+
+    def scrape(self):
+        """ Return the /metrics body as text """
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith("text/plain"))
+        return response.get_data(as_text=True)
+
+    def test_request_counters(self):
+        """ Test status counts and latency histograms are recorded """
+        save_tasks_to_db(self.user.id, 2)
+        self.client.get(f"/tasklist/{self.user.id}", headers=self.headers)
+        self.client.get("/user/9999")
+        body = self.scrape()
+        self.assertIn(
+            'http_requests_total{endpoint="main.get_tasks",'
+            'method="GET",status="200"} 1', body)
+        self.assertIn(
+            'http_requests_total{endpoint="main.get_user",'
+            'method="GET",status="404"} 1', body)
+        self.assertIn(
+            'http_request_duration_seconds_count'
+            '{endpoint="main.get_tasks"} 1', body)
+        self.assertIn(
+            'http_response_size_bytes_count{endpoint="main.get_tasks"} 1',
+            body)
+
+    def test_sql_statements_counted(self):
+        """ Test the SQL run by a request is attributed to its endpoint """
+        self.client.get(f"/tasklist/{self.user.id}", headers=self.headers)
+        body = self.scrape()
+        line = next(
+            line for line in body.splitlines()
+            if line.startswith("db_statements_per_request_sum"
+                               '{endpoint="main.get_tasks"}')
+        )
+        self.assertGreaterEqual(float(line.split()[-1]), 1)
+
+    def test_failed_statements_leave_nothing_behind(self):
+        """ Test a statement that raises keeps no timing on the connection """
+        token = current_sql.set([0, 0.0])
+        try:
+            with db.engine.connect() as conn:
+                info = dict(conn.info)
+                for _ in range(3):
+                    with self.assertRaises(OperationalError):
+                        conn.execute(text("SELECT * FROM missing"))
+                conn.execute(text("SELECT 1"))
+                self.assertEqual(conn.info, info)
+        finally:
+            current_sql.reset(token)
+
+    def test_login_sections(self):
+        """ Test password checking is timed separately """
+        self.client.post("/login", json={
+            "email": "example@example.com", "password": "12345"})
+        body = self.scrape()
+        self.assertIn(
+            'section_duration_seconds_count{section="password_check"} 1',
+            body)
+
+    def test_metrics_endpoint_not_instrumented(self):
+        """ Test scraping does not count itself """
+        self.scrape()
+        self.assertNotIn('endpoint="metrics"', self.scrape())
+
+    def test_pool_checkout_wait(self):
+        """ Test the time spent waiting for a connection is recorded """
+        engine = create_engine(
+            "sqlite://", poolclass=TimedQueuePool,
+            pool_logging_name="timed")
+        with engine.connect():
+            pass
+        engine.dispose()
+        self.assertIn(
+            'db_pool_checkout_seconds_count{bind="timed"} 1', self.scrape())
+
+    def test_pool_gauges(self):
+        """ Test the occupancy of the application pool is exposed """
+        body = self.scrape()
+        self.assertIn('db_pool_checked_out{bind="default"}', body)
+        self.assertIn('db_pool_size{bind="default"}', body)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select
+from app.events import events
+from app.models import (
+    db,
+    ArchivedTask,
+    Task,
+    TaskStats,
+    TaskTombstone,
+    User,
+)
+from tests import BaseTestCase
+from tests.utils.task import save_tasks_to_db
+from tests.utils.user import save_user_to_db
+
+
+class TestArchivedTaskModel(BaseTestCase):
+    """ Test moving completed tasks to the archive table """
+
+    def setUp(self):
+        """ Setting up the test class """
+        super().setUp()
+        self.user = save_user_to_db({
+            "username": "test",
+            "email": "example@example.com",
+            "password": "12345"
+        })
+        self.tasks = save_tasks_to_db(self.user.id, 10)
+        for task in self.tasks[:7]:
+            task.is_completed = True
+        db.session.commit()
+        self.ids = [task.id for task in self.tasks]
+        self.now = datetime.now(timezone.utc)
+
+    def hot_ids(self):
+        """ Return the ids left in the task table """
+        return list(db.session.scalars(select(Task.id).order_by(Task.id)))
+
+    def test_archive_moves_completed_tasks(self):
+        """ Test only completed tasks move, with their columns, in chunks """
+        chunks = []
+        moved = ArchivedTask.archive(
+            self.now + timedelta(days=1), chunk_size=3,
+            progress=chunks.append)
+        self.assertEqual(moved, 7)
+        self.assertEqual(chunks, [3, 6, 7])
+        self.assertEqual(self.hot_ids(), self.ids[7:])
+        archived = db.session.scalars(
+            select(ArchivedTask).order_by(ArchivedTask.id)).all()
+        self.assertEqual([task.id for task in archived], self.ids[:7])
+        self.assertEqual(archived[0].task, "task 0")
+        self.assertEqual(archived[0].description, "desc 0")
+        self.assertTrue(archived[0].is_completed)
+        self.assertEqual(archived[0].user_id, self.user.id)
+        self.assertIsNotNone(archived[0].archived_at)
+
+    def test_archive_keeps_recent_tasks(self):
+        """ Test tasks written after the cutoff stay hot """
+        moved = ArchivedTask.archive(self.now - timedelta(days=1))
+        self.assertEqual(moved, 0)
+        self.assertEqual(self.hot_ids(), self.ids)
+
+    def test_archive_bumps_version_and_keeps_counters(self):
+        """ Test the task list version changes but the counters do not """
+        version = User.find_version(self.user.id)
+        ArchivedTask.archive(self.now + timedelta(days=1))
+        self.assertNotEqual(User.find_version(self.user.id), version)
+        self.assertEqual(TaskStats.find_by_user_id(self.user.id), (10, 7))
+        self.assertEqual(TaskStats.rebuild(), [])
+
+    def test_archive_leaves_tombstones_and_events(self):
+        """ Test synced clients learn the tasks left the list """
+        subscription = events.subscribe(self.user.id)
+        self.addCleanup(events.unsubscribe, subscription)
+        ArchivedTask.archive(self.now + timedelta(days=1))
+        version = db.session.scalar(
+            select(User.version).where(User.id == self.user.id))
+        tombstones = db.session.execute(
+            select(TaskTombstone.task_id, TaskTombstone.seq)
+            .order_by(TaskTombstone.task_id)).all()
+        self.assertEqual(tombstones, [(id, version) for id in self.ids[:7]])
+        pushed = [subscription.get(0) for _ in range(7)]
+        self.assertEqual(
+            [(event["type"], event["task"]["id"]) for event in pushed],
+            [("deleted", id) for id in self.ids[:7]])
+
+    def test_restore(self):
+        """ Test a restored task is back in the list as a new write """
+        ArchivedTask.archive(self.now + timedelta(days=1))
+        task_id = self.ids[0]
+        version = db.session.scalar(
+            select(User.version).where(User.id == self.user.id))
+        self.assertEqual(ArchivedTask.restore(task_id, self.user.id), task_id)
+        task = Task.find_by_id(task_id)
+        self.assertEqual(task.task, "task 0")
+        self.assertEqual(task.position, self.tasks[0].position)
+        self.assertGreater(task.seq, version)
+        self.assertIsNone(db.session.get(ArchivedTask, task_id))
+        self.assertNotIn(task_id, db.session.scalars(
+            select(TaskTombstone.task_id)).all())
+        self.assertEqual(TaskStats.find_by_user_id(self.user.id), (10, 7))
+        self.assertIsNone(ArchivedTask.restore(task_id, self.user.id))
+        self.assertIsNone(ArchivedTask.restore(self.ids[1], self.user.id + 1))
+
+    def test_archived_ids_are_not_reused(self):
+        """ Test a new task never takes the id of an archived one """
+        self.tasks[-1].is_completed = True
+        db.session.commit()
+        ArchivedTask.archive(self.now + timedelta(days=1))
+        task = save_tasks_to_db(self.user.id, 1)[0]
+        self.assertGreater(task.id, max(self.ids))
+
+
+if __name__ == "__main__":
+    unittest.main()
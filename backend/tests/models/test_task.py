@@ -0,0 +1,24 @@
+import unittest
+from sqlalchemy import inspect
+from app.models import db
+from tests import BaseTestCase
+
+
+class TestTaskModel(BaseTestCase):
+    """ Test that task model is ok """
+
+    def test_access_path_indexes_created(self):
+        """ Test create_all builds the indexes of the task access paths """
+        indexes = {
+            index["name"]: index["column_names"]
+            for index in inspect(db.engine).get_indexes("task")
+        }
+        self.assertEqual(indexes["ix_task_user_id_id"], ["user_id", "id"])
+        self.assertEqual(indexes["ix_task_user_id_open"], ["user_id"])
+        self.assertEqual(indexes["ix_task_user_id_seq"], ["user_id", "seq"])
+        self.assertEqual(
+            indexes["ix_task_user_id_position"], ["user_id", "position", "id"])
+
+
+if __name__ == "__main__":
+    unittest.main()
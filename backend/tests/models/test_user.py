@@ -1,6 +1,7 @@
 import unittest
-from app.models import User
+from app.models import db, Task, User
 from tests import BaseTestCase
+from tests.utils.task import save_tasks_to_db
 from tests.utils.user import save_user_to_db
 
 
@@ -103,6 +104,37 @@ class TestUserModel(BaseTestCase):
         deleted_user = User.find_by_id(id)
         self.assertIsNone(deleted_user)
 
+    def test_purge_cascades_to_tasks(self):
+        """ Test purging a user drops their tasks in the database """
+        user = save_user_to_db(self.data)
+        user_id = user.id
+        save_tasks_to_db(user_id, 5)
+        db.session.expunge_all()
+        self.assertTrue(User.purge(user_id))
+        self.assertIsNone(User.find_by_id(user_id))
+        self.assertEqual(Task.find_all_by_user_id(user_id), [])
+        self.assertFalse(User.purge(user_id))
+
+    def test_update_does_not_move_version_back(self):
+        """ Test a stale user save keeps the version increasing """
+        user = save_user_to_db(self.data)
+        loaded = user.version
+        for _ in range(3):
+            User.bump_versions(db.session.connection(), [user.id])
+        user.update(username="renamed")
+        self.assertEqual(user.version, loaded + 4)
+        db.session.expire(user)
+        self.assertEqual(user.version, loaded + 4)
+
+    def test_delete_from_database_cascades_to_tasks(self):
+        """ Test the ORM delete leaves unloaded tasks to the database """
+        user = save_user_to_db(self.data)
+        save_tasks_to_db(user.id, 3)
+        user_id = user.id
+        db.session.expunge_all()
+        User.find_by_id(user_id).delete_from_db()
+        self.assertEqual(Task.find_all_by_user_id(user_id), [])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,68 @@
+import random
+import unittest
+from app.positions import key_between, keys_after
+
+
+class TestOrderKeys(unittest.TestCase):
+    """ Test the fractional order keys """
+
+    def assertBetween(self, low, key, high):
+        """ Check a key sorts strictly between two bounds """
+        if low is not None:
+            self.assertLess(low, key)
+        if high is not None:
+            self.assertLess(key, high)
+
+    def test_appending_keeps_keys_short(self):
+        """ Test appended keys increase and grow logarithmically """
+        keys = keys_after(None, 100000)
+        self.assertEqual(keys[:3], ["a0", "a1", "a2"])
+        self.assertEqual(keys, sorted(keys))
+        self.assertLessEqual(max(len(key) for key in keys), 4)
+
+    def test_prepending(self):
+        """ Test keys can always be put before the first one """
+        first = "a0"
+        for _ in range(1000):
+            key = key_between(None, first)
+            self.assertBetween(None, key, first)
+            first = key
+
+    def test_random_inserts_stay_ordered(self):
+        """ Test inserting anywhere keeps the list sorted """
+        rand = random.Random(7)
+        keys = keys_after(None, 20)
+        for _ in range(2000):
+            n = rand.randint(0, len(keys))
+            low = keys[n - 1] if n else None
+            high = keys[n] if n < len(keys) else None
+            key = key_between(low, high)
+            self.assertBetween(low, key, high)
+            keys.insert(n, key)
+        self.assertEqual(keys, sorted(keys))
+
+    def test_repeated_inserts_in_one_gap(self):
+        """ Test a gap can be split again and again """
+        low, high = "a0", "a1"
+        for _ in range(200):
+            key = key_between(low, high)
+            self.assertBetween(low, key, high)
+            high = key
+
+    def test_bounds_out_of_order(self):
+        """ Test equal or reversed bounds are refused """
+        with self.assertRaises(ValueError):
+            key_between("a1", "a1")
+        with self.assertRaises(ValueError):
+            key_between("a2", "a1")
+
+    def test_invalid_key(self):
+        """ Test malformed keys are refused """
+        with self.assertRaises(ValueError):
+            key_between("!", None)
+        with self.assertRaises(ValueError):
+            key_between("a10", None)
+
+
+if __name__ == "__main__":
+    unittest.main()
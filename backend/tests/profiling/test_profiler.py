@@ -0,0 +1,140 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from app import create_app
+from app.config import TestConfig
+from app.profiling import Capture, profiler
+from tests import BaseTestCase
+from tests.utils.task import auth_headers, save_tasks_to_db
+from tests.utils.user import save_user_to_db
+
+
+class ProfilingTestCase(BaseTestCase):
+    """ Base class running the app with profiling settings """
+    settings = {}
+
+    def create_app(self):
+        self.directory = tempfile.mkdtemp()
+        settings = dict(self.settings, PROFILING_DIR=self.directory)
+        with mock.patch.multiple(TestConfig, **settings):
+            return create_app(test_mode=True)
+
+    def setUp(self):
+        """ Setting up the test class """
+        super().setUp()
+        self.user = save_user_to_db({
+            "username": "profiled",
+            "email": "example@example.com",
+            "password": "12345"
+        })
+        save_tasks_to_db(self.user.id, 3)
+        self.headers = auth_headers(self.user)
+
+    def tearDown(self):
+        """ Remove the profiles """
+        super().tearDown()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def get_tasks(self, **headers):
+        return self.client.get(
+            f"/tasklist/{self.user.id}", headers=dict(self.headers, **headers))
+
+    def runs(self):
+        return sorted(os.listdir(self.directory))
+
+
+class TestSignedHeader(ProfilingTestCase):
+    """ Test profiles asked for with a signed header """
+    settings = {"PROFILING_SECRET": "profiling-secret"}
+
+    def test_signed_header_writes_profile(self):
+        """ Test a valid token profiles the request """
+        response = self.get_tasks(**{"X-Profile-Token": profiler.make_token()})
+        self.assertEqual(200, response.status_code)
+        name = response.headers["X-Profile"]
+        self.assertEqual([name + ".json", name + ".prof"], self.runs())
+        with open(os.path.join(self.directory, name + ".json")) as stream:
+            summary = json.load(stream)
+        self.assertEqual("main.get_tasks", summary["endpoint"])
+        self.assertEqual(200, summary["status"])
+        self.assertGreater(summary["sql_statements"], 0)
+        self.assertIn("SELECT", summary["slowest_sql"][0]["statement"])
+
+    def test_requests_without_token_not_profiled(self):
+        """ Test missing or forged tokens are ignored """
+        self.assertNotIn("X-Profile", self.get_tasks().headers)
+        response = self.get_tasks(**{"X-Profile-Token": "profile.forged"})
+        self.assertEqual(200, response.status_code)
+        self.assertNotIn("X-Profile", response.headers)
+        self.assertEqual([], self.runs())
+
+
+class TestSampling(ProfilingTestCase):
+    """ Test profiles of sampled requests """
+    settings = {
+        "PROFILING_SAMPLE_RATE": 1.0,
+        "PROFILING_MODE": "sample",
+        "PROFILING_MAX_PROFILES": 2,
+    }
+
+    def test_sampled_request_writes_collapsed_stacks(self):
+        """ Test the stack sampler output """
+        name = self.get_tasks().headers["X-Profile"]
+        self.assertEqual([name + ".collapsed", name + ".json"], self.runs())
+
+    def test_directory_keeps_last_profiles(self):
+        """ Test old profiles are rotated out """
+        names = [self.get_tasks().headers["X-Profile"] for _ in range(4)]
+        self.assertEqual(
+            sorted(f"{name}.{extension}" for name in names[-2:]
+                   for extension in ("collapsed", "json")),
+            self.runs())
+
+
+class TestKeepNone(ProfilingTestCase):
+    """ Test a profile bound of 0 """
+    settings = {
+        "PROFILING_SAMPLE_RATE": 1.0,
+        "PROFILING_MAX_PROFILES": 0,
+    }
+
+    def test_directory_keeps_nothing(self):
+        """ Test every run is rotated out """
+        self.get_tasks()
+        self.get_tasks()
+        self.assertEqual([], self.runs())
+
+
+class TestDisabled(ProfilingTestCase):
+    """ Test the default configuration never profiles """
+
+    def test_not_profiled(self):
+        """ Test no header and no file """
+        self.assertNotIn("X-Profile", self.get_tasks().headers)
+        self.assertEqual([], self.runs())
+
+
+class TestCapture(BaseTestCase):
+    """ Test the capture used by the profile-endpoint command """
+
+    def test_slowest_statements_grouped(self):
+        """ Test statements are grouped by text and ranked by time """
+        with Capture() as capture:
+            pass
+        capture.statements += [("a", 0.1), ("b", 0.3), ("a", 0.25)]
+        self.assertEqual([
+            {"statement": "a", "count": 2, "total_s": 0.35, "max_s": 0.25},
+            {"statement": "b", "count": 1, "total_s": 0.3, "max_s": 0.3},
+        ], capture.slowest_statements(5))
+
+    def test_unknown_mode(self):
+        """ Test only the known profilers are accepted """
+        with self.assertRaises(ValueError):
+            Capture("perf")
+
+
+if __name__ == "__main__":
+    unittest.main()
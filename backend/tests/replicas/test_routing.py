@@ -0,0 +1,135 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from sqlalchemy import insert, select
+from app import create_app
+from app.config import TestConfig
+from app.models import db, Task, User
+from app.replicas import ReplicaRouter, STICKY_HEADER, replicas
+from tests import BaseTestCase
+from tests.utils.task import auth_headers, save_tasks_to_db
+from tests.utils.user import save_user_to_db
+
+
+class TestReplicaRouting(BaseTestCase):
+    """ Test read-only views read from a replica SQLite file """
+
+    def create_app(self):
+        handle, self.replica_path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        uris = ["sqlite:///" + self.replica_path]
+        with mock.patch.object(TestConfig, "REPLICA_DATABASE_URIS", uris):
+            return create_app(test_mode=True)
+
+    def setUp(self):
+        """ Setting up the test class """
+        super().setUp()
+        self.replica = db.engines["replica_0"]
+        db.metadata.create_all(self.replica)
+        self.user = save_user_to_db({
+            "username": "primary",
+            "email": "example@example.com",
+            "password": "12345"
+        })
+        self.task = save_tasks_to_db(self.user.id, 1)[0]
+        self.headers = auth_headers(self.user)
+        with self.replica.begin() as connection:
+            connection.execute(insert(User), {
+                "id": self.user.id, "username": "replica",
+                "email": self.user.email, "password": "-", "version": 99
+            })
+            connection.execute(insert(Task), {
+                "id": self.task.id, "task": "replica task",
+                "user_id": self.user.id, "position": self.task.position
+            })
+        # Requests start with an empty session
+        db.session.expunge_all()
+
+    def tearDown(self):
+        """ Dropping the replica """
+        super().tearDown()
+        db.metadata.drop_all(self.replica)
+        self.replica.dispose()
+        os.remove(self.replica_path)
+        # The metadata of a bind outlives the app, other tests have none
+        db.metadatas.pop("replica_0")
+
+    def read_tasks(self):
+        """ Return the task names of the user """
+        response = self.client.get(
+            f"/tasklist/{self.user.id}", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        return [task["task"] for task in response.json]
+
+    def test_user_read_from_replica(self):
+        """ Test an anonymous read is served by the replica """
+        response = self.client.get(f"/user/{self.user.id}")
+        self.assertEqual(response.json["username"], "replica")
+
+    def test_tasks_read_from_replica(self):
+        """ Test the task list is served by the replica """
+        self.assertEqual(self.read_tasks(), ["replica task"])
+
+    def test_read_your_writes(self):
+        """ Test a client reads from the primary right after writing """
+        response = self.client.put(
+            f"/task/{self.task.id}", json={"task": "edited"},
+            headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.read_tasks(), ["edited"])
+
+    def test_read_your_writes_on_another_worker(self):
+        """ Test the client token keeps the reads on the primary """
+        response = self.client.put(
+            f"/task/{self.task.id}", json={"task": "edited"},
+            headers=self.headers)
+        token = response.headers[STICKY_HEADER]
+        # A worker that did not serve the write
+        replicas.sticky.clear()
+        self.assertEqual(self.read_tasks(), ["edited"])
+        self.client.delete_cookie("read_primary")
+        self.assertEqual(self.read_tasks(), ["replica task"])
+        self.headers[STICKY_HEADER] = token
+        self.assertEqual(self.read_tasks(), ["edited"])
+
+    def test_token_checked_by_another_router(self):
+        """ Test a token is only valid for its client and its window """
+        writer, reader = ReplicaRouter(self.app), ReplicaRouter(self.app)
+        response = self.app.response_class()
+        writer.stick(self.user.email, response)
+        token = response.headers[STICKY_HEADER]
+        self.assertIsNone(reader.choose(self.user.email, token))
+        self.assertEqual(reader.choose("other@example.com", token),
+                         "replica_0")
+        self.assertEqual(reader.choose(self.user.email, token + "x"),
+                         "replica_0")
+        reader.window = writer.window = 0
+        writer.stick(self.user.email, response)
+        self.assertEqual(
+            reader.choose(self.user.email, response.headers[STICKY_HEADER]),
+            "replica_0")
+
+    def test_stickiness_expires(self):
+        """ Test the client goes back to the replica after the window """
+        replicas.window = 0
+        self.client.put(
+            f"/task/{self.task.id}", json={"task": "edited"},
+            headers=self.headers)
+        self.assertEqual(self.read_tasks(), ["replica task"])
+
+    def test_writes_go_to_primary(self):
+        """ Test flushes never use the replica bind """
+        db.session.info["replica"] = "replica_0"
+        try:
+            Task(task="new", user_id=self.user.id).save_to_db()
+        finally:
+            db.session.info.pop("replica", None)
+        query = select(Task.task).where(Task.task == "new")
+        with self.replica.connect() as connection:
+            self.assertIsNone(connection.scalar(query))
+        self.assertEqual(db.session.scalar(query), "new")
+
+
+if __name__ == "__main__":
+    unittest.main()
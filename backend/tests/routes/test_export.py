@@ -0,0 +1,90 @@
+import csv
+import io
+import json
+import tracemalloc
+import unittest
+from tests import BaseTestCase
+from tests.utils.task import auth_headers, bulk_save_tasks, save_tasks_to_db
+from tests.utils.user import save_user_to_db
+
+
+class TestTaskExportRoute(BaseTestCase):
+    """ Test the streaming task export endpoint """
+
+    def setUp(self):
+        """ Setting up the test class """
+        super().setUp()
+        self.app.config["EXPORT_CHUNK_SIZE"] = 100
+        self.user = save_user_to_db({
+            "username": "test",
+            "email": "example@example.com",
+            "password": "12345"
+        })
+        self.headers = auth_headers(self.user)
+        self.url = f"/tasklist/{self.user.id}/export"
+
+    def test_export_ndjson(self):
+        """ Test NDJSON lines match Task.serialize """
+        tasks = save_tasks_to_db(self.user.id, 250)
+        response = self.client.get(self.url, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        lines = response.get_data(as_text=True).splitlines()
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            [task.serialize() for task in tasks]
+        )
+
+    def test_export_csv(self):
+        """ Test CSV export has a header and one row per task """
+        save_tasks_to_db(self.user.id, 250)
+        response = self.client.get(
+            self.url + "?format=csv", headers=self.headers)
+        self.assertEqual(response.mimetype, "text/csv")
+        rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+        self.assertEqual(
+            rows[0], ["id", "task", "description", "user_id", "is_completed"])
+        self.assertEqual(len(rows), 251)
+
+    def test_export_invalid_format(self):
+        """ Test unknown formats are rejected """
+        response = self.client.get(
+            self.url + "?format=xml", headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_of_another_user(self):
+        """ Test users can only export their own tasks """
+        other = save_user_to_db({
+            "username": "other",
+            "email": "other@example.com",
+            "password": "12345"
+        })
+        save_tasks_to_db(other.id, 3)
+        response = self.client.get(
+            f"/tasklist/{other.id}/export", headers=self.headers)
+        self.assertEqual(response.status_code, 403)
+
+    def peak_export_memory(self):
+        """ Return the traced memory peak while consuming an export """
+        response = self.client.get(self.url, headers=self.headers)
+        tracemalloc.start()
+        try:
+            total = sum(len(chunk) for chunk in response.response)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+            response.close()
+        return total, peak
+
+    def test_export_memory_is_constant(self):
+        """ Test peak memory does not grow with the export size """
+        bulk_save_tasks(self.user.id, 2000)
+        small_size, small_peak = self.peak_export_memory()
+        bulk_save_tasks(self.user.id, 18000)
+        large_size, large_peak = self.peak_export_memory()
+        self.assertGreater(large_size, small_size * 9)
+        self.assertLess(large_peak, small_peak * 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,161 @@
+import unittest
+from sqlalchemy import event
+from app.models import db, Task
+from tests import BaseTestCase
+from tests.utils.task import auth_headers, save_tasks_to_db
+from tests.utils.user import save_user_to_db
+
+
+class TestMoveTaskRoute(BaseTestCase):
+    """ Test reordering tasks with order keys """
+
+    def setUp(self):
+        """ Setting up the test class """
+        super().setUp()
+        self.user = save_user_to_db({
+            "username": "test",
+            "email": "example@example.com",
+            "password": "12345"
+        })
+        self.headers = auth_headers(self.user)
+        self.ids = [task.id for task in save_tasks_to_db(self.user.id, 5)]
+
+    def move(self, id, **anchors):
+        """ Return the response of a move """
+        return self.client.put(
+            f"/task/{id}/move", headers=self.headers, json=anchors)
+
+    def listed_ids(self, query=""):
+        """ Return the ids of the task list, in order """
+        response = self.client.get(
+            f"/tasklist/{self.user.id}{query}", headers=self.headers)
+        return [task["id"] for task in response.json]
+
+    def test_new_tasks_are_appended(self):
+        """ Test tasks are listed in creation order until moved """
+        self.assertEqual(self.listed_ids(), self.ids)
+
+    def test_move_after(self):
+        """ Test moving a task after another one """
+        a, b, c, d, e = self.ids
+        self.assertEqual(self.move(a, after=c).status_code, 200)
+        self.assertEqual(self.listed_ids(), [b, c, a, d, e])
+        self.move(b, after=e)
+        self.assertEqual(self.listed_ids(), [c, a, d, e, b])
+
+    def test_move_before(self):
+        """ Test moving a task before another one, including the first """
+        a, b, c, d, e = self.ids
+        self.move(e, before=a)
+        self.assertEqual(self.listed_ids(), [e, a, b, c, d])
+        self.move(c, before=b)
+        self.assertEqual(self.listed_ids(), [e, a, c, b, d])
+
+    def test_move_between(self):
+        """ Test moving a task between two anchors """
+        a, b, c, d, e = self.ids
+        self.move(e, after=a, before=b)
+        self.assertEqual(self.listed_ids(), [a, e, b, c, d])
+        self.assertEqual(
+            self.move(a, after=d, before=b).status_code, 400)
+
+    def test_move_writes_one_row(self):
+        """ Test only the moved task gets a new key """
+        before = dict(db.session.execute(
+            db.select(Task.id, Task.position)).all())
+        self.move(self.ids[0], after=self.ids[2])
+        db.session.expire_all()
+        after = dict(db.session.execute(
+            db.select(Task.id, Task.position)).all())
+        changed = [id for id in before if before[id] != after[id]]
+        self.assertEqual(changed, [self.ids[0]])
+
+    def test_wrong_anchor_order_does_not_rebalance(self):
+        """ Test anchors in the wrong order fail before any task write """
+        a, b, c, d, e = self.ids
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", record)
+        try:
+            response = self.move(e, after=d, before=b)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", record)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(
+            [sql for sql in statements if sql.startswith("UPDATE task")])
+
+    def test_tied_keys_are_rebalanced(self):
+        """ Test a move between equal keys rebalances the user first """
+        a, b, c, d, e = self.ids
+        db.session.execute(
+            db.update(Task).where(Task.id.in_([b, c])).values(position="a1"))
+        db.session.commit()
+        self.assertEqual(self.move(e, after=b).status_code, 200)
+        self.assertEqual(self.listed_ids(), [a, b, e, c, d])
+
+    def test_pagination_follows_positions(self):
+        """ Test cursor pages walk the tasks in list order """
+        a, b, c, d, e = self.ids
+        self.move(a, after=e)
+        seen, query = [], "?limit=2"
+        while True:
+            body = self.client.get(
+                f"/tasklist/{self.user.id}{query}", headers=self.headers).json
+            seen.extend(task["id"] for task in body["tasks"])
+            if body["next_cursor"] is None:
+                break
+            query = f"?limit=2&after={body['next_cursor']}"
+        self.assertEqual(seen, [b, c, d, e, a])
+
+    def test_changes_feed_sends_positions(self):
+        """ Test syncing clients receive the new key of a moved task """
+        since = self.user.version
+        self.move(self.ids[0], after=self.ids[4])
+        response = self.client.get(
+            f"/tasklist/{self.user.id}/changes?since={since}",
+            headers=self.headers)
+        tasks = response.json["tasks"]
+        self.assertEqual([task["id"] for task in tasks], [self.ids[0]])
+        self.assertEqual(
+            tasks[0]["position"],
+            db.session.get(Task, self.ids[0]).position)
+
+    def test_move_invalid_anchors(self):
+        """ Test missing, foreign or self anchors are rejected """
+        a, b = self.ids[:2]
+        self.assertEqual(self.move(a).status_code, 400)
+        self.assertEqual(self.move(a, after=a).status_code, 400)
+        self.assertEqual(self.move(a, after="b").status_code, 400)
+        self.assertEqual(self.move(a, after=b + 100).status_code, 404)
+
+    def test_move_other_user_task(self):
+        """ Test tasks of another user can not be moved """
+        other = save_user_to_db({
+            "username": "other",
+            "email": "other@example.com",
+            "password": "12345"
+        })
+        response = self.client.put(
+            f"/task/{self.ids[0]}/move", headers=auth_headers(other),
+            json={"after": self.ids[1]})
+        self.assertEqual(response.status_code, 404)
+
+    def test_rebalance_shortens_keys(self):
+        """ Test rebalancing keeps the order with the shortest keys """
+        a, b, c, d, e = self.ids
+        for _ in range(40):
+            self.move(a, after=b, before=c)
+            self.move(b, after=a, before=c)
+        self.assertEqual(self.listed_ids(), [a, b, c, d, e])
+        self.assertEqual(
+            Task.find_users_with_long_positions(4), [self.user.id])
+        Task.rebalance(self.user.id)
+        self.assertEqual(Task.find_users_with_long_positions(4), [])
+        self.assertEqual(self.listed_ids(), [a, b, c, d, e])
+
+
+if __name__ == "__main__":
+    unittest.main()
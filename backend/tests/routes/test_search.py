@@ -0,0 +1,115 @@
+import unittest
+from app.models import db
+from app.pagination import encode_cursor
+from tests import BaseTestCase
+from tests.utils.task import auth_headers, save_task_to_db
+from tests.utils.user import save_user_to_db
+
+
+class TestTaskSearchRoute(BaseTestCase):
+    """ Test the full-text task search endpoint """
+
+    def setUp(self):
+        """ Setting up the test class """
+        super().setUp()
+        self.user = save_user_to_db({
+            "username": "test",
+            "email": "example@example.com",
+            "password": "12345"
+        })
+        self.headers = auth_headers(self.user)
+
+    def search(self, query, headers=None):
+        """ Return the response of a search """
+        return self.client.get(
+            "/tasks/search" + query, headers=headers or self.headers)
+
+    def test_search_matches_title_and_description(self):
+        """ Test every word must appear in the title or description """
+        save_task_to_db({"task": "Buy milk", "description": "at the market",
+                         "user_id": self.user.id})
+        save_task_to_db({"task": "Buy bread", "description": None,
+                         "user_id": self.user.id})
+        save_task_to_db({"task": "Call mom", "description": "about milk",
+                         "user_id": self.user.id})
+        response = self.search("?q=milk")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sorted(task["task"] for task in response.json["tasks"]),
+            ["Buy milk", "Call mom"])
+        response = self.search("?q=buy+market")
+        self.assertEqual(
+            [task["task"] for task in response.json["tasks"]], ["Buy milk"])
+
+    def test_search_ranks_best_match_first(self):
+        """ Test tasks mentioning the words more often come first """
+        save_task_to_db({"task": "report", "description": "weekly notes",
+                         "user_id": self.user.id})
+        save_task_to_db({"task": "report", "description": "report report",
+                         "user_id": self.user.id})
+        response = self.search("?q=report")
+        self.assertEqual(
+            response.json["tasks"][0]["description"], "report report")
+
+    def test_search_is_scoped_to_user(self):
+        """ Test other users' tasks are never returned """
+        other = save_user_to_db({
+            "username": "other",
+            "email": "other@example.com",
+            "password": "12345"
+        })
+        save_task_to_db({"task": "secret plan", "user_id": other.id})
+        response = self.search("?q=secret")
+        self.assertEqual(response.json["tasks"], [])
+
+    def test_search_follows_updates_and_deletes(self):
+        """ Test the index tracks edited and deleted tasks """
+        task = save_task_to_db({"task": "old title", "user_id": self.user.id})
+        gone = save_task_to_db({"task": "old gone", "user_id": self.user.id})
+        task.task = "new title"
+        db.session.commit()
+        gone.delete_from_db()
+        self.assertEqual(self.search("?q=old").json["tasks"], [])
+        self.assertEqual(
+            [t["id"] for t in self.search("?q=new").json["tasks"]], [task.id])
+
+    def test_search_paginates(self):
+        """ Test the cursor walks through every match once """
+        for n in range(5):
+            save_task_to_db({"task": f"shared {n}", "user_id": self.user.id})
+        seen = []
+        query = "?q=shared&limit=2"
+        while True:
+            body = self.search(query).json
+            seen.extend(task["id"] for task in body["tasks"])
+            if body["next_cursor"] is None:
+                break
+            query = f"?q=shared&limit=2&after={body['next_cursor']}"
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(len(set(seen)), 5)
+
+    def test_search_quotes_operators(self):
+        """ Test FTS syntax in the query is searched literally """
+        save_task_to_db({"task": "fix OR bug", "user_id": self.user.id})
+        response = self.search('?q="fix" OR NEAR(')
+        self.assertEqual(response.status_code, 200)
+
+    def test_search_rejects_empty_query(self):
+        """ Test a missing or blank query is a bad request """
+        self.assertEqual(self.search("").status_code, 400)
+        self.assertEqual(self.search("?q=+").status_code, 400)
+
+    def test_search_rejects_foreign_cursor(self):
+        """ Test a cursor issued to another user is refused """
+        cursor = encode_cursor(self.user.id + 1, 2)
+        response = self.search(f"?q=x&after={cursor}")
+        self.assertEqual(response.status_code, 400)
+
+    def test_search_requires_token(self):
+        """ Test anonymous requests are refused """
+        response = self.client.get("/tasks/search?q=x")
+        self.assertEqual(response.status_code, 401)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import json
+import unittest
+from app.events import events
+from tests import BaseTestCase
+from tests.utils.task import auth_headers, save_tasks_to_db
+from tests.utils.user import save_user_to_db
+
+
+class TestTaskStreamRoute(BaseTestCase):
+    """ Test the task events stream """
+
+    def setUp(self):
+        """ Setting up the test class """
+        super().setUp()
+        self.app.config["TASK_EVENTS_HEARTBEAT"] = 0.01
+        self.user = save_user_to_db({
+            "username": "test",
+            "email": "example@example.com",
+            "password": "12345"
+        })
+        self.headers = auth_headers(self.user)
+        self.task = save_tasks_to_db(self.user.id, 1)[0]
+
+    def open_stream(self, **kwargs):
+        """ Open the stream and read the opening message """
+        response = self.client.get(
+            "/tasks/stream", buffered=False,
+            headers=kwargs.pop("headers", self.headers), **kwargs)
+        self.addCleanup(response.close)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "text/event-stream")
+        chunks = iter(response.response)
+        self.assertEqual(next(chunks), b"retry: 3000\n\n")
+        return chunks
+
+    def next_event(self, chunks):
+        """ Skip heartbeats and parse the next event """
+        chunk = next(chunks)
+        while chunk == b": ping\n\n":
+            chunk = next(chunks)
+        fields = dict(
+            line.split(": ", 1) for line in chunk.decode().splitlines()
+            if line)
+        fields["data"] = json.loads(fields["data"])
+        return fields
+
+    def test_writes_are_pushed(self):
+        """ Test updates and deletes of the user tasks are pushed """
+        chunks = self.open_stream()
+        task_id = self.task.id
+        self.task.update(task="renamed")
+        self.client.delete(f"/task/{task_id}", headers=self.headers)
+
+        updated = self.next_event(chunks)
+        self.assertEqual(updated["event"], "updated")
+        self.assertEqual(updated["data"]["task"]["task"], "renamed")
+        deleted = self.next_event(chunks)
+        self.assertEqual(deleted["event"], "deleted")
+        self.assertEqual(deleted["data"]["task"], {"id": task_id})
+        self.assertGreater(int(deleted["id"]), int(updated["id"]))
+
+    def test_heartbeat(self):
+        """ Test an idle stream sends comments to keep the connection """
+        chunks = self.open_stream()
+        self.assertEqual(next(chunks), b": ping\n\n")
+
+    def test_closing_unsubscribes(self):
+        """ Test a closed stream leaves no subscription behind """
+        chunks = self.open_stream()
+        self.assertEqual(len(events), 1)
+        chunks.close()
+        self.assertEqual(len(events), 0)
+
+    def test_token_in_query_string(self):
+        """ Test EventSource clients can pass the token in the URL """
+        token = self.headers["Authorization"].split()[1]
+        self.open_stream(headers={}, query_string={"jwt": token})
+
+    def test_disabled_on_threaded_servers(self):
+        """ Test servers that do not serve streams refuse them """
+        self.app.config["TASK_EVENTS_STREAM"] = False
+        response = self.client.get("/tasks/stream", headers=self.headers)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(events), 0)
+
+    def test_requires_token(self):
+        """ Test the stream is not public """
+        response = self.client.get("/tasks/stream")
+        self.assertEqual(response.status_code, 401)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import unittest
+from types import SimpleNamespace
+from app.models import db, TaskStats, TaskTombstone
+from tests import BaseTestCase
+from tests.utils.task import auth_headers, save_task_to_db, save_tasks_to_db
+from tests.utils.user import save_user_to_db
+
+
+class TestUserSummaryRoute(BaseTestCase):
+    """ Test the task counters and the summary endpoint """
+
+    def setUp(self):
+        """ Setting up the test class """
+        super().setUp()
+        self.user = save_user_to_db({
+            "username": "test",
+            "email": "example@example.com",
+            "password": "12345"
+        })
+        self.headers = auth_headers(self.user)
+        self.url = f"/user/{self.user.id}/summary"
+
+    def summary(self):
+        """ Return the summary of the test user """
+        response = self.client.get(self.url, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        return response.json
+
+    def assertCounters(self, total, completed):
+        """ Check the summary and that a recount finds no drift """
+        self.assertEqual(self.summary(), {
+            "user_id": self.user.id, "total": total,
+            "completed": completed, "open": total - completed
+        })
+        self.assertEqual(TaskStats.rebuild(), [])
+
+    def test_summary_without_tasks(self):
+        """ Test a user without tasks has zero counters """
+        self.assertCounters(0, 0)
+
+    def test_summary_unknown_user(self):
+        """ Test unknown users are not found """
+        gone = SimpleNamespace(email="gone@example.com", id=self.user.id + 1)
+        response = self.client.get(
+            f"/user/{gone.id}/summary", headers=auth_headers(gone))
+        self.assertEqual(response.status_code, 404)
+
+    def test_summary_of_another_user(self):
+        """ Test users can only read their own counters """
+        other = save_user_to_db({
+            "username": "other",
+            "email": "other@example.com",
+            "password": "12345"
+        })
+        response = self.client.get(
+            f"/user/{other.id}/summary", headers=self.headers)
+        self.assertEqual(response.status_code, 403)
+
+    def test_orm_writes_move_counters(self):
+        """ Test save_to_db, set_as_completed, update and delete_from_db """
+        tasks = save_tasks_to_db(self.user.id, 3)
+        save_task_to_db({"task": "done", "is_completed": True,
+                         "user_id": self.user.id})
+        self.assertCounters(4, 1)
+        tasks[0].set_as_completed()
+        tasks[1].update(is_completed=True)
+        self.assertCounters(4, 3)
+        tasks[1].set_as_completed(False)
+        tasks[1].update(description="no change of counters")
+        self.assertCounters(4, 2)
+        tasks[0].delete_from_db()
+        tasks[2].delete_from_db()
+        self.assertCounters(2, 1)
+
+    def test_expired_task_changes_move_counters(self):
+        """ Test changes of tasks expired by a commit are counted """
+        task = save_task_to_db({"task": "a", "user_id": self.user.id})
+        db.session.expire_all()
+        task.is_completed = True
+        db.session.commit()
+        self.assertCounters(1, 1)
+
+    def test_api_writes_move_counters(self):
+        """ Test the single task and batch endpoints """
+        ids = [task.id for task in save_tasks_to_db(self.user.id, 4)]
+        self.client.put(f"/task/{ids[0]}", headers=self.headers,
+                        json={"is_completed": True})
+        self.client.put(f"/task/{ids[0]}", headers=self.headers,
+                        json={"is_completed": True})
+        self.assertCounters(4, 1)
+        self.client.delete(f"/task/{ids[0]}", headers=self.headers)
+        self.assertCounters(3, 0)
+        self.client.post("/tasks/batch", headers=self.headers, json={
+            "operations": [
+                {"op": "create", "task": {
+                    "task": "new", "is_completed": True,
+                    "user_id": self.user.id}},
+                {"op": "complete", "id": ids[1]},
+                {"op": "update", "id": ids[2],
+                 "task": {"description": "edited"}},
+                {"op": "delete", "id": ids[3]},
+            ]
+        })
+        self.assertCounters(3, 2)
+
+    def test_repeated_batch_delete_counts_once(self):
+        """ Test a task deleted twice in one batch is counted once """
+        ids = [task.id for task in save_tasks_to_db(self.user.id, 3)]
+        response = self.client.post("/tasks/batch", headers=self.headers,
+                                    json={"operations": [
+                                        {"op": "delete", "id": ids[0]},
+                                        {"op": "delete", "id": ids[0]},
+                                    ]})
+        self.assertEqual(
+            [result["status"] for result in response.json["results"]],
+            [204, 404])
+        self.assertCounters(2, 0)
+        tombstones = db.session.scalars(
+            db.select(TaskTombstone.task_id)
+            .where(TaskTombstone.user_id == self.user.id)).all()
+        self.assertEqual(tombstones, [ids[0]])
+
+    def test_rebuild_reports_and_fixes_drift(self):
+        """ Test the recount rewrites counters changed behind its back """
+        save_tasks_to_db(self.user.id, 2)
+        db.session.execute(
+            db.update(TaskStats).values(total=7, completed=3))
+        db.session.commit()
+        self.assertEqual(
+            TaskStats.rebuild(), [(self.user.id, (7, 3), (2, 0))])
+        self.assertCounters(2, 0)
+
+    def test_summary_requires_token(self):
+        """ Test anonymous requests are refused """
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+
+if __name__ == "__main__":
+    unittest.main()
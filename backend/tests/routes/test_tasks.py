@@ -0,0 +1,550 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from app.cache import cache
+from app.importer import import_tasks
+from app.models import ArchivedTask, db, Task
+from tests import BaseTestCase
+from tests.utils.task import auth_headers, save_tasks_to_db
+from tests.utils.user import save_user_to_db
+
+
+class TestTaskListRoute(BaseTestCase):
+    """ Test the task list endpoint """
+
+    def setUp(self):
+        """ Setting up the test class """
+        super().setUp()
+        self.user = save_user_to_db({
+            "username": "test",
+            "email": "example@example.com",
+            "password": "12345"
+        })
+        self.headers = auth_headers(self.user)
+        self.url = f"/tasklist/{self.user.id}"
+
+    def test_legacy_mode_returns_plain_list(self):
+        """ Test legacy clients still receive every task as a list """
+        save_tasks_to_db(self.user.id, 20)
+        response = self.client.get(self.url, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.json, list)
+        self.assertEqual(len(response.json), 20)
+
+    def test_legacy_mode_not_found(self):
+        """ Test legacy mode keeps the 404 for users without tasks """
+        response = self.client.get(
+            self.url + "?legacy=true", headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+
+    def test_pagination_walks_every_task_once(self):
+        """ Test following next_cursor returns every task in order """
+        tasks = save_tasks_to_db(self.user.id, 23)
+        seen = []
+        url = self.url + "?limit=10"
+        while True:
+            response = self.client.get(url, headers=self.headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.json["tasks"]), 10)
+            seen.extend(task["id"] for task in response.json["tasks"])
+            cursor = response.json["next_cursor"]
+            if cursor is None:
+                break
+            url = self.url + f"?limit=10&after={cursor}"
+        self.assertEqual(seen, [task.id for task in tasks])
+
+    def test_pagination_default_limit(self):
+        """ Test the page size defaults to RECORDS_PER_PAGE """
+        save_tasks_to_db(self.user.id, 20)
+        response = self.client.get(
+            self.url + "?legacy=false", headers=self.headers)
+        self.assertEqual(
+            len(response.json["tasks"]), self.app.config["RECORDS_PER_PAGE"])
+        self.assertIsNotNone(response.json["next_cursor"])
+
+    def test_pagination_empty_page(self):
+        """ Test a user without tasks gets an empty page """
+        response = self.client.get(
+            self.url + "?limit=5", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json, {"tasks": [], "next_cursor": None})
+
+    def test_pagination_invalid_cursor(self):
+        """ Test a malformed cursor is rejected """
+        response = self.client.get(
+            self.url + "?after=not-a-cursor", headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+    def test_pagination_cursor_of_other_user(self):
+        """ Test a cursor issued for another user is rejected """
+        save_tasks_to_db(self.user.id, 3)
+        response = self.client.get(
+            self.url + "?limit=1", headers=self.headers)
+        cursor = response.json["next_cursor"]
+        response = self.client.get(
+            f"/tasklist/{self.user.id + 1}?after={cursor}",
+            headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+    def test_pagination_invalid_limit(self):
+        """ Test a non positive limit is rejected """
+        response = self.client.get(
+            self.url + "?limit=0", headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+    def archive_every_other_task(self, total):
+        """ Save tasks, archive the even ones and return all of their ids """
+        tasks = save_tasks_to_db(self.user.id, total)
+        ids = [task.id for task in tasks]
+        for task in tasks[::2]:
+            task.is_completed = True
+        db.session.commit()
+        ArchivedTask.archive(datetime.now(timezone.utc) + timedelta(days=1))
+        return ids
+
+    def test_archived_tasks_hidden_by_default(self):
+        """ Test the task list only reads the hot table """
+        ids = self.archive_every_other_task(6)
+        response = self.client.get(self.url, headers=self.headers)
+        self.assertEqual([task["id"] for task in response.json], ids[1::2])
+        response = self.client.get(
+            self.url + "?limit=10", headers=self.headers)
+        self.assertEqual(
+            [task["id"] for task in response.json["tasks"]], ids[1::2])
+
+    def test_include_archived(self):
+        """ Test include_archived merges both tables in id order """
+        ids = self.archive_every_other_task(23)
+        response = self.client.get(
+            self.url + "?include_archived=true", headers=self.headers)
+        self.assertEqual([task["id"] for task in response.json], ids)
+        seen = []
+        url = self.url + "?limit=5&include_archived=true"
+        while True:
+            body = self.client.get(url, headers=self.headers).json
+            seen.extend(task["id"] for task in body["tasks"])
+            if body["next_cursor"] is None:
+                break
+            url = (self.url + "?limit=5&include_archived=true"
+                   f"&after={body['next_cursor']}")
+        self.assertEqual(seen, ids)
+
+
+class TestTaskBatchRoute(BaseTestCase):
+    """ Test the batch task endpoint """
+
+    def setUp(self):
+        """ Setting up the test class """
+        super().setUp()
+        self.user = save_user_to_db({
+            "username": "test",
+            "email": "example@example.com",
+            "password": "12345"
+        })
+        self.other = save_user_to_db({
+            "username": "other",
+            "email": "other@example.com",
+            "password": "12345"
+        })
+        self.headers = auth_headers(self.user)
+
+    def post_batch(self, operations):
+        """ Send a batch of operations """
+        return self.client.post(
+            "/tasks/batch",
+            json={"operations": operations},
+            headers=self.headers
+        )
+
+    def test_batch_applies_every_operation(self):
+        """ Test create, update, complete and delete in one request """
+        tasks = save_tasks_to_db(self.user.id, 3)
+        ids = [task.id for task in tasks]
+        response = self.post_batch([
+            {"op": "create", "task": {"task": "new", "user_id": self.user.id}},
+            {"op": "update", "id": ids[0], "task": {"description": "edited"}},
+            {"op": "complete", "id": ids[1]},
+            {"op": "delete", "id": ids[2]},
+        ])
+        self.assertEqual(response.status_code, 200)
+        results = response.json["results"]
+        self.assertEqual(
+            [result["status"] for result in results], [201, 200, 200, 204])
+
+        created = Task.find_by_id(results[0]["id"])
+        self.assertEqual(created.task, "new")
+        self.assertEqual(Task.find_by_id(ids[0]).description, "edited")
+        self.assertTrue(Task.find_by_id(ids[1]).is_completed)
+        self.assertIsNone(Task.find_by_id(ids[2]))
+
+    def test_batch_reports_invalid_items(self):
+        """ Test invalid items are reported while valid ones are applied """
+        task = save_tasks_to_db(self.other.id, 1)[0]
+        response = self.post_batch([
+            {"op": "create", "task": {"task": "ok", "user_id": self.user.id}},
+            {"op": "create", "task": {"task": "no user"}},
+            {"op": "create", "task": {"task": "", "user_id": self.user.id}},
+            {"op": "create", "task": {"task": "x", "user_id": self.other.id}},
+            {"op": "delete", "id": task.id},
+            {"op": "rename", "id": task.id},
+        ])
+        results = response.json["results"]
+        self.assertEqual(
+            [result["status"] for result in results],
+            [201, 400, 400, 403, 404, 400]
+        )
+        self.assertIn("user_id", results[1]["errors"])
+        self.assertIsNotNone(Task.find_by_id(task.id))
+        self.assertEqual(len(Task.find_all_by_user_id(self.user.id)), 1)
+
+    def test_batch_rejects_bool_ids(self):
+        """ Test JSON booleans are not taken for the task ids 0 and 1 """
+        task = save_tasks_to_db(self.user.id, 1)[0]
+        if task.id != 1:
+            self.skipTest("needs a database that starts ids at 1")
+        response = self.post_batch([
+            {"op": "complete", "id": True},
+            {"op": "delete", "id": True},
+        ])
+        self.assertEqual(
+            [result["status"] for result in response.json["results"]],
+            [400, 400])
+        task = Task.find_by_id(1)
+        self.assertIsNotNone(task)
+        self.assertFalse(task.is_completed)
+
+    def test_batch_rejects_bad_payload(self):
+        """ Test the request must carry a non empty list """
+        for operations in (None, [], "create", [1, 2]):
+            response = self.post_batch(operations)
+            self.assertEqual(response.status_code, 400)
+
+    def test_batch_rejects_too_many_operations(self):
+        """ Test the number of operations is bounded """
+        limit = self.app.config["MAX_BATCH_OPERATIONS"]
+        response = self.post_batch([{"op": "complete", "id": 1}] * (limit + 1))
+        self.assertEqual(response.status_code, 400)
+
+
+class TestConditionalGet(BaseTestCase):
+    """ Test ETag revalidation of the task list and user endpoints """
+
+    def setUp(self):
+        """ Setting up the test class """
+        super().setUp()
+        self.user = save_user_to_db({
+            "username": "test",
+            "email": "example@example.com",
+            "password": "12345"
+        })
+        self.headers = auth_headers(self.user)
+        self.url = f"/tasklist/{self.user.id}"
+        self.tasks = save_tasks_to_db(self.user.id, 3)
+
+    def revalidate(self, url, etag):
+        """ Send a conditional GET """
+        headers = dict(self.headers, **{"If-None-Match": etag})
+        return self.client.get(url, headers=headers)
+
+    def test_tasklist_not_modified(self):
+        """ Test a matching If-None-Match gets an empty 304 """
+        response = self.client.get(self.url, headers=self.headers)
+        etag = response.headers["ETag"]
+        response = self.revalidate(self.url, etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b"")
+        self.assertEqual(response.headers["ETag"], etag)
+
+    def test_tasklist_etag_changes_on_write(self):
+        """ Test every kind of task write invalidates the ETag """
+        etag = self.client.get(self.url, headers=self.headers).headers["ETag"]
+        writes = [
+            lambda: self.tasks[0].update(description="edited"),
+            lambda: self.tasks[1].set_as_completed(),
+            lambda: self.tasks[2].delete_from_db(),
+            lambda: save_tasks_to_db(self.user.id, 1),
+        ]
+        for write in writes:
+            write()
+            response = self.revalidate(self.url, etag)
+            self.assertEqual(response.status_code, 200)
+            etag = response.headers["ETag"]
+
+    def test_tasklist_etag_depends_on_page(self):
+        """ Test each page representation has its own ETag """
+        first = self.client.get(self.url + "?limit=1", headers=self.headers)
+        response = self.revalidate(
+            self.url + "?limit=2", first.headers["ETag"])
+        self.assertEqual(response.status_code, 200)
+
+    def test_batch_invalidates_etag(self):
+        """ Test bulk mutations also invalidate the ETag """
+        etag = self.client.get(self.url, headers=self.headers).headers["ETag"]
+        self.client.post(
+            "/tasks/batch",
+            json={"operations": [{"op": "complete", "id": self.tasks[0].id}]},
+            headers=self.headers
+        )
+        self.assertEqual(self.revalidate(self.url, etag).status_code, 200)
+
+    def test_user_not_modified(self):
+        """ Test user reads are revalidated and invalidated on update """
+        url = f"/user/{self.user.id}"
+        etag = self.client.get(url).headers["ETag"]
+        self.assertEqual(self.revalidate(url, etag).status_code, 304)
+        self.user.update(username="renamed")
+        response = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["username"], "renamed")
+
+
+class TestTaskListCache(BaseTestCase):
+    """ Test the task list response cache """
+
+    def setUp(self):
+        """ Setting up the test class """
+        super().setUp()
+        self.user = save_user_to_db({
+            "username": "test",
+            "email": "example@example.com",
+            "password": "12345"
+        })
+        self.headers = auth_headers(self.user)
+        self.url = f"/tasklist/{self.user.id}"
+        self.tasks = save_tasks_to_db(self.user.id, 3)
+
+    def test_second_read_is_a_hit(self):
+        """ Test a repeated read is served from the cache """
+        first = self.client.get(self.url, headers=self.headers)
+        second = self.client.get(self.url, headers=self.headers)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(first.headers["ETag"], second.headers["ETag"])
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_write_invalidates(self):
+        """ Test task writes drop the cached lists of the owner """
+        self.client.get(self.url, headers=self.headers)
+        self.assertEqual(cache.stats()["entries"], 1)
+        self.tasks[0].update(task="renamed")
+        self.assertEqual(cache.stats()["entries"], 0)
+        response = self.client.get(self.url, headers=self.headers)
+        self.assertEqual(response.json[0]["task"], "renamed")
+
+    def test_delete_invalidates(self):
+        """ Test deleting a task drops the cached lists of the owner """
+        self.client.get(self.url, headers=self.headers)
+        self.tasks[0].delete_from_db()
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_stats_endpoint(self):
+        """ Test the counters are exposed """
+        self.client.get(self.url, headers=self.headers)
+        response = self.client.get("/cache/stats", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["misses"], 1)
+        self.assertEqual(response.json["entries"], 1)
+
+
+class TestTaskChangesRoute(BaseTestCase):
+    """ Test the task changes feed """
+
+    def setUp(self):
+        """ Setting up the test class """
+        super().setUp()
+        self.user = save_user_to_db({
+            "username": "test",
+            "email": "example@example.com",
+            "password": "12345"
+        })
+        self.headers = auth_headers(self.user)
+        self.url = f"/tasklist/{self.user.id}/changes"
+        self.tasks = save_tasks_to_db(self.user.id, 3)
+
+    def changes(self, since):
+        """ Read the changes after a sequence """
+        response = self.client.get(
+            self.url, query_string={"since": since}, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        return response.json
+
+    def test_first_sync_returns_every_task(self):
+        """ Test since=0 returns all the tasks and the last sequence """
+        body = self.changes(0)
+        self.assertEqual(
+            [task["task"] for task in body["tasks"]],
+            ["task 0", "task 1", "task 2"])
+        self.assertEqual(body["deleted"], [])
+        self.assertEqual(body["seq"], body["tasks"][-1]["seq"])
+        self.assertNotIn("updated_at", body["tasks"][0])
+
+    def test_only_changes_are_returned(self):
+        """ Test model, route and batch writes all show up once """
+        ids = [task.id for task in self.tasks]
+        since = self.changes(0)["seq"]
+        self.tasks[0].update(task="renamed")
+        self.client.delete(f"/task/{ids[1]}", headers=self.headers)
+        self.client.post("/tasks/batch", headers=self.headers, json={
+            "operations": [{"op": "complete", "id": ids[2]}]})
+
+        body = self.changes(since)
+        self.assertEqual(
+            [(task["id"], task["task"], task["is_completed"])
+             for task in body["tasks"]],
+            [(ids[0], "renamed", False), (ids[2], "task 2", True)])
+        self.assertEqual(body["deleted"], [ids[1]])
+        self.assertGreater(body["seq"], since)
+        self.assertEqual(self.changes(body["seq"]),
+                         {"tasks": [], "deleted": [], "seq": body["seq"]})
+
+    def test_model_delete_leaves_tombstone(self):
+        """ Test deleting through the model records the task id """
+        since = self.changes(0)["seq"]
+        task_id = self.tasks[0].id
+        self.tasks[0].delete_from_db()
+        self.assertEqual(self.changes(since)["deleted"], [task_id])
+
+    def test_archive_and_restore_are_changes(self):
+        """ Test archived tasks leave the feed and restored ones return """
+        since = self.changes(0)["seq"]
+        task_id = self.tasks[0].id
+        self.tasks[0].set_as_completed()
+        ArchivedTask.archive(datetime.now(timezone.utc) + timedelta(days=1))
+        body = self.changes(since)
+        self.assertEqual((body["tasks"], body["deleted"]), ([], [task_id]))
+
+        # Archived tasks are read-only until restored
+        response = self.client.put(
+            f"/task/{task_id}", json={"task": "x"}, headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+        response = self.client.post(
+            f"/task/{task_id}/restore", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        body = self.changes(since)
+        self.assertEqual(
+            [task["id"] for task in body["tasks"]], [task_id])
+        self.assertEqual(body["deleted"], [])
+        response = self.client.post(
+            f"/task/{task_id}/restore", headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+
+    def test_changes_of_another_user(self):
+        """ Test users can only sync their own tasks """
+        other = save_user_to_db({
+            "username": "other",
+            "email": "other@example.com",
+            "password": "12345"
+        })
+        response = self.client.get(
+            f"/tasklist/{other.id}/changes", headers=self.headers)
+        self.assertEqual(response.status_code, 403)
+
+    def test_imported_tasks_are_changes(self):
+        """ Test imported tasks show up from the first and the next sync """
+        since = self.changes(0)["seq"]
+        import_tasks([{"task": "imported", "user_id": self.user.id}])
+        for start in (0, since):
+            body = self.changes(start)
+            self.assertEqual(body["tasks"][-1]["task"], "imported")
+            self.assertGreater(body["seq"], since)
+
+    def test_invalid_since(self):
+        """ Test since must be a non negative integer """
+        for since in ("-1", "abc"):
+            response = self.client.get(
+                self.url, query_string={"since": since},
+                headers=self.headers)
+            self.assertEqual(response.status_code, 400)
+
+
+class TestTaskMutationRoute(BaseTestCase):
+    """ Test updating and deleting one task """
+
+    def setUp(self):
+        """ Setting up the test class """
+        super().setUp()
+        self.user = save_user_to_db({
+            "username": "test",
+            "email": "example@example.com",
+            "password": "12345"
+        })
+        self.other = save_user_to_db({
+            "username": "other",
+            "email": "other@example.com",
+            "password": "12345"
+        })
+        self.headers = auth_headers(self.user)
+        self.task = save_tasks_to_db(self.user.id, 1)[0]
+        self.foreign = save_tasks_to_db(self.other.id, 1)[0]
+        self.statements = []
+
+    def record_statement(self, conn, cursor, statement, *args):
+        """ Keep every SQL statement sent to the database """
+        self.statements.append(statement.split()[0].upper())
+
+    def send(self, method, task_id, **kwargs):
+        """ Send a request to /task/<id> while recording its SQL """
+        event.listen(db.engine, "before_cursor_execute",
+                     self.record_statement)
+        try:
+            return self.client.open(
+                f"/task/{task_id}", method=method,
+                headers=kwargs.pop("headers", self.headers), **kwargs)
+        finally:
+            event.remove(db.engine, "before_cursor_execute",
+                         self.record_statement)
+
+    def test_update_own_task(self):
+        """ Test an update is a single UPDATE ... RETURNING """
+        response = self.send("PUT", self.task.id, json={
+            "id": self.task.id, "task": "edited", "is_completed": True,
+            "user_id": self.other.id
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("SELECT", self.statements)
+        db.session.expire_all()
+        task = Task.find_by_id(self.task.id)
+        self.assertEqual(task.task, "edited")
+        self.assertTrue(task.is_completed)
+        self.assertEqual(task.user_id, self.user.id)
+
+    def test_update_foreign_task(self):
+        """ Test a task of another user can not be updated """
+        response = self.send("PUT", self.foreign.id, json={"task": "mine"})
+        self.assertEqual(response.status_code, 404)
+        db.session.expire_all()
+        self.assertEqual(Task.find_by_id(self.foreign.id).task, "task 0")
+
+    def test_update_invalid_payload(self):
+        """ Test unknown or empty fields are rejected """
+        response = self.send("PUT", self.task.id, json={"color": "red"})
+        self.assertEqual(response.status_code, 400)
+        response = self.send("PUT", self.task.id, json={"task": ""})
+        self.assertEqual(response.status_code, 400)
+
+    def test_delete_own_task(self):
+        """ Test a delete is a single DELETE ... RETURNING """
+        task_id = self.task.id
+        response = self.send("DELETE", task_id)
+        self.assertEqual(response.status_code, 204)
+        self.assertNotIn("SELECT", self.statements)
+        db.session.expunge_all()
+        self.assertIsNone(Task.find_by_id(task_id))
+
+    def test_delete_foreign_task(self):
+        """ Test a task of another user can not be deleted """
+        response = self.send("DELETE", self.foreign.id)
+        self.assertEqual(response.status_code, 404)
+        self.assertIsNotNone(Task.find_by_id(self.foreign.id))
+
+    def test_token_without_user_id_claim(self):
+        """ Test tokens issued before the user_id claim still work """
+        token = create_access_token(self.user.email)
+        response = self.send(
+            "DELETE", self.task.id,
+            headers={"Authorization": f"Bearer {token}"})
+        self.assertEqual(response.status_code, 204)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,200 @@
+import threading
+import unittest
+from sqlalchemy import event, func, select
+from app.messages import ERR_EXISTING_USER
+from app.models import db, last_logins, Task, User
+from tests import BaseTestCase
+from tests.utils.task import auth_headers, save_tasks_to_db
+from tests.utils.user import save_user_to_db
+
+
+class TestLoginRoute(BaseTestCase):
+    """ Test the login endpoint """
+
+    def setUp(self):
+        """ Setting up the test class """
+        super().setUp()
+        self.data = {
+            "username": "test",
+            "email": "example@example.com",
+            "password": "12345"
+        }
+        self.user = save_user_to_db(self.data)
+        self.statements = []
+
+    def record_statement(self, conn, cursor, statement, *args):
+        """ Keep every SQL statement sent to the database """
+        self.statements.append(statement.split()[0].upper())
+
+    def login(self):
+        """ Log the test user in while recording its SQL """
+        event.listen(db.engine, "before_cursor_execute",
+                     self.record_statement)
+        try:
+            return self.client.post("/login", json={
+                "email": self.data["email"],
+                "password": self.data["password"]
+            })
+        finally:
+            event.remove(db.engine, "before_cursor_execute",
+                         self.record_statement)
+
+    def test_login_is_read_only(self):
+        """ Test a login of an enabled account writes nothing """
+        response = self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            set(self.statements) - {"SAVEPOINT", "RELEASE"}, {"SELECT"})
+        self.assertEqual(len(last_logins), 1)
+
+    def test_last_login_flushed(self):
+        """ Test the buffered last login date reaches the database """
+        self.login()
+        last_logins.flush()
+        db.session.expire_all()
+        self.assertIsNotNone(User.find_by_id(self.user.id).last_login_at)
+
+    def test_last_login_of_purged_user(self):
+        """ Test a pending entry of a deleted user does not break logins """
+        last_logins.max_size = 2
+        self.login()
+        other = save_user_to_db({
+            "username": "other",
+            "email": "other@example.com",
+            "password": "12345"
+        })
+        self.assertTrue(User.purge(self.user.id))
+        response = self.client.post("/login", json={
+            "email": "other@example.com", "password": "12345"})
+        self.assertEqual(response.status_code, 200)
+        # The full buffer was flushed without the purged user
+        self.assertEqual(len(last_logins), 0)
+        db.session.expire_all()
+        self.assertIsNotNone(User.find_by_id(other.id).last_login_at)
+
+    def test_login_reenables_disabled_account(self):
+        """ Test a disabled account is re-enabled with one write """
+        self.user.update(is_disabled=True)
+        response = self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("UPDATE", self.statements)
+        db.session.expire_all()
+        self.assertFalse(User.find_by_id(self.user.id).is_disabled)
+
+
+class TestRegisterRoute(BaseTestCase):
+    """ Test the register endpoint """
+    transactional = False
+
+    def setUp(self):
+        """ Setting up the test class """
+        super().setUp()
+        self.data = {
+            "username": "test",
+            "email": "example@example.com",
+            "password": "12345"
+        }
+
+    def register_concurrently(self, payloads):
+        """ POST every payload to /register from its own thread """
+        statuses = [None] * len(payloads)
+        barrier = threading.Barrier(len(payloads))
+
+        def register(n):
+            client = self.app.test_client()
+            barrier.wait()
+            response = client.post("/register", json=payloads[n])
+            statuses[n] = response.status_code
+
+        threads = [
+            threading.Thread(target=register, args=(n,))
+            for n in range(len(payloads))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return statuses
+
+    def count_users(self, email):
+        """ Count the rows stored for an email """
+        db.session.rollback()
+        query = select(func.count()).where(User.email == email)
+        return db.session.scalar(query)
+
+    def test_register_success(self):
+        """ Test a new user is created in one INSERT """
+        response = self.client.post("/register", json=self.data)
+        self.assertEqual(response.status_code, 201)
+        user = User.find_by_email(self.data["email"])
+        self.assertTrue(user.check_password(self.data["password"]))
+
+    def test_register_existing_email(self):
+        """ Test the unique email conflict maps to ERR_EXISTING_USER """
+        self.client.post("/register", json=self.data)
+        response = self.client.post("/register", json=self.data)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json, ERR_EXISTING_USER)
+
+    def test_exists(self):
+        """ Test the EXISTS lookup """
+        self.assertFalse(User.exists(self.data["email"]))
+        save_user_to_db(self.data)
+        self.assertTrue(User.exists(self.data["email"]))
+
+    def test_concurrent_same_email(self):
+        """ Test racing registrations of one email create one user """
+        statuses = self.register_concurrently([self.data] * 16)
+        self.assertEqual(statuses.count(201), 1)
+        self.assertEqual(statuses.count(400), 15)
+        self.assertEqual(self.count_users(self.data["email"]), 1)
+
+    def test_concurrent_distinct_emails(self):
+        """ Test concurrent registrations of different emails all succeed """
+        payloads = [
+            dict(self.data, email=f"user{n}@example.com") for n in range(16)
+        ]
+        statuses = self.register_concurrently(payloads)
+        self.assertEqual(statuses, [201] * 16)
+
+
+class TestPurgeUserRoute(BaseTestCase):
+    """ Test the hard delete endpoint """
+
+    def setUp(self):
+        """ Setting up the test class """
+        super().setUp()
+        self.user = save_user_to_db({
+            "username": "test",
+            "email": "example@example.com",
+            "password": "12345"
+        })
+        self.other = save_user_to_db({
+            "username": "other",
+            "email": "other@example.com",
+            "password": "12345"
+        })
+        self.user_id = self.user.id
+        save_tasks_to_db(self.user_id, 3)
+
+    def test_purge_own_account(self):
+        """ Test a user can purge their own account """
+        response = self.client.delete(
+            f"/userlist/{self.user_id}/purge",
+            headers=auth_headers(self.user))
+        self.assertEqual(response.status_code, 204)
+        db.session.expunge_all()
+        self.assertIsNone(User.find_by_id(self.user_id))
+        self.assertEqual(Task.find_all_by_user_id(self.user_id), [])
+
+    def test_purge_other_account(self):
+        """ Test a user can not purge someone else """
+        response = self.client.delete(
+            f"/userlist/{self.user_id}/purge",
+            headers=auth_headers(self.other))
+        self.assertEqual(response.status_code, 403)
+        self.assertIsNotNone(User.find_by_id(self.user_id))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+from app.models import Task
+from app.schemas import RowSerializer, TaskSchema, UserSchema
+from tests import BaseTestCase
+from tests.utils.task import save_task_to_db
+from tests.utils.user import save_user_to_db
+
+
+class TestRowSerializer(BaseTestCase):
+    """ Test the column projection serializer of task lists """
+
+    def setUp(self):
+        """ Setting up the test class """
+        super().setUp()
+        self.user = save_user_to_db({
+            "username": "test",
+            "email": "example@example.com",
+            "password": "12345"
+        })
+        self.tasks = [
+            save_task_to_db({"task": "plain", "user_id": self.user.id}),
+            save_task_to_db({
+                "task": "tilde ñ", "description": "con descripción",
+                "is_completed": True, "user_id": self.user.id
+            }),
+            save_task_to_db({
+                "task": "null flag", "description": "",
+                "is_completed": None, "user_id": self.user.id
+            }),
+        ]
+        self.serializer = RowSerializer(TaskSchema())
+
+    def test_same_output_as_schema(self):
+        """ Test the rows dump exactly like TaskSchema(many=True) """
+        rows = Task.find_rows_by_user_id(
+            self.user.id, self.serializer.columns)
+        self.assertEqual(
+            self.serializer.dump(rows),
+            TaskSchema(many=True).dump(Task.find_all_by_user_id(self.user.id))
+        )
+
+    def test_same_output_as_serialize(self):
+        """ Test the rows dump exactly like Task.serialize """
+        rows, _ = Task.find_page_by_user_id(
+            self.user.id, 10, columns=self.serializer.columns)
+        self.assertEqual(
+            self.serializer.dump(rows),
+            [task.serialize() for task in self.tasks]
+        )
+
+    def test_relationship_fields_rejected(self):
+        """ Test schemas with relationship fields can not be compiled """
+        class UserWithTasks(UserSchema):
+            class Meta(UserSchema.Meta):
+                include_relationships = True
+
+        with self.assertRaises(TypeError):
+            RowSerializer(UserWithTasks())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+from flask_jwt_extended import create_access_token
+from sqlalchemy import insert
+from app.models import db, Task
+from app.positions import keys_after
+
+
+def save_task_to_db(data):
+    """ Save task to db """
+    task = Task(**data)
+    task.save_to_db()
+    return task
+
+
+def save_tasks_to_db(user_id, total):
+    """ Save many tasks for one user in a single commit """
+    tasks = [
+        Task(task=f"task {n}", description=f"desc {n}", user_id=user_id)
+        for n in range(total)
+    ]
+    db.session.add_all(tasks)
+    db.session.commit()
+    return tasks
+
+
+def bulk_save_tasks(user_id, total, chunk=10000):
+    """ Insert many tasks without building ORM objects """
+    positions = keys_after(None, total)
+    for start in range(0, total, chunk):
+        db.session.execute(insert(Task), [
+            {"task": f"task {n}", "description": f"desc {n}",
+             "is_completed": n % 3 == 0, "user_id": user_id,
+             "position": positions[n]}
+            for n in range(start, min(start + chunk, total))
+        ])
+    db.session.commit()
+
+
+def auth_headers(user):
+    """ Authorization headers for the given user """
+    token = create_access_token(
+        user.email, additional_claims={"user_id": user.id})
+    return {"Authorization": f"Bearer {token}"}